@@ -0,0 +1 @@
+"""Offline benchmarks of the bots, over recorded HTTP traffic"""
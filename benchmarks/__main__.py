@@ -0,0 +1,81 @@
+"""Record the traffic of the bots for a TV show once, then benchmark them offline
+
+    python3 -m benchmarks record fixtures/jessica-jones Q18605540
+    python3 -m benchmarks replay fixtures/jessica-jones
+
+    python3 -m benchmarks startup
+"""
+import json
+import os
+
+import click
+
+from .bots import CHILD_TYPES, MODES, format_report, run_mode
+from .replay import recording, replaying
+from . import startup as startup_times
+
+TRAFFIC = "traffic.jsonl"
+SETTINGS = "benchmark.json"
+
+
+@click.group()
+def main():
+    pass
+
+
+@main.command()
+@click.argument("fixture_dir", type=click.Path(file_okay=False))
+@click.argument("tvshow_id")
+@click.option("--mode", "modes", type=click.Choice(sorted(MODES)), multiple=True, default=["check"])
+@click.option("--child_type", type=click.Choice(sorted(CHILD_TYPES)), default="episode")
+@click.option("--workers", type=click.IntRange(min=1), default=1)
+@click.option("--allow-edits", is_flag=True, default=False, help="Needed to record the fix modes, which edit Wikidata")
+def record(fixture_dir, tvshow_id, modes, child_type, workers, allow_edits):
+    """Run the bots against Wikidata, recording all of their traffic"""
+    if any(MODES[mode][0] for mode in modes) and not allow_edits:
+        raise click.UsageError("Recording the fix modes makes real edits, pass --allow-edits to confirm")
+    os.makedirs(fixture_dir, exist_ok=True)
+    traffic = os.path.join(fixture_dir, TRAFFIC)
+    if os.path.exists(traffic):
+        os.remove(traffic)
+
+    with recording(traffic) as stats:
+        results = [run_mode(tvshow_id, mode, stats, child_type, workers) for mode in modes]
+    with open(os.path.join(fixture_dir, SETTINGS), "w") as f:
+        json.dump({"tvshow_id": tvshow_id, "modes": list(modes), "child_type": child_type, "workers": workers}, f)
+
+    print(f"Recorded {stats.total} requests to {traffic}")
+    print(format_report(results))
+
+
+@main.command()
+@click.argument("fixture_dir", type=click.Path(exists=True, file_okay=False))
+@click.option("--repeat", type=click.IntRange(min=1), default=1, help="Replay the recorded modes this many times")
+def replay(fixture_dir, repeat):
+    """Run the bots again, serving all requests from the recorded traffic"""
+    with open(os.path.join(fixture_dir, SETTINGS)) as f:
+        settings = json.load(f)
+
+    results = []
+    for _ in range(repeat):
+        # Each replay starts from the first recorded response again
+        with replaying(os.path.join(fixture_dir, TRAFFIC)) as stats:
+            for mode in settings["modes"]:
+                results.append(run_mode(settings["tvshow_id"], mode, stats, settings["child_type"], settings["workers"]))
+    print(format_report(results))
+
+
+@main.command()
+@click.option("--budget-ms", type=float, default=None, help="Fail if an entry point takes longer than this to import")
+def startup(budget_ms):
+    """Time the import of every command line entry point"""
+    times = [startup_times.measure(module) for module in startup_times.entry_points()]
+    print(startup_times.format_report(times))
+    if budget_ms is not None:
+        slow = [time.module for time in times if time.microseconds / 1000 > budget_ms]
+        if slow:
+            raise click.ClickException(f"Over the {budget_ms}ms budget: {', '.join(slow)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""End-to-end benchmarks of the bots over the items of a TV show
+
+    Each bot mode (check, fix, accumulate) runs over the same items with
+    fresh caches, so that it makes the same requests every time it runs:
+    once while recording, and then on every replay. The items are listed
+    with a single SPARQL query, as check_tv_show does.
+"""
+import os
+import tempfile
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, NamedTuple
+
+import pywikibot.config as config
+from pywikibot import ItemPage, Site
+
+import properties.wikidata_properties as wp
+from network.attribution import KINDS
+from .replay import RequestStats
+
+# Mode name -> (autofix, accumulate)
+MODES: Dict[str, tuple] = {
+    "check": (False, False),
+    "fix": (True, False),
+    "accumulate": (True, True),
+}
+
+CHILD_TYPES = {
+    "episode": wp.TELEVISION_SERIES_EPISODE,
+    "season": wp.TELEVISION_SERIES_SEASON,
+}
+
+
+class BenchmarkResult(NamedTuple):
+    """The throughput of one bot mode"""
+
+    mode: str
+    items: int
+    seconds: float
+    requests: Counter
+
+    @property
+    def items_per_second(self) -> float:
+        return self.items / self.seconds if self.seconds else 0.0
+
+    @property
+    def requests_per_item(self) -> float:
+        return sum(self.requests.values()) / self.items if self.items else 0.0
+
+
+@contextmanager
+def isolated_run(directory: str) -> Iterator[None]:
+    """Fresh caches under directory, and no throttling, for the duration of a run
+
+        Fix plans and checkpoints are kept under directory too. pywikibot's
+        own cache of site information is bypassed, so that every request of
+        the run goes over HTTP (and into the cassette).
+    """
+    from bots import plan
+    from cache import checkpoints, entities, scrapes
+    from sparql import results
+
+    caches = (entities, scrapes, results, checkpoints)
+    saved_caches = {module: dict(module._default_cache_config) for module in caches}
+    saved_plans = dict(plan._default_plan_config)
+    entities.configure(path=os.path.join(directory, "entities.sqlite3"))
+    scrapes.configure(path=os.path.join(directory, "scrapes.sqlite3"))
+    results.configure(path=os.path.join(directory, "sparql.sqlite3"))
+    checkpoints.configure(path=os.path.join(directory, "checkpoints.sqlite3"))
+    plan.configure(directory=os.path.join(directory, "plans"))
+    saved = {name: getattr(config, name) for name in ("put_throttle", "minthrottle", "maxthrottle", "API_config_expiry")}
+    config.put_throttle = config.minthrottle = config.maxthrottle = 0
+    config.API_config_expiry = 0
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(config, name, value)
+        for module, cache_config in saved_caches.items():
+            module.configure(**cache_config)
+        plan.configure(**saved_plans)
+
+
+class _Counted:
+    """Counts the items handed out by an iterable"""
+
+    def __init__(self, items: Iterable[ItemPage]):
+        self.items = items
+        self.count = 0
+
+    def __iter__(self):
+        for item in self.items:
+            self.count += 1
+            yield item
+
+
+def run_mode(tvshow_id: str, mode: str, stats: RequestStats, child_type: str = "episode", workers: int = 1) -> BenchmarkResult:
+    """Run the bot in this mode over the items of a show, and measure it
+
+        stats is the RequestStats of the surrounding recording() or
+        replaying() block, and only the requests made during this run are
+        counted.
+    """
+    # Imported here, so that the requests made when importing the bots are recorded
+    from bots import getbot
+    from model.series_graph import SeriesGraph
+    from sparql.client import select_items
+    from sparql.query_builder import generate_sparql_query
+
+    autofix, accumulate = MODES[mode]
+    with tempfile.TemporaryDirectory() as directory, isolated_run(directory):
+        SeriesGraph.invalidate(tvshow_id)
+        before = Counter(stats.counts)
+        start = time.perf_counter()
+
+        repo = Site().data_repository()
+        query = generate_sparql_query({
+            wp.PART_OF_THE_SERIES.pid: tvshow_id,
+            wp.INSTANCE_OF.pid: CHILD_TYPES[child_type],
+        })
+        items = _Counted(select_items(query, repo))
+        bot = getbot(items, autofix=autofix, accumulate=accumulate, always=True, workers=workers)
+        bot.run()
+
+        seconds = time.perf_counter() - start
+        requests = Counter(stats.counts)
+        requests.subtract(before)
+    return BenchmarkResult(mode, items.count, seconds, +requests)
+
+
+def format_report(results: List[BenchmarkResult]) -> str:
+    """A table of the results, one line per mode"""
+    header = f"{'mode':<12}{'items':>8}{'wall (s)':>10}{'items/s':>10}{'req/item':>10}" + "".join(
+        f"{kind:>12}" for kind in KINDS
+    )
+    lines = [header, "-" * len(header)]
+    for result in results:
+        lines.append(
+            f"{result.mode:<12}{result.items:>8}{result.seconds:>10.2f}{result.items_per_second:>10.2f}"
+            f"{result.requests_per_item:>10.2f}" + "".join(f"{result.requests[kind]:>12}" for kind in KINDS)
+        )
+    return "\n".join(lines)
@@ -0,0 +1,215 @@
+"""Recording HTTP traffic once, and replaying it offline
+
+    Every request made through the requests library (pywikibot's API and
+    SPARQL requests, and our scrapers, all use it) goes through
+    HTTPAdapter.send. While recording, the real send is called and every
+    request/response pair is appended to a cassette file. While
+    replaying, the responses are served from the cassette instead, and a
+    request that was never recorded raises ReplayMiss.
+
+    Requests are matched on their method, their URL and their body (query
+    and form parameters are compared regardless of their order). When the
+    same request was recorded several times, its responses are served in
+    the recorded order, and the last one is served again once they run out.
+
+    The cassette is a JSON lines file, one request/response pair per line.
+"""
+import base64
+import json
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import contextmanager
+from datetime import timedelta
+from typing import Deque, Dict, Iterator, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from requests import PreparedRequest, Response
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+# The kinds of requests reported by RequestStats are those of network.attribution
+from network.attribution import API_READ, API_WRITE, SCRAPE, SPARQL
+
+# Headers describing the raw body, which no longer apply once requests decoded it
+_DROPPED_HEADERS = {"content-encoding", "transfer-encoding", "content-length"}
+
+_WRITE_ACTIONS = {
+    "wbeditentity",
+    "wbcreateclaim",
+    "wbsetclaim",
+    "wbsetclaimvalue",
+    "wbremoveclaims",
+    "wbsetlabel",
+    "wbsetdescription",
+    "wbsetaliases",
+    "wbsetqualifier",
+    "wbsetreference",
+    "wbsetsitelink",
+    "edit",
+    "login",
+}
+
+
+class ReplayMiss(Exception):
+    """A request that is not in the cassette being replayed"""
+
+
+def _sorted_params(text: str) -> str:
+    return urlencode(sorted(parse_qsl(text, keep_blank_values=True)))
+
+
+def _body_text(request: PreparedRequest) -> str:
+    body = request.body or ""
+    if isinstance(body, bytes):
+        body = body.decode("utf-8", errors="replace")
+    content_type = request.headers.get("Content-Type", "")
+    if content_type.startswith("application/x-www-form-urlencoded"):
+        return _sorted_params(body)
+    return body
+
+
+def request_key(method: str, url: str, body: str) -> Tuple[str, str, str]:
+    """The key requests are matched on"""
+    parts = urlsplit(url)
+    url = urlunsplit((parts.scheme, parts.netloc, parts.path, _sorted_params(parts.query), ""))
+    return method.upper(), url, body
+
+
+def request_kind(method: str, url: str, body: str) -> str:
+    """Whether a request is an API read or write, a SPARQL query or a scrape"""
+    parts = urlsplit(url)
+    if parts.path.endswith("/sparql"):
+        return SPARQL
+    if parts.path.endswith("/api.php"):
+        params = dict(parse_qsl(parts.query))
+        params.update(parse_qsl(body))
+        if params.get("action") in _WRITE_ACTIONS:
+            return API_WRITE
+        return API_READ
+    return SCRAPE
+
+
+class RequestStats:
+    """Counts (and times) the requests made, by kind"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts: Counter = Counter()
+        self.seconds: Dict[str, float] = defaultdict(float)
+
+    def add(self, kind: str, seconds: float) -> None:
+        with self._lock:
+            self.counts[kind] += 1
+            self.seconds[kind] += seconds
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+
+class Cassette:
+    """The request/response pairs recorded in a file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._responses: Dict[Tuple[str, str, str], Deque[dict]] = defaultdict(deque)
+
+    def load(self) -> "Cassette":
+        with open(self.path) as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    key = request_key(entry["method"], entry["url"], entry["body"])
+                    self._responses[key].append(entry)
+        return self
+
+    def record(self, request: PreparedRequest, response: Response) -> None:
+        """Append a request and its response to the file"""
+        entry = {
+            "method": request.method,
+            "url": request.url,
+            "body": _body_text(request),
+            "status": response.status_code,
+            "reason": response.reason,
+            "headers": {k: v for k, v in response.headers.items() if k.lower() not in _DROPPED_HEADERS},
+        }
+        content = response.content or b""
+        try:
+            entry["text"] = content.decode("utf-8")
+        except UnicodeDecodeError:
+            entry["base64"] = base64.b64encode(content).decode("ascii")
+        with self._lock, open(self.path, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+
+    def response_for(self, request: PreparedRequest) -> Response:
+        """The recorded response to this request"""
+        key = request_key(request.method, request.url, _body_text(request))
+        with self._lock:
+            entries = self._responses.get(key)
+            if not entries:
+                raise ReplayMiss(f"{request.method} {request.url} was not recorded in {self.path}")
+            entry = entries.popleft() if len(entries) > 1 else entries[0]
+
+        response = Response()
+        response.status_code = entry["status"]
+        response.reason = entry.get("reason")
+        response.headers = CaseInsensitiveDict(entry["headers"])
+        response.encoding = get_encoding_from_headers(response.headers)
+        if "base64" in entry:
+            response._content = base64.b64decode(entry["base64"])
+        else:
+            response._content = entry["text"].encode("utf-8")
+        # The body is already in memory, so iter_content must not look for a raw stream
+        response._content_consumed = True
+        response.url = request.url
+        response.request = request
+        response.elapsed = timedelta(0)
+        return response
+
+
+@contextmanager
+def _patched_send(send) -> Iterator[None]:
+    original = HTTPAdapter.send
+    HTTPAdapter.send = send
+    try:
+        yield
+    finally:
+        HTTPAdapter.send = original
+
+
+@contextmanager
+def recording(path: str, stats: Optional[RequestStats] = None) -> Iterator[RequestStats]:
+    """Make real requests, and record them (appending) to the cassette at path"""
+    cassette = Cassette(path)
+    stats = stats if stats is not None else RequestStats()
+    original = HTTPAdapter.send
+
+    def send(adapter, request, *args, **kwargs):
+        start = time.perf_counter()
+        response = original(adapter, request, *args, **kwargs)
+        cassette.record(request, response)
+        stats.add(request_kind(request.method, request.url, _body_text(request)), time.perf_counter() - start)
+        return response
+
+    with _patched_send(send):
+        yield stats
+
+
+@contextmanager
+def replaying(path: str, stats: Optional[RequestStats] = None) -> Iterator[RequestStats]:
+    """Serve every request from the cassette at path, without touching the network"""
+    cassette = Cassette(path).load()
+    stats = stats if stats is not None else RequestStats()
+
+    def send(adapter, request, *args, **kwargs):
+        start = time.perf_counter()
+        response = cassette.response_for(request)
+        stats.add(request_kind(request.method, request.url, _body_text(request)), time.perf_counter() - start)
+        return response
+
+    with _patched_send(send):
+        yield stats
+
@@ -0,0 +1,72 @@
+"""How long the command line entry points take to start
+
+    Every module of cli/ is imported in a fresh interpreter, with
+    -X importtime, and its own import time (including everything it
+    imports) is reported along with the heavy modules it pulled in. Quick
+    commands (eg: --help, or creating QuickStatements) should not pay for
+    pywikibot, bs4 or lxml until they actually need them.
+"""
+import os
+import subprocess
+import sys
+from typing import Dict, List, NamedTuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that are slow to import, and that the entry points should only import on use
+HEAVY_MODULES = ("pywikibot", "requests", "bs4", "lxml", "tqdm")
+
+
+class StartupTime(NamedTuple):
+    """The import time of one entry point"""
+
+    module: str
+    microseconds: int
+    heavy: List[str]
+
+
+def entry_points() -> List[str]:
+    """The modules of cli/ that can be run with python -m"""
+    names = sorted(
+        name[:-3]
+        for name in os.listdir(os.path.join(ROOT, "cli"))
+        if name.endswith(".py") and not name.startswith(("test_", "__")) and name != "click_utils.py"
+    )
+    return [f"cli.{name}" for name in names]
+
+
+def parse_importtime(stderr: str) -> Dict[str, int]:
+    """The cumulative import time (in microseconds) of each module, from -X importtime output"""
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+def measure(module: str) -> StartupTime:
+    """Import a module in a fresh interpreter, and time it"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+    times = parse_importtime(result.stderr)
+    heavy = [name for name in HEAVY_MODULES if name in times]
+    return StartupTime(module, times.get(module, 0), heavy)
+
+
+def format_report(times: List[StartupTime]) -> str:
+    """A table of the import times, one line per entry point"""
+    header = f"{'entry point':<24}{'import (ms)':>12}  heavy modules"
+    lines = [header, "-" * len(header)]
+    for time in times:
+        lines.append(f"{time.module:<24}{time.microseconds / 1000:>12.1f}  {', '.join(time.heavy) or '-'}")
+    return "\n".join(lines)
@@ -0,0 +1,72 @@
+import os
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from .replay import API_READ, API_WRITE, SCRAPE, SPARQL, ReplayMiss, recording, replaying, request_kind
+
+
+class CountingHandler(BaseHTTPRequestHandler):
+    """Answers every request with the number of requests served so far"""
+
+    served = 0
+
+    def do_GET(self):
+        CountingHandler.served += 1
+        body = f"{self.path} #{CountingHandler.served}".encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.do_GET()
+
+    def log_message(self, *args):
+        pass
+
+
+class ReplayTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cassette = os.path.join(self.tmpdir.name, "traffic.jsonl")
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), CountingHandler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmpdir.cleanup()
+
+    def test_replay_without_server(self):
+        with recording(self.cassette) as stats:
+            first = requests.get(f"{self.url}/w/api.php?b=2&a=1").text
+            second = requests.get(f"{self.url}/w/api.php?a=1&b=2").text
+            posted = requests.post(f"{self.url}/w/api.php", data={"action": "wbeditentity", "id": "Q1"}).text
+        self.assertEqual(stats.counts, {API_READ: 2, API_WRITE: 1})
+        self.server.shutdown()
+
+        with replaying(self.cassette) as stats:
+            # Parameters match in any order, and repeated requests get their responses in order
+            self.assertEqual(requests.get(f"{self.url}/w/api.php?a=1&b=2").text, first)
+            self.assertEqual(requests.get(f"{self.url}/w/api.php?b=2&a=1").text, second)
+            self.assertEqual(requests.get(f"{self.url}/w/api.php?a=1&b=2").text, second)
+            self.assertEqual(requests.post(f"{self.url}/w/api.php", data={"id": "Q1", "action": "wbeditentity"}).text, posted)
+            with self.assertRaises(ReplayMiss):
+                requests.get(f"{self.url}/title/tt0000001/")
+        self.assertEqual(stats.total, 4)
+
+    def test_request_kinds(self):
+        self.assertEqual(request_kind("GET", "https://query.wikidata.org/sparql?query=x", ""), SPARQL)
+        self.assertEqual(request_kind("POST", "https://www.wikidata.org/w/api.php", "action=wbgetentities"), API_READ)
+        self.assertEqual(request_kind("GET", "https://www.imdb.com/title/tt0000001/", ""), SCRAPE)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,20 @@
+import unittest
+
+from .startup import entry_points, measure, parse_importtime
+
+
+class TestStartup(unittest.TestCase):
+    def test_parse_importtime(self):
+        stderr = "\n".join([
+            "import time: self [us] | cumulative | imported package",
+            "import time:       120 |        120 |   click.types",
+            "import time:       300 |        420 | click",
+        ])
+        self.assertEqual(parse_importtime(stderr), {"click.types": 120, "click": 420})
+
+    def test_entry_points_do_not_import_heavy_modules(self):
+        for module in entry_points():
+            with self.subTest(module=module):
+                startup = measure(module)
+                self.assertNotIn("pywikibot", startup.heavy)
+                self.assertNotIn("bs4", startup.heavy)
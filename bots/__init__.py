@@ -4,6 +4,8 @@ from typing import Iterable
 from pywikibot import ItemPage
 from pywikibot.bot import WikidataBot
 
+from cache import Checkpoint
+
 from .constraint_fixer import ConstraintCheckerBot
 from .constraint_fixer import ConstraintFixerBot
 from .constraint_fixer import AccumulatingConstraintFixerBot
@@ -13,7 +15,11 @@ def getbot(
         autofix: bool,
         accumulate: bool,
         always: bool = False,
-        property_filter: str = None
+        property_filter: str = None,
+        workers: int = 1,
+        checkpoint: Checkpoint = None,
+        profile: str = None,
+        compact: bool = False
     ) -> WikidataBot:
     """Bot factory for returning an appropriate implementation of WikidataBot
 
@@ -36,9 +42,22 @@ def getbot(
             Eg: "P1476"
             Eg: "title,country of origin"
             Eg: "P155,P156,title"
+
+        workers: int
+            The number of items to check concurrently. Fixes are still applied one at a time.
+
+        checkpoint: Checkpoint
+            If given, items already treated in this checkpoint are skipped,
+            and treated items are recorded in it
+
+        profile: str
+            If given, time each constraint, and write a JSON report to this path at the end of the run
+
+        compact: bool
+            If True, check compact snapshots of the items rather than full ItemPages
     """
     if autofix:
         if accumulate:
-            return AccumulatingConstraintFixerBot(generator, always=always, property_filter=property_filter)
-        return ConstraintFixerBot(generator, always=always, property_filter=property_filter)
-    return ConstraintCheckerBot(generator, always=always)
+            return AccumulatingConstraintFixerBot(generator, always=always, property_filter=property_filter, workers=workers, checkpoint=checkpoint, profile=profile, compact=compact)
+        return ConstraintFixerBot(generator, always=always, property_filter=property_filter, workers=workers, checkpoint=checkpoint, profile=profile, compact=compact)
+    return ConstraintCheckerBot(generator, always=always, workers=workers, checkpoint=checkpoint, profile=profile, compact=compact)
@@ -2,6 +2,23 @@
 
     These bots need to be provided with a generator of ItemPages in order to run
 
+    Items are loaded in batches ahead of time (see prefetch.py), so the
+    content of each item is already fresh when it is treated.
+
+    With workers > 1, items are checked (and their fixes computed) on a pool
+    of worker threads (see pool.py). Reports are still printed in input
+    order, and fixes are only ever applied from the bot's own thread.
+
+    The fixes for an item are applied as a single edit (see edits.py).
+
+    The requests made during a run are attributed to the item, model
+    class, constraint and phase (validate, fix or edit) that made them, and
+    summarized at the end of the run (see network.attribution).
+
+    With profile set to a path, the time spent validating and fixing each
+    constraint is measured, and written to that path as a JSON report at
+    the end of the run (see profiling.py).
+
     Current implementations provided are:
         1. ConstraintCheckerBot
            Performs checks on items, but does not fix them
@@ -17,147 +34,259 @@
 import pywikibot.logging as botlogging
 from pywikibot.bot import WikidataBot
 
-from model import BaseType, Factory
+from cache import FetchCounter
+from model import Factory
+from network import limits
+from network.attribution import NetworkAttribution
+from .edits import apply_fixes
+from .plan import FixPlan, apply_plan, by_summary
+from .pool import TreatmentPool
+from .profiling import ConstraintProfile
+from .prefetch import PrefetchingGenerator
+from .treatment import ItemTreatment
 
 
 class ConstraintCheckerBot(WikidataBot):
     """A WikidataBot that checks constraints on items
 
         The generator must generate instances of ItemPage
+
+        workers is the number of items prepared concurrently. When it is
+        more than 1, requests to each endpoint are capped by endpoint_limits
+        (see network.limits.configure).
+
+        If an edit_scheduler (see network.scheduler) is given, all edits are
+        queued on it, together with the edits of anything else sharing it.
+
+        If a checkpoint (see cache.checkpoints) is given, every treated item
+        is recorded in it, and items it already has are skipped without
+        being fetched.
+
+        With compact set, items are checked through compact snapshots (see
+        model.snapshot), which keeps the memory of large runs down.
     """
 
     use_from_page = False
 
-    def __init__(self, generator, factory=Factory(), verbose=False, **kwargs):
+    def __init__(
+        self, generator, factory=None, verbose=False, prefetch=True, workers=1, endpoint_limits=None,
+        edit_scheduler=None, checkpoint=None, profile=None, compact=False, **kwargs
+    ):
+        self.checkpoint = checkpoint
+        if checkpoint is not None:
+            generator = checkpoint.skip_done(generator)
+        self.factory = factory if factory is not None else Factory()
+        if prefetch:
+            # Only the parts of the items that the model classes read are loaded
+            generator = PrefetchingGenerator(
+                generator, projection=self.factory.projection(), on_load=self.factory.preload_links
+            )
+        self._pool = None
+        if workers > 1:
+            limits.configure(endpoint_limits)
+            generator = self._pool = TreatmentPool(generator, self.prepare, workers)
         super().__init__(generator=generator, **kwargs)
-        self.factory = factory
         self.verbose = verbose
-
-    def print_failures(self, typed_item: BaseType, failed_constraints):
-        """Print failed constraints"""
-        for constraint in failed_constraints:
-            botlogging.output(f"{constraint} failed for {typed_item}", toStdout=True)
-
-    def print_successes(self, typed_item: BaseType, passed_constraints):
-        """Print passed constraints"""
-        for constraint in passed_constraints:
-            botlogging.output(f"{constraint} passed for {typed_item}", toStdout=True)
+        self.edit_scheduler = edit_scheduler
+        self.fetches = FetchCounter()
+        self.network = NetworkAttribution()
+        self.profile_path = profile
+        self.profile = ConstraintProfile() if profile is not None else None
+        self.compact = compact
+        self.treated = 0
+        self.most_fetches = None
+
+    def print_failures(self, treatment: ItemTreatment):
+        """Report failed constraints"""
+        for constraint in treatment.not_satisfied:
+            treatment.log(f"{constraint} failed for {treatment.typed_item}")
+
+    def print_successes(self, treatment: ItemTreatment):
+        """Report passed constraints"""
+        for constraint in treatment.satisfied:
+            treatment.log(f"{constraint} passed for {treatment.typed_item}")
+
+    def print_fetches(self):
+        """Print the entity fetches made across all treated items"""
+        if self.checkpoint is not None and self.checkpoint.skipped:
+            botlogging.output(
+                f"Skipped {self.checkpoint.skipped} items already treated by {self.checkpoint.run_id}", toStdout=True
+            )
+        if not self.treated:
+            return
+        botlogging.output(
+            f"Entity fetches for {self.treated} items: {self.fetches}", toStdout=True
+        )
+        if self.most_fetches is not None:
+            qid, fetches = self.most_fetches
+            botlogging.output(f"Most fetches were for {qid}: {fetches}", toStdout=True)
 
     # override
     def treat_page_and_item(self, unused_page, item):
-        """Print out constraint failures
+        """Treat an item, loading it only once
 
             unused_page is always None since use_from_page is False.
             See https://doc.wikimedia.org/pywikibot/master/api_ref/pywikibot.html#pywikibot.WikidataBot
         """
-        item.get(force=True)
-        typed_item = self.factory.get_typed_item(item.title())
-        botlogging.output(f"Checking constraints for {typed_item}", toStdout=True)
-        satisfied = []
-        not_satisfied = []
-        for constraint in typed_item.constraints:
-            if constraint.validate(typed_item):
-                satisfied.append(constraint)
-            else:
-                not_satisfied.append(constraint)
+        if self._pool is not None:
+            treatment = self._pool.result(item)
+        else:
+            treatment = self.prepare(item)
+        for message in treatment.messages:
+            botlogging.output(message, toStdout=True)
+        self.treat(treatment)
+        if self.checkpoint is not None:
+            self.checkpoint.record(treatment.qid, {
+                "constraints": len(treatment.satisfied) + len(treatment.not_satisfied),
+                "failures": [str(constraint) for constraint in treatment.not_satisfied],
+            })
+
+        self.treated += 1
+        self.fetches.add(treatment.fetches)
+        if self.most_fetches is None or treatment.fetches.requests > self.most_fetches[1].requests:
+            self.most_fetches = (treatment.qid, treatment.fetches)
+        if self.verbose:
+            botlogging.output(f"Entity fetches for {treatment.qid}: {treatment.fetches}", toStdout=True)
+
+    def prepare(self, item) -> ItemTreatment:
+        """Load and check an item, without making any edits
+
+            This may run on a worker thread, so it must only read from
+            Wikidata, and report through treatment.log.
+        """
+        treatment = ItemTreatment(item, self.factory, self.profile, self.compact)
+        self.check(treatment)
+        return treatment
+
+    def treat(self, treatment: ItemTreatment):
+        """Constraint failures have already been reported by prepare"""
+
+    def edit(self, func, *args, **kwargs):
+        """Make an edit with func, through the edit scheduler if there is one"""
+        if self.edit_scheduler is None:
+            return func(*args, **kwargs)
+        return self.edit_scheduler.run(func, *args, **kwargs)
+
+    def check(self, treatment: ItemTreatment):
+        """Check the constraints of the treated item, and report failures"""
+        typed_item = treatment.typed_item
+        treatment.log(f"Checking constraints for {typed_item}")
+        treatment.check()
 
         if self.verbose:
-            self.print_failures(typed_item, not_satisfied)
-            self.print_successes(typed_item, satisfied)
+            self.print_failures(treatment)
+            self.print_successes(treatment)
 
         total = len(typed_item.constraints)
-        failures = len(not_satisfied)
+        failures = len(treatment.not_satisfied)
 
-        botlogging.output(
-            f"Found {failures}/{total} constraint failures", toStdout=True
-        )
+        treatment.log(f"Found {failures}/{total} constraint failures")
+
+    def print_network(self):
+        """Print the requests made for each constraint across the run"""
+        if self.network:
+            botlogging.output(f"Requests by constraint:\n{self.network.summary()}", toStdout=True)
 
-        return satisfied, not_satisfied
+    def write_profile(self):
+        """Write the constraint timings to the profile report, if profiling"""
+        if self.profile is not None:
+            self.profile.write(self.profile_path)
+            botlogging.output(f"Constraint profile written to {self.profile_path}", toStdout=True)
+
+    def finish(self):
+        """Called once all items have been treated, while requests are still attributed"""
+
+    # override
+    def run(self):
+        with self.network:
+            super().run()
+            self.finish()
+        self.print_fetches()
+        self.print_network()
+        self.write_profile()
 
 
 class ConstraintFixerBot(ConstraintCheckerBot):
-    def __init__(self, generator, factory=Factory(), property_filter=None, **kwargs):
+    def __init__(self, generator, factory=None, property_filter=None, **kwargs):
         super().__init__(generator=generator, factory=factory, **kwargs)
         if property_filter is None:
             property_filter = ""
         self._filters = set(property_filter.split(","))
 
     # override
-    def treat_page_and_item(self, unused_page, item):
-        """Fix items that have constraint failures
-
-            unused_page is always None since use_from_page is False.
-            See https://doc.wikimedia.org/pywikibot/master/api_ref/pywikibot.html#pywikibot.WikidataBot
-        """
-        item.get(force=True)
-        _, not_satisfied = super().treat_page_and_item(unused_page, item)
-        typed_item = self.factory.get_typed_item(item.title())
+    def prepare(self, item) -> ItemTreatment:
+        """Check an item, and compute its fixes ahead of applying them"""
+        treatment = super().prepare(item)
+        treatment.fixes()
+        return treatment
 
+    # override
+    def treat(self, treatment: ItemTreatment):
+        """Fix items that have constraint failures, with a single edit per item"""
         fixes = [
-            fix for constraint in not_satisfied for fix in constraint.fix(typed_item)
+            fix for fix in treatment.fixes()
+            if not self._filters or should_fix(fix, self._filters)
         ]
-        fixed = 0
-        for fix in fixes:
-            skip_fix = not should_fix(fix, self._filters)
-            if self._filters and skip_fix:
-                continue
-            success = fix.apply(self.user_add_claim)
-            fixed += success
-        total = len(not_satisfied)
+        fixed = self.edit(apply_fixes, self, fixes)
+        total = len(treatment.not_satisfied)
         botlogging.output(f"Fixed {fixed}/{total} constraint failures", toStdout=True)
 
 
 class AccumulatingConstraintFixerBot(ConstraintCheckerBot):
-    """Accumulates all fixes, and then fixes them only when fixall is called"""
+    """Accumulates all fixes, and then fixes them only when fixall is called
+
+        Fixes are spooled to a fix plan on disk (see plan.py) as items are
+        checked, rather than kept in memory. If applying the plan is
+        interrupted, it can be resumed with cli/apply_fixes.py.
+
+        The accumulated fixes are still applied with a single edit per item.
+    """
 
     def __init__(
-        self, generator, factory=Factory(), property_filter=None, sort=True, **kwargs
+        self, generator, factory=None, property_filter=None, sort=True, plan=None, **kwargs
     ):
         super().__init__(generator, factory, **kwargs)
-        self.fixes = []
+        if plan is not None:
+            self.plan = FixPlan(plan)
+        elif self.checkpoint is not None:
+            # Items skipped on resume had their fixes saved to the run's plan
+            self.plan = FixPlan.named(self.checkpoint.run_id)
+            if not self.checkpoint.resumed:
+                self.plan.discard()
+        else:
+            self.plan = FixPlan.new()
         self.sort = sort
         if property_filter is None:
             property_filter = ""
         self._filters = set(property_filter.split(","))
 
     # override
-    def treat_page_and_item(self, unused_page, item):
-        """Fix items that have constraint failures
-
-            unused_page is always None since use_from_page is False.
-            See https://doc.wikimedia.org/pywikibot/master/api_ref/pywikibot.html#pywikibot.WikidataBot
-        """
-        item.get(force=True)
-        _, not_satisfied = super().treat_page_and_item(unused_page, item)
-        typed_item = self.factory.get_typed_item(item.title())
+    def prepare(self, item) -> ItemTreatment:
+        """Check an item, and compute its fixes"""
+        treatment = super().prepare(item)
+        treatment.fixes()
+        return treatment
 
-        fixes = [
-            fix for constraint in not_satisfied for fix in constraint.fix(typed_item)
-        ]
-        self.fixes.extend(fixes)
+    # override
+    def treat(self, treatment: ItemTreatment):
+        """Spool fixes for items that have constraint failures to the plan"""
+        for fix in treatment.fixes():
+            if not self._filters or should_fix(fix, self._filters):
+                self.plan.append(fix)
 
     def fixall(self):
-        if self.sort:
-            self.fixes = list(sorted(self.fixes, key=lambda f: f.summary))
-
-        if self._filters:
-            self.fixes = [
-                fix for fix in self.fixes if should_fix(fix, self._filters)
-            ]
-
-        for fix in self.fixes:
-            print(fix.summary)
-
-        fixed = 0
-        for fix in self.fixes:
-            success = fix.apply(self.user_add_claim)
-            fixed += int(success)
-        total = len(self.fixes)
+        self.plan.close()
+        botlogging.output(f"Fix plan saved to {self.plan.path}", toStdout=True)
+
+        fixes = self.plan.sorted(by_summary, "by-summary") if self.sort else self.plan
+        for fix in fixes:
+            print(fix["summary"])
+
+        fixed, total = apply_plan(self, self.plan)
         botlogging.output(f"Fixed {fixed}/{total} constraint failures", toStdout=True)
 
     # override
-    def run(self):
-        super().run()
+    def finish(self):
         self.fixall()
 
 
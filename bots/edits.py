@@ -0,0 +1,81 @@
+"""Applying fixes with as few edits as possible
+
+    Every edit costs a throttle wait, so all the fixes for one item are
+    submitted together, as a single wbeditentity call. pywikibot sends the
+    revision the item was loaded at as baserevid, so the edit fails (rather
+    than overwriting anything) if the item changed since it was checked.
+    Only then are the fixes applied again, one edit at a time.
+"""
+from typing import Dict, Iterable, List
+
+import pywikibot.logging as botlogging
+from pywikibot import ItemPage
+from pywikibot.bot import WikidataBot
+from pywikibot.exceptions import Error
+
+from cache import forget
+from constraints.api import Fix
+from network.attribution import API_WRITE, request, tagged
+from sparql.results import forget_entities, referenced_qids
+
+
+def apply_fixes(bot: WikidataBot, fixes: Iterable[Fix]) -> int:
+    """Apply the fixes with one edit per item, and return the number of fixes applied"""
+    fixed = 0
+    for itempage, item_fixes in group_by_item(fixes).items():
+        fixed += apply_item_fixes(bot, itempage, item_fixes)
+    return fixed
+
+
+def group_by_item(fixes: Iterable[Fix]) -> Dict[ItemPage, List[Fix]]:
+    """The fixes for each item, in the order the items first appear"""
+    groups: Dict[ItemPage, List[Fix]] = {}
+    for fix in fixes:
+        groups.setdefault(fix.itempage, []).append(fix)
+    return groups
+
+
+def apply_item_fixes(bot: WikidataBot, itempage: ItemPage, fixes: List[Fix]) -> int:
+    """Apply all the fixes for one item as a single edit
+
+        If the combined edit fails, the fixes are applied one at a time.
+        Returns the number of fixes applied.
+    """
+    if len(fixes) == 1:
+        return _apply_one_by_one(bot, fixes)
+
+    data = {}
+    for fix in fixes:
+        fix.add_to(data)
+    summary = "; ".join(fix.summary for fix in fixes)
+
+    try:
+        # Wait for the edit to go through, so that a failure can be handled here
+        with tagged(item=itempage.title(), phase="edit"), request(API_WRITE):
+            saved = bot.user_edit_entity(itempage, data, summary=summary, asynchronous=False)
+    except Error as e:
+        botlogging.output(
+            f"Unable to apply {len(fixes)} fixes to {itempage.title()} at once ({e}), applying them one at a time",
+            toStdout=True,
+        )
+        return _apply_one_by_one(bot, fixes)
+    finally:
+        _forget(itempage, data)
+    return len(fixes) if saved else 0
+
+
+def _apply_one_by_one(bot: WikidataBot, fixes: List[Fix]) -> int:
+    fixed = 0
+    for fix in fixes:
+        with tagged(item=fix.itempage.title(), phase="edit"), request(API_WRITE):
+            fixed += int(bool(fix.apply(bot.user_add_claim)))
+        data = {}
+        fix.add_to(data)
+        _forget(fix.itempage, data)
+    return fixed
+
+
+def _forget(itempage: ItemPage, data: dict) -> None:
+    """Drop the cached copy of an edited item, and the cached query results involving it"""
+    forget(itempage)
+    forget_entities({itempage.title()} | referenced_qids(data))
@@ -0,0 +1,277 @@
+"""Fix plans: fixes spooled to disk, to be reviewed and applied later
+
+    A FixPlan is an append-only JSONL file, with one fix (see Fix.to_json)
+    per line. Fixes are appended while items are checked, so memory use
+    does not grow with the number of fixes, and nothing is lost if the
+    checking run crashes.
+
+    Plans are sorted with an external merge sort: the file is sorted in
+    chunks that fit in memory, and the sorted chunks are merged.
+
+    Applying a plan records its progress next to the plan file, after
+    every item. Applying the same plan again resumes where it left off.
+    Fixes are saved with the revision of the item they were computed from,
+    and edits carry it as their base revision, so that a plan applied after
+    the item changed gets an edit conflict rather than overwriting it.
+"""
+import heapq
+import json
+import os
+import tempfile
+import time
+from collections import Counter
+from itertools import groupby, islice
+from typing import Callable, Iterable, Iterator, Optional, Tuple
+
+import pywikibot.logging as botlogging
+
+from cache.sqlite import default_cache_dir
+from constraints.api import Fix, fix_from_json
+from .edits import apply_fixes
+
+# The number of fixes sorted in memory at a time
+SORT_CHUNK_SIZE = 10000
+
+_default_plan_config = {
+    "directory": os.path.join(default_cache_dir(), "plans"),
+}
+
+
+def configure(**kwargs) -> None:
+    """Configure where plans are kept by default
+
+        Accepts the keyword argument directory.
+    """
+    unknown = set(kwargs) - set(_default_plan_config)
+    if unknown:
+        raise ValueError(f"Unknown fix plan options: {sorted(unknown)}")
+    _default_plan_config.update(kwargs)
+
+
+class FixPlan:
+    """An append-only JSONL file of fixes
+
+        Arguments
+        ---------
+        path: str
+            The plan file. It is created if it does not exist, and appended
+            to if it does.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._file = None
+
+    @classmethod
+    def new(cls, directory: str = None) -> "FixPlan":
+        """A new plan, in the plans directory of the cache by default"""
+        if directory is None:
+            directory = _default_plan_config["directory"]
+        name = time.strftime("fixes-%Y%m%d-%H%M%S") + f"-{os.getpid()}.jsonl"
+        return cls(os.path.join(directory, name))
+
+    @classmethod
+    def named(cls, name: str, directory: str = None) -> "FixPlan":
+        """The plan with this name (eg: a run ID), in the plans directory of the cache by default"""
+        if directory is None:
+            directory = _default_plan_config["directory"]
+        safe_name = "".join(c if c.isalnum() or c in "-_." else "_" for c in name)
+        return cls(os.path.join(directory, f"{safe_name}.jsonl"))
+
+    def discard(self) -> None:
+        """Delete the plan, along with its sorted copies and progress"""
+        self.close()
+        directory, name = os.path.split(os.path.abspath(self.path))
+        for filename in os.listdir(directory):
+            if filename == name or filename.startswith(name + "."):
+                os.remove(os.path.join(directory, filename))
+
+    @property
+    def progress_path(self) -> str:
+        return self.path + ".progress"
+
+    def append(self, fix: Fix) -> None:
+        """Add a fix at the end of the plan"""
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(json.dumps(fix.to_json(), separators=(",", ":")) + "\n")
+        # Keep the plan on disk in case the run crashes
+        self._file.flush()
+
+    def extend(self, fixes: Iterable[Fix]) -> None:
+        for fix in fixes:
+            self.append(fix)
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __iter__(self) -> Iterator[dict]:
+        """The saved fixes, as JSON"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                yield json.loads(line)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def sorted(self, key: Callable[[dict], object], suffix: str) -> "FixPlan":
+        """The plan sorted by key, saved next to this plan with the given suffix
+
+            The sorted plan is reused as long as no fix was added to this
+            plan since it was sorted, so that a resumed run applies the
+            fixes in the same order. Otherwise it is sorted again, keeping
+            the fixes it already handled first, so that its progress still
+            holds.
+        """
+        self.close()
+        if not os.path.exists(self.path):
+            # A plan that no fix was added to
+            open(self.path, "a").close()
+        sorted_plan = FixPlan(f"{self.path}.{suffix}")
+        # Plans are append-only, so their size tells whether fixes were added
+        size = os.path.getsize(self.path)
+        if sorted_plan._source_size() != size:
+            done, _ = sorted_plan.done()
+            if done:
+                _sort_after_done(self.path, sorted_plan.path, key, done)
+            else:
+                external_sort(self.path, sorted_plan.path, key)
+            sorted_plan._record_source_size(size)
+        return sorted_plan
+
+    @property
+    def source_size_path(self) -> str:
+        return self.path + ".source"
+
+    def _source_size(self) -> Optional[int]:
+        """The size of the plan this sorted plan was made from, if it is a sorted plan"""
+        if not os.path.exists(self.path) or not os.path.exists(self.source_size_path):
+            return None
+        with open(self.source_size_path, encoding="utf-8") as f:
+            return json.load(f)["size"]
+
+    def _record_source_size(self, size: int) -> None:
+        with open(self.source_size_path, "w", encoding="utf-8") as f:
+            json.dump({"size": size}, f)
+
+    def done(self) -> Tuple[int, int]:
+        """The number of fixes already handled, and the number of those applied"""
+        if not os.path.exists(self.progress_path):
+            return 0, 0
+        with open(self.progress_path, encoding="utf-8") as f:
+            progress = json.load(f)
+        return progress["done"], progress["fixed"]
+
+    def record(self, done: int, fixed: int) -> None:
+        """Save the progress of applying this plan"""
+        tmp = self.progress_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"done": done, "fixed": fixed}, f)
+        os.replace(tmp, self.progress_path)
+
+
+def by_summary(fix: dict):
+    return fix["summary"]
+
+
+def by_item(fix: dict):
+    return fix["qid"], fix["summary"]
+
+
+def apply_plan(bot, plan: FixPlan) -> Tuple[int, int]:
+    """Apply the fixes of a plan, with one edit per item, resuming any earlier attempt
+
+        Returns the number of fixes applied, and the total number of fixes.
+    """
+    by_items = plan.sorted(by_item, "by-item")
+    done, fixed = by_items.done()
+    if done:
+        botlogging.output(f"Resuming {plan.path} after {done} fixes", toStdout=True)
+
+    remaining = iter(by_items)
+    position = sum(1 for _ in islice(remaining, done))
+    for _, group in groupby(remaining, key=lambda fix: fix["qid"]):
+        group = list(group)
+        position += len(group)
+        # The fixes of an item share its page, and so the revision they are applied against
+        itempages = {}
+        fixes = [fix_from_json(bot.repo, fix, itempages) for fix in group]
+        fixed += bot.edit(apply_fixes, bot, fixes)
+        by_items.record(position, fixed)
+    return fixed, position
+
+
+def _sort_after_done(src: str, dest: str, key: Callable[[dict], object], done: int) -> None:
+    """Sort src by key into dest, keeping the first done lines of the current dest first
+
+        The fixes already handled stay where they are, and the others,
+        including those added to src since dest was sorted, are sorted after
+        them.
+    """
+    directory = os.path.dirname(os.path.abspath(dest))
+    with open(dest, encoding="utf-8") as f:
+        handled = list(islice(f, done))
+    # The handled fixes are in src too, and are left out of what is sorted
+    skip = Counter(handled)
+    with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=directory, suffix=".rest", delete=False) as rest:
+        with open(src, encoding="utf-8") as f:
+            for line in f:
+                if skip[line] > 0:
+                    skip[line] -= 1
+                    continue
+                rest.write(line)
+    try:
+        external_sort(rest.name, rest.name + ".sorted", key)
+        tmp = dest + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as out, open(rest.name + ".sorted", encoding="utf-8") as sorted_rest:
+            out.writelines(handled)
+            out.writelines(sorted_rest)
+        os.replace(tmp, dest)
+    finally:
+        for path in (rest.name, rest.name + ".sorted"):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def external_sort(src: str, dest: str, key: Callable[[dict], object], chunk_size: int = SORT_CHUNK_SIZE) -> None:
+    """Sort a JSONL file by key, holding at most chunk_size lines in memory
+
+        The sort is stable, and dest is only written once it is complete.
+    """
+    directory = os.path.dirname(os.path.abspath(dest))
+
+    def line_key(line):
+        return key(json.loads(line))
+
+    runs = []
+    try:
+        with open(src, encoding="utf-8") as f:
+            while True:
+                lines = list(islice(f, chunk_size))
+                if not lines:
+                    break
+                lines.sort(key=line_key)
+                with tempfile.NamedTemporaryFile(
+                    "w", encoding="utf-8", dir=directory, suffix=".run", delete=False
+                ) as run:
+                    run.writelines(lines)
+                    runs.append(run.name)
+
+        files = [open(run, encoding="utf-8") for run in runs]
+        try:
+            tmp = dest + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as out:
+                out.writelines(heapq.merge(*files, key=line_key))
+            os.replace(tmp, dest)
+        finally:
+            for f in files:
+                f.close()
+    finally:
+        for run in runs:
+            os.remove(run)
@@ -0,0 +1,76 @@
+"""Concurrent preparation of item treatments
+
+    Checking an item is almost entirely waiting on the network (entity
+    reads, SPARQL and scraping), so several items can be prepared at once
+    on a pool of worker threads. The items themselves are still handed to
+    the bot one at a time, in input order, so reports come out in order and
+    all writes are made from the bot's own (single) thread.
+"""
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, Optional
+
+
+class TreatmentPool:
+    """Prepare items on worker threads ahead of the consumer
+
+        Iterating over the pool yields the items of the generator in order,
+        while `prepare(item)` runs for up to `window` items ahead of the
+        consumer. The consumer collects the result for the item it was just
+        handed with result(item), which waits for its preparation to finish.
+        Preparations are kept in input order rather than by item, so the
+        same item may be yielded more than once.
+
+        Arguments
+        ---------
+        generator: Iterable
+            The items to prepare
+        prepare: Callable
+            The function to run on a worker thread for each item. It must not
+            make any edits.
+        workers: int
+            The number of worker threads
+        window: int
+            The maximum number of items being prepared or waiting to be
+            consumed. Defaults to twice the number of workers.
+    """
+
+    def __init__(self, generator: Iterable, prepare: Callable, workers: int, window: int = None):
+        self.generator = generator
+        self.prepare = prepare
+        self.workers = workers
+        self.window = window if window is not None else 2 * workers
+        self._futures = deque()
+        self._current: Optional[Future] = None
+
+    def __iter__(self) -> Iterator:
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="treat")
+        try:
+            for item in self.generator:
+                self._futures.append((item, executor.submit(self.prepare, item)))
+                if len(self._futures) >= self.window:
+                    yield from self._hand_over()
+            while self._futures:
+                yield from self._hand_over()
+        finally:
+            for _, future in self._futures:
+                future.cancel()
+            self._futures.clear()
+            self._current = None
+            executor.shutdown(wait=True)
+
+    def _hand_over(self) -> Iterator:
+        item, self._current = self._futures.popleft()
+        yield item
+        # The consumer may skip an item without asking for its result
+        self._current = None
+
+    def result(self, item):
+        """Wait for the preparation of the item last handed to the consumer, and return its result
+
+            Any exception raised while preparing the item is raised here.
+        """
+        future, self._current = self._current, None
+        if future is None:
+            raise KeyError(f"{item} is not the item being treated, or its result was already collected")
+        return future.result()
@@ -0,0 +1,153 @@
+"""Batched, read-ahead loading of ItemPages for the bots
+
+    The bots treat one item at a time, and loading each item separately
+    costs one API round trip per item. PrefetchingGenerator wraps a
+    generator of ItemPages and loads them in chunks of up to 50 QIDs per
+    wbgetentities call, on a background thread, while the bot is busy
+    treating the previous chunk.
+
+    Given a projection (see cache.Projection), only the parts of the items
+    it names are loaded. Given on_load, it is called with every loaded
+    chunk, eg: to look up what the items of the chunk need in batches too.
+"""
+import queue
+import threading
+import time
+from typing import Callable, Iterable, Iterator, List, Optional
+
+import pywikibot.logging as botlogging
+from pywikibot import ItemPage
+
+from cache import Projection, load_items
+
+MAX_CHUNK_SIZE = 50
+
+
+class PrefetchingGenerator:
+    """Yield ItemPages from the underlying generator with their content already loaded
+
+        Items are yielded in the same order as the underlying generator.
+
+        Chunk sizes adapt to how long loads take: the first chunk is small so
+        that the first item is available quickly, and chunks grow up to 50
+        items as long as a chunk loads within target_seconds. Slow or failing
+        loads halve the chunk size.
+
+        Arguments
+        ---------
+        generator: Iterable[ItemPage]
+            The generator to prefetch items from
+        min_chunk_size: int
+            The size of the first chunk, and the smallest chunk size used
+        max_chunk_size: int
+            The largest chunk size used. wbgetentities accepts at most 50 IDs.
+        read_ahead: int
+            The number of loaded chunks to keep ready ahead of the consumer
+        target_seconds: float
+            Chunks that take longer than this to load are made smaller
+        projection: Optional[Projection]
+            The parts of the items to load, or None for whole items
+        on_load: Optional[Callable[[List[ItemPage]], None]]
+            Called on the prefetching thread with every loaded chunk
+    """
+
+    def __init__(
+        self,
+        generator: Iterable[ItemPage],
+        min_chunk_size: int = 5,
+        max_chunk_size: int = MAX_CHUNK_SIZE,
+        read_ahead: int = 2,
+        target_seconds: float = 5.0,
+        projection: Optional[Projection] = None,
+        on_load: Optional[Callable[[List[ItemPage]], None]] = None,
+    ):
+        self.generator = generator
+        self.min_chunk_size = min_chunk_size
+        self.max_chunk_size = min(max_chunk_size, MAX_CHUNK_SIZE)
+        self.read_ahead = read_ahead
+        self.target_seconds = target_seconds
+        self.chunk_size = min_chunk_size
+        self.projection = projection
+        self.on_load = on_load
+
+    def __iter__(self) -> Iterator[ItemPage]:
+        chunks = queue.Queue(maxsize=self.read_ahead)
+        stop = threading.Event()
+        worker = threading.Thread(
+            target=self._prefetch, args=(chunks, stop), name="prefetch", daemon=True
+        )
+        worker.start()
+        try:
+            while True:
+                chunk = chunks.get()
+                if chunk is None:
+                    break
+                if isinstance(chunk, BaseException):
+                    raise chunk
+                yield from chunk
+        finally:
+            stop.set()
+
+    def _prefetch(self, chunks: queue.Queue, stop: threading.Event) -> None:
+        """Read chunks from the generator, load them, and hand them to the consumer"""
+        iterator = iter(self.generator)
+        try:
+            while not stop.is_set():
+                chunk = _take(iterator, self.chunk_size)
+                if not chunk:
+                    break
+                self._load(chunk)
+                if self.on_load is not None:
+                    try:
+                        self.on_load(chunk)
+                    except Exception as e:  # pylint: disable=broad-except
+                        # The items are still treated, only without the batched lookups
+                        botlogging.output(f"Preparing {len(chunk)} prefetched items failed: {e}", toStdout=True)
+                _hand_over(chunks, stop, chunk)
+        except BaseException as e:  # pylint: disable=broad-except
+            _hand_over(chunks, stop, e)
+            return
+        _hand_over(chunks, stop, None)
+
+    def _load(self, chunk: List[ItemPage]) -> None:
+        """Load a chunk, adapting the chunk size to how long it took"""
+        start = time.monotonic()
+        try:
+            load_items(chunk, force=True, projection=self.projection)
+        except Exception as e:  # pylint: disable=broad-except
+            botlogging.output(
+                f"Prefetching {len(chunk)} items failed, falling back to one at a time: {e}", toStdout=True
+            )
+            self.chunk_size = max(self.min_chunk_size, self.chunk_size // 2)
+            for itempage in chunk:
+                try:
+                    load_items([itempage], force=True, projection=self.projection)
+                except Exception:  # pylint: disable=broad-except
+                    # Leave the item unloaded, the bot will report the error when treating it
+                    pass
+            return
+        elapsed = time.monotonic() - start
+
+        if elapsed > self.target_seconds:
+            self.chunk_size = max(self.min_chunk_size, self.chunk_size // 2)
+        else:
+            self.chunk_size = min(self.max_chunk_size, self.chunk_size * 2)
+
+
+def _hand_over(chunks: queue.Queue, stop: threading.Event, value) -> None:
+    """Put value on the queue, unless the consumer stops (and so stops emptying the queue) first"""
+    while not stop.is_set():
+        try:
+            chunks.put(value, timeout=1)
+            return
+        except queue.Full:
+            continue
+
+
+def _take(iterator: Iterator, n: int) -> list:
+    chunk = []
+    for item in iterator:
+        chunk.append(item)
+        if len(chunk) >= n:
+            break
+    return chunk
@@ -0,0 +1,84 @@
+"""Timing the validation and fixing of each constraint across a run
+
+    A ConstraintProfile keeps the wall and CPU time of every call to
+    Constraint.validate and Constraint.fix, by model class and
+    constraint, and summarizes them (count, total and p50/p95/p99) in a
+    JSON report. CPU time is measured for the calling thread only, so the
+    timings stay meaningful when items are checked on several workers.
+"""
+import json
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+
+PHASES = ("validate", "fix")
+
+
+def percentile(samples: List[float], p: float) -> float:
+    """The p-th percentile (nearest rank) of samples, which must be sorted"""
+    if not samples:
+        return 0.0
+    rank = max(1, math.ceil(p / 100 * len(samples)))
+    return samples[rank - 1]
+
+
+def _summary(samples: List[float]) -> Dict[str, float]:
+    samples = sorted(samples)
+    return {
+        "total": sum(samples),
+        "p50": percentile(samples, 50),
+        "p95": percentile(samples, 95),
+        "p99": percentile(samples, 99),
+    }
+
+
+class ConstraintProfile:
+    """The wall and CPU times of the constraints checked during a run"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (model, constraint, phase) -> [(wall seconds, cpu seconds)]
+        self.samples: Dict[Tuple[str, str, str], List[Tuple[float, float]]] = {}
+
+    @contextmanager
+    def timed(self, model: str, constraint: str, phase: str):
+        """Time the block, as a call of this constraint's phase"""
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            sample = (time.perf_counter() - wall, time.thread_time() - cpu)
+            with self._lock:
+                self.samples.setdefault((model, constraint, phase), []).append(sample)
+
+    def _entries(self, groups: Dict[tuple, List[Tuple[float, float]]], fields: Tuple[str, ...]) -> List[dict]:
+        entries = []
+        for key, samples in groups.items():
+            entry = dict(zip(fields, key))
+            entry["count"] = len(samples)
+            entry["wall"] = _summary([wall for wall, _ in samples])
+            entry["cpu"] = _summary([cpu for _, cpu in samples])
+            entries.append(entry)
+        return sorted(entries, key=lambda entry: entry["wall"]["total"], reverse=True)
+
+    def report(self) -> dict:
+        """The timings by constraint, and by model class, most time consuming first"""
+        with self._lock:
+            by_constraint = {key: list(samples) for key, samples in self.samples.items()}
+        by_model: Dict[Tuple[str, str], List[Tuple[float, float]]] = {}
+        for (model, _, phase), samples in by_constraint.items():
+            by_model.setdefault((model, phase), []).extend(samples)
+        return {
+            "constraints": self._entries(by_constraint, ("model", "constraint", "phase")),
+            "models": self._entries(by_model, ("model", "phase")),
+        }
+
+    def write(self, path: str) -> None:
+        """Write the report as JSON"""
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+
+    def __bool__(self):
+        return bool(self.samples)
@@ -0,0 +1,192 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from standin import StandinServer, write_config
+from standin.store import EntityStore
+
+from .plan import FixPlan, apply_plan, external_sort
+
+plan_module = sys.modules[FixPlan.__module__]
+
+
+class StubBot:
+    """Applies fixes by recording them, failing on the edit of fail_on"""
+
+    repo = None
+
+    def __init__(self, fail_on=None):
+        self.fail_on = fail_on
+        self.applied = []
+
+    def edit(self, func, bot, fixes):
+        if fixes[0]["qid"] == self.fail_on:
+            raise RuntimeError(f"Editing {self.fail_on} failed")
+        self.applied.extend((fix["qid"], fix["summary"]) for fix in fixes)
+        return len(fixes)
+
+
+class ExternalSortTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.src = os.path.join(self.tmpdir.name, "plan.jsonl")
+        self.dest = os.path.join(self.tmpdir.name, "plan.jsonl.sorted")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write(self, records):
+        with open(self.src, "w") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+
+    def read(self):
+        with open(self.dest) as f:
+            return [json.loads(line) for line in f]
+
+    def test_sorts_across_chunks(self):
+        records = [{"qid": f"Q{i % 7}", "n": i} for i in range(50)]
+        self.write(records)
+        external_sort(self.src, self.dest, key=lambda r: r["qid"], chunk_size=8)
+        # The sort is stable, so records with the same QID keep their order
+        self.assertEqual(self.read(), sorted(records, key=lambda r: r["qid"]))
+        # Temporary chunk files are removed
+        self.assertEqual(sorted(os.listdir(self.tmpdir.name)), ["plan.jsonl", "plan.jsonl.sorted"])
+
+    def test_empty_plan(self):
+        self.write([])
+        external_sort(self.src, self.dest, key=lambda r: r["qid"])
+        self.assertEqual(self.read(), [])
+
+
+class ApplyPlanTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        for patcher in (
+            patch.object(plan_module, "fix_from_json", lambda repo, fix, itempages: fix),
+            patch.object(plan_module.botlogging, "output"),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def plan(self, name="run-1", fixes=()):
+        plan = FixPlan.named(name, self.tmpdir.name)
+        for qid, summary in fixes:
+            with open(plan.path, "a") as f:
+                f.write(json.dumps({"type": "label", "qid": qid, "summary": summary}) + "\n")
+        return plan
+
+    def test_resumes_after_a_failed_edit(self):
+        fixes = [("Q3", "c"), ("Q1", "a"), ("Q2", "b"), ("Q1", "b"), ("Q3", "a")]
+        plan = self.plan(fixes=fixes)
+
+        failing = StubBot(fail_on="Q2")
+        with self.assertRaises(RuntimeError):
+            apply_plan(failing, plan)
+        # The fixes of an item are applied together, in one edit
+        self.assertEqual(failing.applied, [("Q1", "a"), ("Q1", "b")])
+        # Progress is recorded after every item
+        self.assertEqual(FixPlan(plan.path + ".by-item").done(), (2, 2))
+
+        resumed = StubBot()
+        self.assertEqual(apply_plan(resumed, plan), (5, 5))
+        self.assertEqual(resumed.applied, [("Q2", "b"), ("Q3", "a"), ("Q3", "c")])
+
+        # Nothing is left to apply
+        again = StubBot()
+        self.assertEqual(apply_plan(again, plan), (5, 5))
+        self.assertEqual(again.applied, [])
+
+    def test_a_new_run_discards_the_old_plan_and_progress(self):
+        old = self.plan("run-1", [("Q1", "a"), ("Q2", "b")])
+        other = self.plan("run-10", [("Q9", "z")])
+        apply_plan(StubBot(), old)
+
+        # What a run that is not resumed does with the plan named after its run ID
+        FixPlan.named("run-1", self.tmpdir.name).discard()
+        self.assertEqual(sorted(os.listdir(self.tmpdir.name)), [os.path.basename(other.path)])
+
+        new = self.plan("run-1", [("Q1", "a"), ("Q3", "c")])
+        bot = StubBot()
+        self.assertEqual(apply_plan(bot, new), (2, 2))
+        self.assertEqual(bot.applied, [("Q1", "a"), ("Q3", "c")])
+
+    def test_fixes_added_after_sorting_are_applied_on_resume(self):
+        plan = self.plan(fixes=[("Q2", "b"), ("Q1", "a"), ("Q3", "c")])
+        with self.assertRaises(RuntimeError):
+            apply_plan(StubBot(fail_on="Q2"), plan)
+
+        # A resumed run checks more items, and adds their fixes to the plan
+        with open(plan.path, "a") as f:
+            for qid, summary in [("Q0", "z"), ("Q2", "d"), ("Q1", "e")]:
+                f.write(json.dumps({"type": "label", "qid": qid, "summary": summary}) + "\n")
+
+        resumed = StubBot()
+        self.assertEqual(apply_plan(resumed, plan), (6, 6))
+        # The fixes already applied are not applied again, and the new ones are sorted with the rest
+        self.assertEqual(resumed.applied, [("Q0", "z"), ("Q1", "e"), ("Q2", "b"), ("Q2", "d"), ("Q3", "c")])
+
+
+# Checks Q100, edits it, then applies the plan made from the check, run in a
+# process of its own since pywikibot reads its configuration on import
+STALE_PLAN_SCRIPT = """
+import sys
+import pywikibot
+from bots.plan import FixPlan, apply_plan
+from constraints.api import LabelFix
+
+class Bot:
+    def __init__(self, repo):
+        self.repo = repo
+
+    def edit(self, func, *args):
+        return func(*args)
+
+    def user_add_claim(self, *args, **kwargs):
+        raise AssertionError("No claim is added")
+
+repo = pywikibot.Site().data_repository()
+plan = FixPlan.named("stale", sys.argv[1])
+for qid in ("Q5", "Q100"):
+    item = pywikibot.ItemPage(repo, qid)
+    item.get()
+    plan.append(LabelFix(f"{qid} label", "de", item))
+plan.close()
+
+pywikibot.ItemPage(repo, "Q100").editLabels({"de": "Eine Serie"})
+print(apply_plan(Bot(repo), plan))
+"""
+
+
+class StalePlanTests(unittest.TestCase):
+    def test_a_plan_does_not_overwrite_later_edits(self):
+        store = EntityStore()
+        store.add([
+            {"id": "Q5", "type": "item", "labels": {"en": {"language": "en", "value": "human"}}},
+            {"id": "Q100", "type": "item", "labels": {"en": {"language": "en", "value": "Some Show"}}},
+        ])
+        with StandinServer(store, accounts={"Bot": "secret"}) as server, tempfile.TemporaryDirectory() as directory:
+            write_config(directory, server.url, "Bot", "secret")
+            env = {**os.environ, "PYWIKIBOT_DIR": directory, "XDG_CACHE_HOME": directory}
+            env.pop("PYWIKIBOT_NO_USER_CONFIG", None)
+            env["PYTHONPATH"] = os.pathsep.join(filter(None, [os.path.dirname(os.path.dirname(os.path.abspath(__file__))), env.get("PYTHONPATH")]))
+            result = subprocess.run(
+                [sys.executable, "-c", STALE_PLAN_SCRIPT, directory],
+                env=env, capture_output=True, text=True, timeout=60, cwd=directory,
+            )
+            self.assertEqual(result.returncode, 0, result.stderr)
+            # Only the fix of the item that did not change since it was checked is applied
+            self.assertEqual(result.stdout.split("\n")[-2], "(1, 2)")
+            self.assertEqual(store.get("Q5")["labels"]["de"]["value"], "Q5 label")
+            self.assertEqual(store.get("Q100")["labels"]["de"]["value"], "Eine Serie")
+
+
+if __name__ == "__main__":
+    unittest.main()
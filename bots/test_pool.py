@@ -0,0 +1,28 @@
+import unittest
+
+from .pool import TreatmentPool
+
+
+class TreatmentPoolTests(unittest.TestCase):
+    def test_same_item_twice_in_the_window(self):
+        item, other = object(), object()
+        calls = []
+
+        def prepare(prepared):
+            calls.append(prepared)
+            return len(calls)
+
+        pool = TreatmentPool([item, other, item], prepare, workers=1, window=3)
+        results = [(handed, pool.result(handed)) for handed in pool]
+        self.assertEqual(results, [(item, 1), (other, 2), (item, 3)])
+
+    def test_skipped_results(self):
+        pool = TreatmentPool(range(5), lambda n: n * n, workers=2)
+        results = [pool.result(n) for n in pool if n % 2]
+        self.assertEqual(results, [1, 9])
+        with self.assertRaises(KeyError):
+            pool.result(4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+import json
+import os
+import tempfile
+import unittest
+
+from .profiling import ConstraintProfile, percentile
+
+
+class ConstraintProfileTests(unittest.TestCase):
+    def test_percentile(self):
+        samples = list(range(1, 101))
+        self.assertEqual(percentile(samples, 50), 50)
+        self.assertEqual(percentile(samples, 95), 95)
+        self.assertEqual(percentile(samples, 99), 99)
+        self.assertEqual(percentile([], 50), 0.0)
+
+    def test_report(self):
+        profile = ConstraintProfile()
+        for _ in range(3):
+            with profile.timed("Episode", "has_title", "validate"):
+                pass
+        with profile.timed("Episode", "has_title", "fix"):
+            pass
+        with profile.timed("Season", "has_parts", "validate"):
+            pass
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "profile.json")
+            profile.write(path)
+            with open(path) as f:
+                report = json.load(f)
+
+        counts = {(e["model"], e["constraint"], e["phase"]): e["count"] for e in report["constraints"]}
+        self.assertEqual(counts, {
+            ("Episode", "has_title", "validate"): 3,
+            ("Episode", "has_title", "fix"): 1,
+            ("Season", "has_parts", "validate"): 1,
+        })
+        models = {(e["model"], e["phase"]): e["count"] for e in report["models"]}
+        self.assertEqual(models[("Episode", "validate")], 3)
+        self.assertEqual(set(report["constraints"][0]["cpu"]), {"total", "p50", "p95", "p99"})
+
+
+if __name__ == "__main__":
+    unittest.main()
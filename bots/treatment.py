@@ -0,0 +1,109 @@
+"""Per-item state shared between checking and fixing an item"""
+from contextlib import nullcontext
+from typing import List, Optional
+
+from pywikibot import ItemPage
+
+from cache import FetchCounter, load_item
+from constraints.api import Constraint, Fix
+from model import BaseType, Factory
+from network.attribution import tagged
+from .profiling import ConstraintProfile
+
+
+class ItemTreatment:
+    """The treatment of a single item by a bot
+
+        The item is loaded once, and wrapped once in its typed model. The
+        same typed model is then used to check constraints and to compute
+        fixes, so treating an item never fetches it more than once.
+
+        Every entity load made while the treatment is active (i.e. inside a
+        `with treatment:` block) is counted in `fetches`, including loads
+        of related items such as the season or series of an episode.
+
+        Messages about the treatment are kept in `messages` rather than
+        printed, so that a bot preparing several items at once can still
+        report them in input order.
+
+        Requests made while the treatment is active are tagged with the
+        item and its model class (see network.attribution), and with the
+        constraint being validated or fixed.
+
+        If a profile is given, every validation and fix is timed in it.
+
+        If compact is True, the typed model wraps a compact snapshot of the
+        item (see model.snapshot), and the treatment lets go of the loaded
+        page. The full item is only loaded again if a fix needs to edit it.
+    """
+
+    def __init__(self, item: ItemPage, factory: Factory, profile: ConstraintProfile = None, compact: bool = False):
+        self.item = item
+        self.profile = profile
+        self.fetches = FetchCounter()
+        self.satisfied: List[Constraint] = []
+        self.not_satisfied: List[Constraint] = []
+        self.messages: List[str] = []
+        self._fixes: Optional[List[Fix]] = None
+        self._tags: List[tagged] = []
+        self.typed_item: Optional[BaseType] = None
+        with self, tagged(phase="load"):
+            load_item(item, projection=factory.projection())
+            self.typed_item = factory.typed_item(item, compact=compact)
+        if compact:
+            self.item = ItemPage(item.repo, item.title())
+
+    @property
+    def qid(self) -> str:
+        """The QID of the item being treated"""
+        return self.item.title()
+
+    def check(self) -> None:
+        """Validate every constraint of the typed item"""
+        with self:
+            for constraint in self.typed_item.constraints:
+                with tagged(constraint=constraint.name, phase="validate"), self._timed(constraint, "validate"):
+                    valid = constraint.validate(self.typed_item)
+                if valid:
+                    self.satisfied.append(constraint)
+                else:
+                    self.not_satisfied.append(constraint)
+
+    def fixes(self) -> List[Fix]:
+        """The fixes for all constraints that are not satisfied
+
+            The fixes are computed on the first call only.
+        """
+        if self._fixes is None:
+            fixes = []
+            with self:
+                for constraint in self.not_satisfied:
+                    with tagged(constraint=constraint.name, phase="fix"), self._timed(constraint, "fix"):
+                        fixes.extend(constraint.fix(self.typed_item))
+            self._fixes = fixes
+        return self._fixes
+
+    def _timed(self, constraint: Constraint, phase: str):
+        if self.profile is None:
+            return nullcontext()
+        return self.profile.timed(self.model, constraint.name, phase)
+
+    def log(self, message: str) -> None:
+        """Keep a message to be reported for this treatment"""
+        self.messages.append(message)
+
+    @property
+    def model(self) -> Optional[str]:
+        """The name of the model class of the item, once it is known"""
+        return type(self.typed_item).__name__ if self.typed_item is not None else None
+
+    def __enter__(self):
+        self.fetches.__enter__()
+        tag = tagged(item=self.qid, model=self.model)
+        tag.__enter__()
+        self._tags.append(tag)
+        return self
+
+    def __exit__(self, *exc_info):
+        self._tags.pop().__exit__(*exc_info)
+        self.fetches.__exit__(*exc_info)
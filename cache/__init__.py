@@ -0,0 +1,4 @@
+"""On-disk caches shared between bot runs and processes"""
+from .entities import EntityCache, FetchCounter, Projection, fill_item, forget, load_item, load_items
+from .scrapes import ScrapeCache, scrape, scrape_many
+from .checkpoints import Checkpoint, CheckpointStore
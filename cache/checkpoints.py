@@ -0,0 +1,137 @@
+"""Checkpoints of long runs, so that a crashed run can be resumed
+
+    A checkpoint records, for a given run ID, every QID that was fully
+    processed, together with a small JSON result. A resumed run skips
+    those QIDs before fetching anything about them.
+
+    Run IDs are chosen by the caller, and should be derived from the
+    arguments of the run (eg: the series and the kind of items checked),
+    so that running the same command again with --resume finds them.
+"""
+import json
+import os
+import time
+from typing import Callable, Dict, Iterable, Iterator, Optional, TypeVar
+
+from .sqlite import SqliteStore, default_cache_dir
+
+T = TypeVar("T")
+
+
+class CheckpointStore(SqliteStore):
+    """An on-disk store of the QIDs processed by each run"""
+
+    SCHEMA = (
+        """CREATE TABLE IF NOT EXISTS checkpoints (
+            run_id TEXT NOT NULL,
+            qid TEXT NOT NULL,
+            result TEXT,
+            done_at REAL NOT NULL,
+            PRIMARY KEY (run_id, qid)
+        )""",
+    )
+
+    def record(self, run_id: str, qid: str, result=None) -> None:
+        """Record that this QID was processed by the run"""
+        conn = self.connection()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?)",
+                (run_id, qid, json.dumps(result), time.time()),
+            )
+
+    def results(self, run_id: str) -> Dict[str, object]:
+        """The result of every QID processed by the run"""
+        rows = self.connection().execute(
+            "SELECT qid, result FROM checkpoints WHERE run_id = ?", (run_id,)
+        ).fetchall()
+        return {qid: json.loads(result) for qid, result in rows}
+
+    def result(self, run_id: str, qid: str):
+        """The result recorded for this QID by the run, None if there is none"""
+        row = self.connection().execute(
+            "SELECT result FROM checkpoints WHERE run_id = ? AND qid = ?", (run_id, qid)
+        ).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def clear(self, run_id: str) -> None:
+        """Forget everything the run processed"""
+        conn = self.connection()
+        with conn:
+            conn.execute("DELETE FROM checkpoints WHERE run_id = ?", (run_id,))
+
+
+class Checkpoint:
+    """The checkpoint of a single run
+
+        Arguments
+        ---------
+        run_id: str
+            The ID of the run
+        resume: bool
+            If True, carry on from what the run already processed.
+            If False, the run starts over, and its checkpoint is cleared.
+        store: CheckpointStore
+            The store to use, the default one if None
+    """
+
+    def __init__(self, run_id: str, resume: bool = False, store: CheckpointStore = None):
+        self.run_id = run_id
+        self.resumed = resume
+        self.store = store if store is not None else default_store()
+        if resume:
+            self._done = set(self.store.results(run_id))
+        else:
+            self.store.clear(run_id)
+            self._done = set()
+        self.skipped = 0
+
+    def is_done(self, qid: str) -> bool:
+        return qid in self._done
+
+    def record(self, qid: str, result=None) -> None:
+        """Record that this QID is done, with an optional JSON-serializable result"""
+        self.store.record(self.run_id, qid, result)
+        self._done.add(qid)
+
+    def result(self, qid: str):
+        """The result recorded for this QID, None if it is not done"""
+        return self.store.result(self.run_id, qid) if self.is_done(qid) else None
+
+    def skip_done(self, items: Iterable[T], qid: Callable[[T], str] = lambda item: item.title()) -> Iterator[T]:
+        """The items whose QID is not done yet"""
+        for item in items:
+            if self.is_done(qid(item)):
+                self.skipped += 1
+                continue
+            yield item
+
+    def __len__(self):
+        return len(self._done)
+
+
+_default_store: Optional[CheckpointStore] = None
+_default_cache_config = {
+    "path": os.path.join(default_cache_dir(), "checkpoints.sqlite3"),
+}
+
+
+def configure(**kwargs) -> None:
+    """Configure the default checkpoint store
+
+        Accepts the keyword argument path.
+    """
+    global _default_store
+    unknown = set(kwargs) - set(_default_cache_config)
+    if unknown:
+        raise ValueError(f"Unknown checkpoint store options: {sorted(unknown)}")
+    _default_cache_config.update(kwargs)
+    _default_store = None
+
+
+def default_store() -> CheckpointStore:
+    """The process-wide checkpoint store"""
+    global _default_store
+    if _default_store is None:
+        _default_store = CheckpointStore(**_default_cache_config)
+    return _default_store
@@ -0,0 +1,527 @@
+"""Persistent, revision-validated cache for Wikidata entity JSON
+
+    Entities are stored keyed by (site, QID), together with the revision
+    ID they were fetched at. An entry is trusted as-is for max_age seconds
+    after it was last validated. After that (or whenever a fresh copy is
+    forced), the current revision IDs are looked up with a single cheap
+    prop=info query, and only the entities that actually changed are
+    downloaded again with wbgetentities.
+
+    The cache is evicted in least-recently-used order once the stored
+    entities exceed max_bytes. The total size is kept as a running count,
+    rather than summed on every write, and summed again every
+    SIZE_RECOUNT_PUTS writes since other processes may share the cache.
+
+    Loads can be projected (see Projection) to only the parts of an entity
+    that will be read, eg: the claims of a few properties and the English
+    label and description. The projection an entity was fetched with is
+    stored with it, and a cached entity is only used for a load whose
+    projection it covers.
+"""
+import json
+import os
+import threading
+import time
+import zlib
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+
+from pywikibot import ItemPage
+
+from network.limits import API, endpoint
+from .sqlite import SqliteStore, default_cache_dir
+
+# wbgetentities and prop=info accept at most 50 IDs per request for regular accounts
+BATCH_SIZE = 50
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+DEFAULT_MAX_AGE = 60 * 60
+
+# The number of writes after which the running total size of a cache is summed again
+SIZE_RECOUNT_PUTS = 1000
+
+
+class Projection(NamedTuple):
+    """The parts of an entity to fetch
+
+        Attributes
+        ----------
+        props: FrozenSet[str]
+            The wbgetentities props to fetch (eg: info, claims, labels)
+        languages: Optional[FrozenSet[str]]
+            The languages of the labels, descriptions and aliases to
+            fetch, or None for all of them
+        properties: Optional[FrozenSet[str]]
+            The properties whose claims are kept, or None for all of them.
+            wbgetentities cannot filter claims, so the others are dropped
+            once downloaded, before they are parsed or cached.
+    """
+
+    props: FrozenSet[str]
+    languages: Optional[FrozenSet[str]] = None
+    properties: Optional[FrozenSet[str]] = None
+
+    def covers(self, other: Optional["Projection"]) -> bool:
+        """Whether an entity fetched with this projection has everything other needs"""
+        if other is None:
+            return False
+        return (
+            self.props >= other.props
+            and _covers(self.languages, other.languages)
+            and _covers(self.properties, other.properties)
+        )
+
+    def union(self, other: "Projection") -> "Projection":
+        """The projection that covers both this one and other"""
+        return Projection(
+            self.props | other.props,
+            _union(self.languages, other.languages),
+            _union(self.properties, other.properties),
+        )
+
+    def key(self) -> str:
+        """A string form of this projection, as stored in the cache"""
+        parts = (self.props, self.languages, self.properties)
+        return ";".join("*" if part is None else "|".join(sorted(part)) for part in parts)
+
+    @classmethod
+    def from_key(cls, key: str) -> Optional["Projection"]:
+        """The projection of a key, or None (ie: the whole entity) for an empty key"""
+        if not key:
+            return None
+        return cls(*(None if part == "*" else frozenset(filter(None, part.split("|"))) for part in key.split(";")))
+
+    def apply(self, content: dict) -> dict:
+        """Drop the claims of the properties this projection does not keep"""
+        if self.properties is None or "claims" not in content:
+            return content
+        claims = {pid: claims for pid, claims in content["claims"].items() if pid in self.properties}
+        return {**content, "claims": claims}
+
+
+def _covers(have: Optional[FrozenSet[str]], want: Optional[FrozenSet[str]]) -> bool:
+    return have is None or (want is not None and have >= want)
+
+
+def _union(first: Optional[FrozenSet[str]], second: Optional[FrozenSet[str]]) -> Optional[FrozenSet[str]]:
+    return None if first is None or second is None else first | second
+
+
+def covers(have: Optional[Projection], want: Optional[Projection]) -> bool:
+    """Whether an entity fetched with projection have (None for the whole entity) can serve a load with projection want"""
+    return have is None or have.covers(want)
+
+
+class EntityCache(SqliteStore):
+    """An on-disk LRU store of entity JSON, validated by revision ID
+
+        Arguments
+        ---------
+        path: str
+            The SQLite file to use. It is created if it does not exist.
+        max_bytes: int
+            The maximum (compressed) size of all entities in the cache.
+            Least recently used entities are evicted beyond this size.
+        max_age: float
+            The number of seconds an entity is trusted without checking
+            its revision ID against Wikidata. 0 always revalidates.
+    """
+
+    SCHEMA = (
+        """CREATE TABLE IF NOT EXISTS entities (
+            site TEXT NOT NULL,
+            qid TEXT NOT NULL,
+            revid INTEGER NOT NULL,
+            content BLOB NOT NULL,
+            size INTEGER NOT NULL,
+            validated_at REAL NOT NULL,
+            accessed_at REAL NOT NULL,
+            projection TEXT NOT NULL DEFAULT '',
+            PRIMARY KEY (site, qid)
+        )""",
+        "CREATE INDEX IF NOT EXISTS entities_accessed_at ON entities (accessed_at)",
+    )
+
+    def __init__(self, path: str, max_bytes: int = DEFAULT_MAX_BYTES, max_age: float = DEFAULT_MAX_AGE):
+        super().__init__(path)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        # The running total size, None until it is first summed
+        self._size: Optional[int] = None
+        self._puts = 0
+        self._size_lock = threading.Lock()
+        conn = self.connection()
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(entities)")}
+        if "projection" not in columns:
+            # Caches written before projections existed only hold whole entities
+            with conn:
+                conn.execute("ALTER TABLE entities ADD COLUMN projection TEXT NOT NULL DEFAULT ''")
+
+    def get(self, site: str, qid: str, projection: Projection = None) -> Optional[Tuple[int, dict, float]]:
+        """The cached (revision ID, entity JSON, last validated time) for this QID, or None
+
+            Entities cached with a projection that does not cover this
+            projection (None for the whole entity) are not returned.
+        """
+        conn = self.connection()
+        row = conn.execute(
+            "SELECT revid, content, validated_at, projection FROM entities WHERE site = ? AND qid = ?",
+            (site, qid),
+        ).fetchone()
+        if row is None or not covers(Projection.from_key(row[3]), projection):
+            return None
+        with conn:
+            conn.execute(
+                "UPDATE entities SET accessed_at = ? WHERE site = ? AND qid = ?",
+                (time.time(), site, qid),
+            )
+        revid, content, validated_at, _ = row
+        return revid, json.loads(zlib.decompress(content)), validated_at
+
+    def projection(self, site: str, qid: str) -> Tuple[bool, Optional[Projection]]:
+        """Whether this QID is cached, and the projection it was fetched with (None for the whole entity)"""
+        row = self.connection().execute(
+            "SELECT projection FROM entities WHERE site = ? AND qid = ?", (site, qid)
+        ).fetchone()
+        if row is None:
+            return False, None
+        return True, Projection.from_key(row[0])
+
+    def put(self, site: str, qid: str, revid: int, entity: dict, projection: Projection = None) -> None:
+        """Store the entity JSON for this QID at the given revision, as fetched with this projection"""
+        content = zlib.compress(json.dumps(entity, separators=(",", ":")).encode("utf-8"))
+        now = time.time()
+        key = projection.key() if projection is not None else ""
+        conn = self.connection()
+        with conn:
+            replaced = conn.execute("SELECT size FROM entities WHERE site = ? AND qid = ?", (site, qid)).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO entities"
+                " (site, qid, revid, content, size, validated_at, accessed_at, projection)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (site, qid, revid, content, len(content), now, now, key),
+            )
+        with self._size_lock:
+            self._puts += 1
+            if self._size is not None and self._puts < SIZE_RECOUNT_PUTS:
+                self._size += len(content) - (replaced[0] if replaced else 0)
+                if self._size <= self.max_bytes:
+                    return
+        self.evict()
+
+    def touch(self, site: str, qids: Iterable[str]) -> None:
+        """Mark these entities as validated just now"""
+        now = time.time()
+        conn = self.connection()
+        with conn:
+            conn.executemany(
+                "UPDATE entities SET validated_at = ?, accessed_at = ? WHERE site = ? AND qid = ?",
+                [(now, now, site, qid) for qid in qids],
+            )
+
+    def invalidate(self, site: str, qid: str) -> None:
+        """Drop the cached entity for this QID, e.g. after editing it"""
+        conn = self.connection()
+        with conn:
+            deleted = conn.execute("SELECT size FROM entities WHERE site = ? AND qid = ?", (site, qid)).fetchone()
+            conn.execute("DELETE FROM entities WHERE site = ? AND qid = ?", (site, qid))
+        if deleted:
+            with self._size_lock:
+                if self._size is not None:
+                    self._size -= deleted[0]
+
+    def is_fresh(self, validated_at: float) -> bool:
+        """Whether an entry validated at this time can be used without revalidation"""
+        return time.time() - validated_at < self.max_age
+
+    def size(self) -> int:
+        """The total size in bytes of all cached entities, summed over the whole table"""
+        (total,) = self.connection().execute("SELECT COALESCE(SUM(size), 0) FROM entities").fetchone()
+        with self._size_lock:
+            self._size = total
+            self._puts = 0
+        return total
+
+    def evict(self) -> None:
+        """Evict least recently used entities until the cache fits in max_bytes"""
+        excess = self.size() - self.max_bytes
+        if excess <= 0:
+            return
+        evicted = 0
+        conn = self.connection()
+        with conn:
+            rows = conn.execute(
+                "SELECT site, qid, size FROM entities ORDER BY accessed_at"
+            ).fetchall()
+            for site, qid, size in rows:
+                if excess <= 0:
+                    break
+                conn.execute("DELETE FROM entities WHERE site = ? AND qid = ?", (site, qid))
+                excess -= size
+                evicted += size
+        with self._size_lock:
+            if self._size is not None:
+                self._size -= evicted
+
+
+class FetchCounter:
+    """Counts the entity loads made on the current thread while it is active
+
+        Use it as a context manager. Counters can be nested, in which case
+        loads are counted by every active counter.
+
+        Attributes
+        ----------
+        requests: int
+            The number of API requests made (wbgetentities and prop=info)
+        downloaded: int
+            The number of entities downloaded with wbgetentities
+        revalidated: int
+            The number of cached entities whose revision ID was checked
+        from_cache: int
+            The number of entities loaded from the cache without any request
+    """
+
+    _active = threading.local()
+
+    def __init__(self):
+        self.requests = 0
+        self.downloaded = 0
+        self.revalidated = 0
+        self.from_cache = 0
+
+    def add(self, other: "FetchCounter") -> None:
+        """Add the counts of another counter to this one"""
+        self.requests += other.requests
+        self.downloaded += other.downloaded
+        self.revalidated += other.revalidated
+        self.from_cache += other.from_cache
+
+    def __enter__(self):
+        FetchCounter._stack().append(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        FetchCounter._stack().remove(self)
+
+    def __str__(self):
+        return (
+            f"{self.requests} requests, {self.downloaded} downloaded, "
+            f"{self.revalidated} revalidated, {self.from_cache} from cache"
+        )
+
+    @classmethod
+    def _stack(cls):
+        if not hasattr(cls._active, "stack"):
+            cls._active.stack = []
+        return cls._active.stack
+
+    @classmethod
+    def record(cls, **counts) -> None:
+        """Add to the counts of every counter active on this thread"""
+        # A counter that was entered more than once only counts once
+        for counter in set(cls._stack()):
+            for name, value in counts.items():
+                setattr(counter, name, getattr(counter, name) + value)
+
+
+_default_cache = None
+_default_cache_config = {
+    "path": os.path.join(default_cache_dir(), "entities.sqlite3"),
+    "max_bytes": DEFAULT_MAX_BYTES,
+    "max_age": DEFAULT_MAX_AGE,
+    "enabled": True,
+}
+
+
+def configure(**kwargs) -> None:
+    """Configure the default entity cache
+
+        Accepts the keyword arguments path, max_bytes and max_age (see
+        EntityCache), and enabled. Passing enabled=False turns off caching,
+        and every load goes to Wikidata.
+    """
+    global _default_cache
+    unknown = set(kwargs) - set(_default_cache_config)
+    if unknown:
+        raise ValueError(f"Unknown entity cache options: {sorted(unknown)}")
+    _default_cache_config.update(kwargs)
+    _default_cache = None
+
+
+def default_cache() -> Optional[EntityCache]:
+    """The process-wide entity cache, or None if caching is disabled"""
+    global _default_cache
+    if not _default_cache_config["enabled"]:
+        return None
+    if _default_cache is None:
+        config = dict(_default_cache_config)
+        del config["enabled"]
+        _default_cache = EntityCache(**config)
+    return _default_cache
+
+
+def load_item(itempage: ItemPage, force: bool = False, cache: EntityCache = None, projection: Projection = None) -> ItemPage:
+    """Load the content of an ItemPage, going through the entity cache
+
+        This is a drop-in replacement for itempage.get(force=force).
+        If the item was already loaded (with a projection that covers
+        this one) and force is False, no work is done.
+    """
+    load_items([itempage], force=force, cache=cache, projection=projection)
+    return itempage
+
+
+def fill_item(itempage: ItemPage, content: dict) -> ItemPage:
+    """Use entity JSON that is already at hand (eg: returned by an edit) as the content of an item
+
+        The content is cached too, so the item is not fetched again.
+    """
+    _fill(itempage, content, None)
+    cache = default_cache()
+    if cache is not None:
+        cache.put(itempage.repo.sitename, itempage.title(), content.get("lastrevid", 0), content)
+    return itempage
+
+
+def forget(itempage: ItemPage) -> None:
+    """Drop the cached copy of an item, eg: after editing it"""
+    cache = default_cache()
+    if cache is not None:
+        cache.invalidate(itempage.repo.sitename, itempage.title())
+
+
+def load_items(
+    itempages: Iterable[ItemPage], force: bool = False, cache: EntityCache = None, projection: Projection = None
+) -> List[ItemPage]:
+    """Load the content of several ItemPages, batching all requests
+
+        Cached entities that are within max_age are used directly. The rest
+        are revalidated by revision ID, and only the ones that changed (or
+        were never cached) are downloaded, 50 at a time.
+
+        With a projection, only the parts of the entities it names are
+        fetched, and the ItemPages are filled with just those parts.
+    """
+    itempages = list(itempages)
+    if cache is None:
+        cache = default_cache()
+
+    pending = [page for page in itempages if force or not _is_loaded(page, projection)]
+    if not pending:
+        return itempages
+
+    if cache is None:
+        _download(pending, projection)
+        return itempages
+
+    by_site: Dict[object, List[ItemPage]] = {}
+    for page in pending:
+        by_site.setdefault(page.repo, []).append(page)
+
+    for repo, pages in by_site.items():
+        _load_from_cache(repo, pages, force, cache, projection)
+
+    return itempages
+
+
+def _is_loaded(page: ItemPage, projection: Optional[Projection]) -> bool:
+    return hasattr(page, "_content") and covers(getattr(page, "_projection", None), projection)
+
+
+def _load_from_cache(repo, pages: List[ItemPage], force: bool, cache: EntityCache, projection: Optional[Projection]) -> None:
+    site = repo.sitename
+    to_validate: Dict[str, Tuple[int, dict]] = {}
+    to_download: List[ItemPage] = []
+
+    download_projection = projection
+    for page in pages:
+        cached = cache.get(site, page.title(), projection)
+        if cached is None:
+            to_download.append(page)
+            stored, stored_projection = cache.projection(site, page.title())
+            if stored and download_projection is not None:
+                # Fetch what the cached copy had too, so that loads with either projection hit the cache
+                download_projection = download_projection.union(stored_projection)
+            continue
+        revid, content, validated_at = cached
+        if not force and cache.is_fresh(validated_at):
+            _fill(page, content, projection)
+            FetchCounter.record(from_cache=1)
+        else:
+            to_validate[page.title()] = (revid, content)
+
+    if to_validate:
+        current = current_revisions(repo, to_validate)
+        unchanged = []
+        for page in pages:
+            qid = page.title()
+            if qid not in to_validate:
+                continue
+            revid, content = to_validate[qid]
+            if current.get(qid) == revid:
+                _fill(page, content, projection)
+                unchanged.append(qid)
+            else:
+                to_download.append(page)
+        cache.touch(site, unchanged)
+
+    for page in _download(to_download, download_projection):
+        content = page._content
+        cache.put(site, page.title(), content.get("lastrevid", 0), content, page._projection)
+
+
+def _download(pages: List[ItemPage], projection: Optional[Projection] = None) -> List[ItemPage]:
+    """Fetch entities with wbgetentities, 50 at a time, and fill the pages"""
+    loaded = []
+    for start in range(0, len(pages), BATCH_SIZE):
+        batch = pages[start : start + BATCH_SIZE]
+        repo = batch[0].repo
+        ids = "|".join(page.title() for page in batch)
+        with endpoint(API):
+            if projection is None:
+                entities = repo.loadcontent({"ids": ids})
+            else:
+                params = {"action": "wbgetentities", "ids": ids, "props": "|".join(sorted(projection.props))}
+                if projection.languages is not None:
+                    params["languages"] = "|".join(sorted(projection.languages))
+                entities = repo.simple_request(**params).submit()["entities"]
+        FetchCounter.record(requests=1, downloaded=len(batch))
+        for page in batch:
+            content = entities.get(page.title())
+            if content is None or "missing" in content:
+                # Redirects and missing items are left to pywikibot to report
+                FetchCounter.record(requests=1)
+                with endpoint(API):
+                    page.get(force=True)
+                page._projection = None
+            else:
+                _fill(page, projection.apply(content) if projection is not None else content, projection)
+            loaded.append(page)
+    return loaded
+
+
+def _fill(page: ItemPage, content: dict, projection: Optional[Projection]) -> None:
+    # No API call is made when _content is already set
+    page._content = content
+    page._projection = projection
+    page.get()
+
+
+def current_revisions(repo, qids: Iterable[str]) -> Dict[str, int]:
+    """The latest revision ID of each of these items, using prop=info"""
+    qids = list(qids)
+    revisions = {}
+    for start in range(0, len(qids), BATCH_SIZE):
+        batch = qids[start : start + BATCH_SIZE]
+        request = repo.simple_request(action="query", prop="info", titles="|".join(batch))
+        with endpoint(API):
+            pages = request.submit()["query"]["pages"]
+        FetchCounter.record(requests=1, revalidated=len(batch))
+        # formatversion 1 returns a dict keyed by page ID, formatversion 2 a list
+        if isinstance(pages, dict):
+            pages = pages.values()
+        for page in pages:
+            if "missing" in page or "lastrevid" not in page:
+                continue
+            revisions[page["title"]] = page["lastrevid"]
+    return revisions
@@ -0,0 +1,219 @@
+"""Persistent cache for the results of scraping external sites
+
+    Results are stored parsed (eg: the title of an IMDb page, not the page
+    itself), keyed by (source, id). The source names both the site and what
+    was parsed out of it, eg: "imdb_title" or "imdb_episodes".
+
+    A result is trusted for ttl seconds. Misses (pages that could not be
+    parsed, or were not found) are cached too, for the shorter
+    negative_ttl. Once a result expires, the page is fetched again with
+    If-None-Match / If-Modified-Since, so a page that did not change costs
+    a 304 and no parsing.
+"""
+import json
+import os
+import time
+from typing import Any, Callable, Dict, Iterable, NamedTuple, Optional
+
+from network.client import ScrapingClient, default_client
+from .sqlite import SqliteStore, default_cache_dir
+
+DEFAULT_TTL = 7 * 24 * 60 * 60
+DEFAULT_NEGATIVE_TTL = 24 * 60 * 60
+
+# The error statuses that mean the page does not exist, and so are cached as misses
+MISSING_STATUSES = frozenset({404, 410})
+
+
+class ScrapeEntry(NamedTuple):
+    """A cached scrape result, with the validators of the page it came from"""
+
+    value: Any
+    etag: Optional[str]
+    last_modified: Optional[str]
+    expires_at: float
+
+    def is_fresh(self) -> bool:
+        return time.time() < self.expires_at
+
+    def conditional_headers(self) -> Optional[dict]:
+        """The headers to revalidate the page this result was parsed from"""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers or None
+
+
+class ScrapeCache(SqliteStore):
+    """An on-disk store of parsed scrape results
+
+        Arguments
+        ---------
+        path: str
+            The SQLite file to use. It is created if it does not exist.
+        ttl: float
+            The number of seconds a result is trusted without revalidation
+        negative_ttl: float
+            The number of seconds a miss (a None result) is trusted
+    """
+
+    SCHEMA = (
+        """CREATE TABLE IF NOT EXISTS scrapes (
+            source TEXT NOT NULL,
+            key TEXT NOT NULL,
+            value TEXT NOT NULL,
+            etag TEXT,
+            last_modified TEXT,
+            expires_at REAL NOT NULL,
+            PRIMARY KEY (source, key)
+        )""",
+    )
+
+    def __init__(self, path: str, ttl: float = DEFAULT_TTL, negative_ttl: float = DEFAULT_NEGATIVE_TTL):
+        super().__init__(path)
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+
+    def get(self, source: str, key: str) -> Optional[ScrapeEntry]:
+        """The cached entry for this ID, fresh or not, or None"""
+        row = self.connection().execute(
+            "SELECT value, etag, last_modified, expires_at FROM scrapes WHERE source = ? AND key = ?",
+            (source, str(key)),
+        ).fetchone()
+        if row is None:
+            return None
+        value, etag, last_modified, expires_at = row
+        return ScrapeEntry(json.loads(value), etag, last_modified, expires_at)
+
+    def put(self, source: str, key: str, value, etag: str = None, last_modified: str = None) -> None:
+        """Store a result, which expires after ttl (or negative_ttl if it is None)"""
+        ttl = self.negative_ttl if value is None else self.ttl
+        conn = self.connection()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO scrapes VALUES (?, ?, ?, ?, ?, ?)",
+                (source, str(key), json.dumps(value), etag, last_modified, time.time() + ttl),
+            )
+
+    def renew(self, source: str, key: str, entry: ScrapeEntry) -> None:
+        """Keep an entry for another TTL, once its page is known not to have changed"""
+        ttl = self.negative_ttl if entry.value is None else self.ttl
+        conn = self.connection()
+        with conn:
+            conn.execute(
+                "UPDATE scrapes SET expires_at = ? WHERE source = ? AND key = ?",
+                (time.time() + ttl, source, str(key)),
+            )
+
+    def invalidate(self, source: str, key: str) -> None:
+        """Drop the cached result for this ID"""
+        conn = self.connection()
+        with conn:
+            conn.execute("DELETE FROM scrapes WHERE source = ? AND key = ?", (source, str(key)))
+
+
+_default_cache = None
+_default_cache_config = {
+    "path": os.path.join(default_cache_dir(), "scrapes.sqlite3"),
+    "ttl": DEFAULT_TTL,
+    "negative_ttl": DEFAULT_NEGATIVE_TTL,
+    "enabled": True,
+}
+
+
+def configure(**kwargs) -> None:
+    """Configure the default scrape cache
+
+        Accepts the keyword arguments path, ttl and negative_ttl (see
+        ScrapeCache), and enabled. Passing enabled=False turns off caching,
+        and every lookup fetches the page.
+    """
+    global _default_cache
+    unknown = set(kwargs) - set(_default_cache_config)
+    if unknown:
+        raise ValueError(f"Unknown scrape cache options: {sorted(unknown)}")
+    _default_cache_config.update(kwargs)
+    _default_cache = None
+
+
+def default_cache() -> Optional[ScrapeCache]:
+    """The process-wide scrape cache, or None if caching is disabled"""
+    global _default_cache
+    if not _default_cache_config["enabled"]:
+        return None
+    if _default_cache is None:
+        config = dict(_default_cache_config)
+        del config["enabled"]
+        _default_cache = ScrapeCache(**config)
+    return _default_cache
+
+
+def scrape(
+    source: str,
+    key: str,
+    url: Callable[[str], str],
+    parse: Callable,
+    cache: ScrapeCache = None,
+    client: ScrapingClient = None,
+):
+    """The parsed result for one ID, from the cache if possible
+
+        url builds the URL of the page for an ID, and parse turns the
+        response into the result to cache. See scrape_many.
+    """
+    return scrape_many(source, [key], url, parse, cache=cache, client=client).get(key)
+
+
+def scrape_many(
+    source: str,
+    keys: Iterable[str],
+    url: Callable[[str], str],
+    parse: Callable,
+    cache: ScrapeCache = None,
+    client: ScrapingClient = None,
+) -> Dict[str, Any]:
+    """The parsed results for several IDs, fetching the ones that are not cached concurrently
+
+        If a page cannot be fetched at all, or the site answers with any
+        error other than the page not existing (eg: 429 Too Many Requests,
+        or a 5xx), the stale result (if any) is used and nothing is cached.
+    """
+    if cache is None:
+        cache = default_cache()
+    if client is None:
+        client = default_client()
+
+    results = {}
+    to_fetch = []
+    for key in dict.fromkeys(key for key in keys if key is not None):
+        entry = cache.get(source, key) if cache is not None else None
+        if entry is not None and entry.is_fresh():
+            results[key] = entry.value
+        else:
+            to_fetch.append((key, entry))
+
+    responses = client.fetch_many(
+        [url(key) for key, _ in to_fetch],
+        headers=[entry.conditional_headers() if entry is not None else None for _, entry in to_fetch],
+    )
+    for (key, entry), response in zip(to_fetch, responses):
+        stale = entry.value if entry is not None else None
+        if response is None or (not response.ok and response.status_code not in MISSING_STATUSES):
+            results[key] = stale
+        elif response.status_code == 304 and entry is not None:
+            results[key] = stale
+            cache.renew(source, key, entry)
+        else:
+            value = parse(response) if response.ok else None
+            results[key] = value
+            if cache is not None:
+                cache.put(
+                    source,
+                    key,
+                    value,
+                    etag=response.headers.get("ETag"),
+                    last_modified=response.headers.get("Last-Modified"),
+                )
+    return results
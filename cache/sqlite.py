@@ -0,0 +1,60 @@
+"""Shared plumbing for the on-disk caches
+
+    Every cache in this package is a single SQLite file. SQLite gives us
+    atomic writes and file locking for free, so one cache file can be
+    shared by several bot processes (and threads) at the same time.
+"""
+import os
+import sqlite3
+import threading
+
+
+class SqliteStore:
+    """Base class for a cache backed by a single SQLite database file
+
+        Subclasses provide the table definitions in SCHEMA. Connections
+        are opened lazily, one per thread, so instances can be shared
+        across threads.
+    """
+
+    SCHEMA = ()
+
+    def __init__(self, path: str, timeout: float = 30.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        with self.connection() as conn:
+            for statement in self.SCHEMA:
+                conn.execute(statement)
+
+    def connection(self) -> sqlite3.Connection:
+        """The SQLite connection for the current thread
+
+            The connection can be used as a context manager to run
+            statements in a single transaction.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout)
+            # WAL lets readers carry on while another process is writing
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def close(self) -> None:
+        """Close the connection for the current thread, if any"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def default_cache_dir() -> str:
+    """The directory under which caches are stored by default"""
+    base = os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache"))
+    return os.path.join(base, "wikidata-toolkit")
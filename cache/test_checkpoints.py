@@ -0,0 +1,34 @@
+import os
+import tempfile
+import unittest
+
+from .checkpoints import Checkpoint, CheckpointStore
+
+
+class CheckpointTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.store = CheckpointStore(os.path.join(self.tmpdir.name, "checkpoints.sqlite3"))
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_resume_skips_done_items(self):
+        checkpoint = Checkpoint("run", store=self.store)
+        checkpoint.record("Q1", {"failures": []})
+
+        resumed = Checkpoint("run", resume=True, store=self.store)
+        self.assertEqual(list(resumed.skip_done(["Q1", "Q2"], qid=str)), ["Q2"])
+        self.assertEqual(resumed.skipped, 1)
+        self.assertEqual(self.store.results("run"), {"Q1": {"failures": []}})
+
+    def test_fresh_run_starts_over(self):
+        Checkpoint("run", store=self.store).record("Q1")
+        Checkpoint("other", store=self.store).record("Q1")
+
+        self.assertEqual(len(Checkpoint("run", store=self.store)), 0)
+        self.assertEqual(len(Checkpoint("other", resume=True, store=self.store)), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from .entities import EntityCache, Projection
+
+
+class EntityCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "entities.sqlite3")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_put_and_get(self):
+        cache = EntityCache(self.path)
+        cache.put("wikidata:wikidata", "Q1", 42, {"id": "Q1", "lastrevid": 42})
+        revid, content, _ = cache.get("wikidata:wikidata", "Q1")
+        self.assertEqual(revid, 42)
+        self.assertEqual(content, {"id": "Q1", "lastrevid": 42})
+        self.assertIsNone(cache.get("wikidata:wikidata", "Q2"))
+        self.assertIsNone(cache.get("test:test", "Q1"))
+
+    def test_invalidate(self):
+        cache = EntityCache(self.path)
+        cache.put("wikidata:wikidata", "Q1", 1, {"id": "Q1"})
+        cache.invalidate("wikidata:wikidata", "Q1")
+        self.assertIsNone(cache.get("wikidata:wikidata", "Q1"))
+
+    def test_staleness(self):
+        cache = EntityCache(self.path, max_age=0)
+        cache.put("wikidata:wikidata", "Q1", 1, {"id": "Q1"})
+        _, _, validated_at = cache.get("wikidata:wikidata", "Q1")
+        self.assertFalse(cache.is_fresh(validated_at))
+
+        cache = EntityCache(self.path, max_age=3600)
+        self.assertTrue(cache.is_fresh(validated_at))
+
+    def test_evicts_least_recently_used(self):
+        cache = EntityCache(self.path, max_bytes=10 ** 9)
+        big = {"labels": {str(i): os.urandom(16).hex() for i in range(50)}}
+        for qid in ("Q1", "Q2", "Q3"):
+            cache.put("wikidata:wikidata", qid, 1, big)
+        # Q1 is now the most recently used
+        cache.get("wikidata:wikidata", "Q1")
+
+        cache.max_bytes = cache.size() - 1
+        cache.evict()
+        self.assertIsNotNone(cache.get("wikidata:wikidata", "Q1"))
+        self.assertIsNone(cache.get("wikidata:wikidata", "Q2"))
+        self.assertIsNotNone(cache.get("wikidata:wikidata", "Q3"))
+
+    def test_puts_keep_a_running_size(self):
+        cache = EntityCache(self.path, max_bytes=10 ** 9)
+        statements = []
+        cache.connection().set_trace_callback(statements.append)
+        for qid in ("Q1", "Q2", "Q1", "Q3"):
+            cache.put("wikidata:wikidata", qid, 1, {"labels": {qid: os.urandom(16).hex()}})
+        cache.invalidate("wikidata:wikidata", "Q3")
+        self.assertEqual(sum("SUM(size)" in statement for statement in statements), 1)
+        self.assertEqual(cache._size, EntityCache(self.path).size())
+
+        # Going over max_bytes still evicts
+        cache.max_bytes = cache._size
+        cache.put("wikidata:wikidata", "Q4", 1, {"labels": {"Q4": os.urandom(16).hex()}})
+        self.assertLessEqual(cache.size(), cache.max_bytes)
+        self.assertIsNone(cache.get("wikidata:wikidata", "Q2"))
+
+    def test_shared_between_instances(self):
+        writer = EntityCache(self.path)
+        reader = EntityCache(self.path)
+        writer.put("wikidata:wikidata", "Q1", 7, {"id": "Q1"})
+        self.assertEqual(reader.get("wikidata:wikidata", "Q1")[0], 7)
+
+    def test_projected_entries_only_serve_what_they_cover(self):
+        cache = EntityCache(self.path)
+        english = Projection(frozenset({"info", "claims", "labels"}), frozenset({"en"}), frozenset({"P31", "P179"}))
+        cache.put("wikidata:wikidata", "Q1", 3, {"id": "Q1"}, english)
+        self.assertIsNotNone(cache.get("wikidata:wikidata", "Q1", english))
+        self.assertIsNotNone(cache.get("wikidata:wikidata", "Q1", english._replace(properties=frozenset({"P31"}))))
+        self.assertIsNone(cache.get("wikidata:wikidata", "Q1", english._replace(languages=frozenset({"en", "fr"}))))
+        self.assertIsNone(cache.get("wikidata:wikidata", "Q1", english._replace(properties=None)))
+        self.assertIsNone(cache.get("wikidata:wikidata", "Q1"))
+        self.assertEqual(cache.projection("wikidata:wikidata", "Q1"), (True, english))
+
+        # Whole entities serve any projection
+        cache.put("wikidata:wikidata", "Q1", 4, {"id": "Q1"})
+        self.assertEqual(cache.get("wikidata:wikidata", "Q1", english)[0], 4)
+
+    def test_projection_keys(self):
+        english = Projection(frozenset({"claims", "labels"}), frozenset({"en"}), frozenset({"P31"}))
+        everything = Projection(frozenset({"claims"}))
+        for projection in (english, everything, english.union(everything)):
+            self.assertEqual(Projection.from_key(projection.key()), projection)
+        self.assertIsNone(Projection.from_key(""))
+        self.assertEqual(english.union(everything), Projection(frozenset({"claims", "labels"})))
+        self.assertEqual(english.apply({"claims": {"P31": [1], "P17": [2]}}), {"claims": {"P31": [1]}})
+
+    def test_upgrades_caches_without_projections(self):
+        conn = sqlite3.connect(self.path)
+        with conn:
+            conn.execute(
+                "CREATE TABLE entities (site TEXT NOT NULL, qid TEXT NOT NULL, revid INTEGER NOT NULL, content BLOB NOT NULL,"
+                " size INTEGER NOT NULL, validated_at REAL NOT NULL, accessed_at REAL NOT NULL, PRIMARY KEY (site, qid))"
+            )
+        conn.close()
+        cache = EntityCache(self.path)
+        cache.put("wikidata:wikidata", "Q1", 1, {"id": "Q1"})
+        self.assertEqual(cache.projection("wikidata:wikidata", "Q1"), (True, None))
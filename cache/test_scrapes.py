@@ -0,0 +1,97 @@
+import os
+import tempfile
+import unittest
+
+from .scrapes import ScrapeCache, scrape_many
+
+
+class FakeResponse:
+    def __init__(self, status_code, text="", headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers or {}
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+
+class FakeClient:
+    """Answers every URL with the same response, and records the requests"""
+
+    def __init__(self, response):
+        self.response = response
+        self.requests = []
+
+    def fetch_many(self, urls, workers=8, headers=None):
+        urls = list(urls)
+        self.requests.extend(zip(urls, headers))
+        return [self.response for _ in urls]
+
+
+def url(key):
+    return f"https://example.com/{key}"
+
+
+def parse(response):
+    return response.text or None
+
+
+class ScrapeCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "scrapes.sqlite3")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_fresh_results_are_not_fetched(self):
+        cache = ScrapeCache(self.path)
+        client = FakeClient(FakeResponse(200, "Title", {"ETag": '"abc"'}))
+        first = scrape_many("title", ["a", "b", "a"], url, parse, cache=cache, client=client)
+        second = scrape_many("title", ["a", "b"], url, parse, cache=cache, client=client)
+        self.assertEqual(first, {"a": "Title", "b": "Title"})
+        self.assertEqual(second, first)
+        self.assertEqual(len(client.requests), 2)
+
+    def test_misses_expire_sooner(self):
+        cache = ScrapeCache(self.path, ttl=3600, negative_ttl=0)
+        client = FakeClient(FakeResponse(404))
+        scrape_many("title", ["a"], url, parse, cache=cache, client=client)
+        scrape_many("title", ["a"], url, parse, cache=cache, client=client)
+        self.assertEqual(len(client.requests), 2)
+
+    def test_expired_results_are_revalidated(self):
+        cache = ScrapeCache(self.path, ttl=0)
+        scrape_many("title", ["a"], url, parse, cache=cache, client=FakeClient(
+            FakeResponse(200, "Title", {"ETag": '"abc"', "Last-Modified": "Sat, 01 Jan 2022 00:00:00 GMT"})
+        ))
+
+        client = FakeClient(FakeResponse(304))
+        results = scrape_many("title", ["a"], url, parse, cache=cache, client=client)
+        self.assertEqual(results, {"a": "Title"})
+        (_, headers), = client.requests
+        self.assertEqual(headers["If-None-Match"], '"abc"')
+        self.assertEqual(headers["If-Modified-Since"], "Sat, 01 Jan 2022 00:00:00 GMT")
+
+    def test_server_errors_are_not_cached(self):
+        cache = ScrapeCache(self.path)
+        results = scrape_many("title", ["a"], url, parse, cache=cache, client=FakeClient(FakeResponse(503)))
+        self.assertEqual(results, {"a": None})
+        self.assertIsNone(cache.get("title", "a"))
+
+    def test_rate_limits_keep_the_stale_result(self):
+        cache = ScrapeCache(self.path, ttl=0)
+        scrape_many("title", ["a"], url, parse, cache=cache, client=FakeClient(FakeResponse(200, "Title")))
+        for status in (429, 403):
+            results = scrape_many("title", ["a"], url, parse, cache=cache, client=FakeClient(FakeResponse(status)))
+            self.assertEqual(results, {"a": "Title"})
+            self.assertEqual(cache.get("title", "a").value, "Title")
+
+        results = scrape_many("title", ["a"], url, parse, cache=cache, client=FakeClient(FakeResponse(410)))
+        self.assertEqual(results, {"a": None})
+        self.assertIsNone(cache.get("title", "a").value)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,6 +4,7 @@ from pywikibot import Site, ItemPage
 from pywikibot.data.api import APIError
 from pywikibot.exceptions import OtherPageSaveError
 
+from cache import Checkpoint
 from sparql.queries import items_with_missing_labels_with_title
 
 
@@ -14,13 +15,23 @@ from sparql.queries import items_with_missing_labels_with_title
     default=False,
     help="Only print out the changes, don't run any commands",
 )
-def main(dry=False):
+@click.option(
+    "--resume",
+    is_flag=True,
+    default=False,
+    help="Skip the items already fixed by an interrupted run",
+)
+def main(dry=False, resume=False):
     dry_str = ""
     if dry:
         print("Running in dry-run mode, will not implement any changes")
         dry_str = "[DRY-RUN MODE] "
     repo = Site().data_repository()
-    for item_link, item_id, title in items_with_missing_labels_with_title():
+    checkpoint = None if dry else Checkpoint("fix_missing_labels", resume=resume)
+    rows = items_with_missing_labels_with_title(checkpoint)
+    if checkpoint is not None:
+        rows = checkpoint.skip_done(rows, qid=lambda row: str(row[1]))
+    for item_link, item_id, title in rows:
         print(
             f"{dry_str} ( {str(item_link).ljust(40, ' ')} ) Fixing {str(item_id).ljust(9, ' ')}: {title}"
         )
@@ -29,15 +40,20 @@ def main(dry=False):
 
         # Labels have a character limit, so ignore if trying to add it will result in an error
         if len(title) >= 250:
+            checkpoint.record(str(item_id), "skipped")
             continue
 
         item = ItemPage(repo, item_id)
         item.get()
         try:
             item.editLabels({"en": title})
+            checkpoint.record(str(item_id), "fixed")
         except (APIError, OtherPageSaveError) as e:
             print(f"An error occurred while adding label for {item_id}: {e}")
 
+    if checkpoint is not None and checkpoint.skipped:
+        print(f"Skipped {checkpoint.skipped} items fixed by an earlier run")
+
 
 if __name__ == "__main__":
     main()
@@ -20,12 +20,13 @@ def main(dry=False):
         print("Running in dry-run mode, will not implement any changes")
         dry_str = "[DRY-RUN MODE] "
     repo = Site().data_repository()
-    seen = set()
+    bgg_ids = {}
     for board_game_id, bgg_id in board_games_with_missing_labels():
-        if board_game_id in seen:
-            continue
-        seen.add(board_game_id)
-        board_game_name = utils.bgg_title(bgg_id)
+        bgg_ids.setdefault(board_game_id, bgg_id)
+    # Fetch all the names up front, in parallel
+    bgg_titles = utils.bgg_titles(bgg_ids.values())
+    for board_game_id, bgg_id in bgg_ids.items():
+        board_game_name = bgg_titles.get(bgg_id)
         if board_game_name is None:
             print(f"Unable to fetch name for {board_game_id}.")
             continue
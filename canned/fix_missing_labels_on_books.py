@@ -2,6 +2,7 @@
 import click
 from pywikibot import Site, ItemPage, WbMonolingualText, Claim
 
+from cache import Checkpoint
 from sparql.queries import books_with_missing_labels_with_title
 import properties.wikidata_properties as wp
 
@@ -13,13 +14,20 @@ import properties.wikidata_properties as wp
     default=False,
     help="Only print out the changes, don't run any commands",
 )
-def main(dry=False):
+@click.option(
+    "--resume",
+    is_flag=True,
+    default=False,
+    help="Carry on from the last page of results of an interrupted run",
+)
+def main(dry=False, resume=False):
     dry_str = ""
     if dry:
         print("Running in dry-run mode, will not implement any changes")
         dry_str = "[DRY-RUN MODE] "
     repo = Site().data_repository()
-    for book_id, title in books_with_missing_labels_with_title():
+    checkpoint = None if dry else Checkpoint("fix_missing_labels_on_books", resume=resume)
+    for book_id, title in books_with_missing_labels_with_title(checkpoint):
         print(
             f"{dry_str}Setting label='{title}' for {book_id} ( https://www.wikidata.org/wiki/{book_id} )"
         )
@@ -5,6 +5,7 @@
 import click
 from pywikibot import Site, ItemPage, WbMonolingualText, Claim
 
+from cache import Checkpoint
 from sparql.queries import movies_with_missing_titles
 import properties.wikidata_properties as wp
 
@@ -16,13 +17,20 @@ import properties.wikidata_properties as wp
     default=False,
     help="Only print out the changes, don't run any commands",
 )
-def main(dry=False):
+@click.option(
+    "--resume",
+    is_flag=True,
+    default=False,
+    help="Carry on from the last page of results of an interrupted run",
+)
+def main(dry=False, resume=False):
     dry_str = ""
     if dry:
         print("Running in dry-run mode, will not implement any changes")
         dry_str = "[DRY-RUN MODE] "
     repo = Site().data_repository()
-    for movie_id, movie_label in movies_with_missing_titles():
+    checkpoint = None if dry else Checkpoint("fix_missing_titles_on_movies", resume=resume)
+    for movie_id, movie_label in movies_with_missing_titles(checkpoint):
         print(
             f"{dry_str}Setting title='{movie_label}' for {movie_id} ( https://www.wikidata.org/wiki/{movie_id} )"
         )
@@ -0,0 +1,19 @@
+import click
+
+
+@click.command()
+@click.argument("plan", type=click.Path(exists=True, dir_okay=False))
+@click.option("--interactive", is_flag=True, default=False, help="Prompt for confirmation before applying any fix")
+def apply_fixes(plan, interactive=False):
+    """Apply (or resume applying) the fixes saved in a fix plan by an --accumulate run"""
+    from bots import AccumulatingConstraintFixerBot
+    from bots.plan import apply_plan
+
+    bot = AccumulatingConstraintFixerBot([], plan=plan, always=(not interactive))
+    fixed, total = apply_plan(bot, bot.plan)
+    click.echo(f"Fixed {fixed}/{total} constraint failures")
+
+
+if __name__ == "__main__":
+    # pylint: disable=no-value-for-parameter
+    apply_fixes()
@@ -1,6 +1,5 @@
 import click
 
-import commands
 from .click_utils import validate_item_id
 
 @click.command()
@@ -10,8 +9,14 @@ from .click_utils import validate_item_id
 @click.option("--accumulate", is_flag=True, default=False, help="Accumulate all fixes before applying them")
 @click.option("--interactive", is_flag=True, default=False, help="Prompt for confirmation before applying any fix")
 @click.option("--filter", default="", help="Comma separated property names/tags to filter")
-def check_tv_show(tvshow_id=None, child_type="all", autofix=False, accumulate=False, interactive=False, filter=""):
-    commands.check_tv_show(tvshow_id, child_type, autofix=autofix, accumulate=accumulate, interactive=interactive, filter=filter)
+@click.option("--workers", type=click.IntRange(min=1), default=1, help="Number of items to check concurrently")
+@click.option("--resume", is_flag=True, default=False, help="Skip the items already treated by an interrupted run with the same arguments")
+@click.option("--profile", type=click.Path(dir_okay=False), default=None, help="Write a JSON report of the time spent in each constraint to this path")
+@click.option("--compact", is_flag=True, default=False, help="Keep compact snapshots of the items instead of full pages, for large shows")
+def check_tv_show(tvshow_id=None, child_type="all", autofix=False, accumulate=False, interactive=False, filter="", workers=1, resume=False, profile=None, compact=False):
+    import commands
+
+    commands.check_tv_show(tvshow_id, child_type, autofix=autofix, accumulate=accumulate, interactive=interactive, filter=filter, workers=workers, resume=resume, profile=profile, compact=compact)
 
 
 if __name__ == "__main__":
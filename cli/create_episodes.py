@@ -1,6 +1,4 @@
 import click
-import commands
-from pywikibot import Site
 
 from .click_utils import validate_item_id
 
@@ -12,7 +10,11 @@ from .click_utils import validate_item_id
 @click.option("--quickstatements", help="Print out QuickStatements for creating the items, instead of creating the items directly on Wikidata.", is_flag=True, default=False)
 @click.option("--dry", help="Enable dry run mode. Does not create any items on Wikidata.", is_flag=True, default=False)
 def create_episodes(series_id, season_id, titles_file, quickstatements=False, dry=False):
-    Site().login()
+    import commands
+    from pywikibot import Site
+
+    if not (quickstatements or dry):
+        Site().login()
     try:
         commands.create_episodes(series_id, season_id, titles_file, quickstatements, dry)
     except commands.errors.SuspiciousTitlesError as e:
@@ -1,7 +1,5 @@
 import click
-from pywikibot import Site
 
-import commands
 from .click_utils import validate_item_id
 
 
@@ -11,7 +9,11 @@ from .click_utils import validate_item_id
 @click.option("--quickstatements", help="Print out QuickStatements for creating the items, instead of creating the items directly on Wikidata.", is_flag=True, default=False)
 @click.option("--dry", help="Enable dry run mode. Does not create any items on Wikidata.", is_flag=True, default=False)
 def create_seasons(series_id, number_of_seasons, quickstatements=False, dry=False):
-    Site().login()
+    import commands
+    from pywikibot import Site
+
+    if not (quickstatements or dry):
+        Site().login()
     commands.create_seasons(series_id, number_of_seasons, quickstatements, dry)
 
 
@@ -1,5 +1,4 @@
 import click
-import commands
 
 @click.command()
 @click.argument("url")
@@ -9,6 +8,8 @@ import commands
 @click.option("--skip-titles", help="A list of titles to skip (not counted in episode numbers)", default=None)
 @click.option("--skip-first-n", help="Skip the first n rows found", default=0)
 def list_episodes(url, episode_counts, title, outdir, skip_titles, skip_first_n):
+    import commands
+
     commands.list_episodes(url, episode_counts, title, outdir, skip_titles, skip_first_n)
 
 
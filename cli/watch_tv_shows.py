@@ -0,0 +1,35 @@
+import click
+
+from .click_utils import validate_item_id
+
+
+def validate_item_ids(ctx, param, item_ids):
+    return [validate_item_id(ctx, param, item_id) for item_id in item_ids]
+
+
+@click.command()
+@click.argument("tvshow_ids", nargs=-1, required=True, callback=validate_item_ids)
+@click.option("--autofix", is_flag=True, default=False, help="Fix constraint violations")
+@click.option("--interactive", is_flag=True, default=False, help="Prompt for confirmation before applying any fix")
+@click.option("--filter", default="", help="Comma separated property names/tags to filter")
+@click.option("--stream-url", default=None, help="URL of the recentchange event stream (default: the Wikimedia one)")
+@click.option("--batch-size", type=click.IntRange(min=1), default=50, help="Largest number of edited items checked at once")
+@click.option("--max-wait", type=float, default=30.0, help="Seconds an edited item can wait for its batch to fill up")
+def watch_tv_shows(tvshow_ids, autofix=False, interactive=False, filter="", stream_url=None, batch_size=50, max_wait=30.0):
+    import commands
+    from network.events import RECENTCHANGE_URL
+
+    commands.watch_tv_shows(
+        tvshow_ids,
+        autofix=autofix,
+        interactive=interactive,
+        filter=filter,
+        url=stream_url or RECENTCHANGE_URL,
+        max_batch=batch_size,
+        max_wait=max_wait,
+    )
+
+
+if __name__ == "__main__":
+    # pylint: disable=no-value-for-parameter
+    watch_tv_shows()
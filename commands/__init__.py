@@ -3,3 +3,5 @@ from .create_episodes import create_episodes
 from .create_seasons import create_seasons
 from .list_episodes import list_episodes
 from .check_tv_show import check_tv_show
+from .create_show import create_show
+from .watch_tv_shows import watch_tv_shows
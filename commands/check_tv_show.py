@@ -1,13 +1,15 @@
 """Check constraints for season/episodes of a TV show"""
+import os
 
 from pywikibot import ItemPage, Site
-from pywikibot.pagegenerators import WikidataSPARQLPageGenerator
 
 from bots import getbot
+from cache import Checkpoint
+from sparql.client import select_items
 from sparql.query_builder import generate_sparql_query
 import properties.wikidata_properties as wp
 
-def check_tv_show(tvshow_id=None, child_type="all", autofix=False, accumulate=False, interactive=False, filter=""):
+def check_tv_show(tvshow_id=None, child_type="all", autofix=False, accumulate=False, interactive=False, filter="", workers=1, resume=False, profile=None, compact=False):
     """Check constraints for season/episodes of this TV show
 
     Arguments
@@ -25,6 +27,18 @@ def check_tv_show(tvshow_id=None, child_type="all", autofix=False, accumulate=Fa
     filter: str
         a comma-separated list of properties in the format P###.
         Only edits for these properties will be applied.
+    workers: int
+        the number of items to check concurrently
+    resume: bool
+        whether or not to skip the items already treated by an earlier,
+        interrupted run with the same arguments
+    profile: str
+        if given, the path of a JSON report of the time spent in each
+        constraint. When several kinds of items are checked, the kind
+        (eg: Q21191270) is added to the name of each report.
+    compact: bool
+        whether or not to check compact snapshots of the items (see
+        model/snapshot.py) rather than full pages
     """
     if child_type == "episode":
         instance_types = [wp.TELEVISION_SERIES_EPISODE]
@@ -41,8 +55,25 @@ def check_tv_show(tvshow_id=None, child_type="all", autofix=False, accumulate=Fa
             wp.INSTANCE_OF.pid : instance_of_type
         }
         query = generate_sparql_query(key_val_pairs)
-        gen = WikidataSPARQLPageGenerator(query)
+        gen = select_items(query, Site().data_repository())
         if instance_of_type == wp.TELEVISION_SERIES:
             gen = [ItemPage(Site().data_repository(), tvshow_id)]
-        bot = getbot(gen, autofix=autofix, accumulate=accumulate, always=(not interactive), property_filter=filter)
+        mode = ("accumulate" if accumulate else "fix") if autofix else "check"
+        run_id = f"check_tv_show-{tvshow_id}-{instance_of_type}-{mode}-{filter}"
+        checkpoint = Checkpoint(run_id, resume=resume)
+        profile_path = profile
+        if profile is not None and len(instance_types) > 1:
+            root, ext = os.path.splitext(profile)
+            profile_path = f"{root}-{instance_of_type}{ext}"
+        bot = getbot(
+            gen,
+            autofix=autofix,
+            accumulate=accumulate,
+            always=(not interactive),
+            property_filter=filter,
+            workers=workers,
+            checkpoint=checkpoint,
+            profile=profile_path,
+            compact=compact,
+        )
         bot.run()
@@ -3,6 +3,7 @@ import csv
 from pywikibot import ItemPage, Site
 
 import properties.wikidata_properties as wp
+from cache import load_item
 from utils import RepoUtils
 from .errors import SuspiciousTitlesError
 
@@ -44,60 +45,52 @@ def create_episode(series_id, season_id, title, series_ordinal, season_ordinal,
 
     Returns
     -------
-    episode_id: str
-        The Wiki ID of the episode item
+    episode: ItemPage
+        The episode that was created, with its content already loaded.
+        None in dry-run mode.
     """
     dry_str = "[DRY-RUN] " if dry else ""
     print(f"{dry_str}Creating episode with label='{title}'")
-
-    episode = None
-    if not dry:
-        repoutil = RepoUtils(Site().data_repository())
-
-        season = ItemPage(repoutil.repo, season_id)
-        season.get()
-
-        # Check if season has part_of_the_series set to series_id
-        if wp.PART_OF_THE_SERIES.pid not in season.claims:
-            raise ValueError(f"The season {season_id} does not have a PART_OF_THE_SERIES ({wp.PART_OF_THE_SERIES.pid} property). Check the input series and season IDs for correctness.")
-        actual_series_id = str(season.claims[wp.PART_OF_THE_SERIES.pid][0].getTarget().getID())
-        if actual_series_id != series_id:
-            raise ValueError(f"The season {season_id} has PART_OF_THE_SERIES={actual_series_id} but expected={series_id}. Check the input series and season IDs for correctness.")
-
-        episode = ItemPage(repoutil.repo)
-
-        episode.editLabels({"en": title}, summary="Setting label")
-        print(f"Created a new Item: {episode.getID()}")
-
     print(f"{dry_str}Setting {wp.INSTANCE_OF}={wp.TELEVISION_SERIES_EPISODE}")
-    if not dry:
-        instance_claim = repoutil.new_claim(wp.INSTANCE_OF.pid)
-        instance_claim.setTarget(ItemPage(repoutil.repo, wp.TELEVISION_SERIES_EPISODE))
-        episode.addClaim(instance_claim, summary=f"Setting {wp.INSTANCE_OF.pid}")
-
     print(f"{dry_str}Setting {wp.PART_OF_THE_SERIES}={series_id}, with {wp.SERIES_ORDINAL}={series_ordinal}")
-    if not dry:
-        series_claim = repoutil.new_claim(wp.PART_OF_THE_SERIES.pid)
-        series_claim.setTarget(ItemPage(repoutil.repo, series_id))
-
-        series_ordinal_claim = repoutil.new_claim(wp.SERIES_ORDINAL.pid)
-        series_ordinal_claim.setTarget(series_ordinal)
-        series_claim.addQualifier(series_ordinal_claim)
-
-        episode.addClaim(series_claim, summary=f"Setting {wp.PART_OF_THE_SERIES.pid}")
-
     print(f"{dry_str}Setting {wp.SEASON}={season_id}, with {wp.SERIES_ORDINAL}={season_ordinal}")
-    if not dry:
-        season_claim = repoutil.new_claim(wp.SEASON.pid)
-        season_claim.setTarget(ItemPage(repoutil.repo, season_id))
-
-        season_ordinal_claim = repoutil.new_claim(wp.SERIES_ORDINAL.pid)
-        season_ordinal_claim.setTarget(season_ordinal)
-        season_claim.addQualifier(season_ordinal_claim)
-
-        episode.addClaim(season_claim, summary=f"Setting {wp.SEASON.pid}")
-
-    return episode.getID() if episode is not None else "Q-1"
+    if dry:
+        return None
+
+    repoutil = RepoUtils(Site().data_repository())
+
+    season = ItemPage(repoutil.repo, season_id)
+    load_item(season)
+
+    # Check if season has part_of_the_series set to series_id
+    if wp.PART_OF_THE_SERIES.pid not in season.claims:
+        raise ValueError(f"The season {season_id} does not have a PART_OF_THE_SERIES ({wp.PART_OF_THE_SERIES.pid} property). Check the input series and season IDs for correctness.")
+    actual_series_id = str(season.claims[wp.PART_OF_THE_SERIES.pid][0].getTarget().getID())
+    if actual_series_id != series_id:
+        raise ValueError(f"The season {season_id} has PART_OF_THE_SERIES={actual_series_id} but expected={series_id}. Check the input series and season IDs for correctness.")
+
+    instance_claim = repoutil.new_claim(
+        wp.INSTANCE_OF.pid, ItemPage(repoutil.repo, wp.TELEVISION_SERIES_EPISODE)
+    )
+    series_claim = repoutil.new_claim(
+        wp.PART_OF_THE_SERIES.pid,
+        ItemPage(repoutil.repo, series_id),
+        qualifiers={wp.SERIES_ORDINAL.pid: series_ordinal},
+    )
+    season_claim = repoutil.new_claim(
+        wp.SEASON.pid,
+        season,
+        qualifiers={wp.SERIES_ORDINAL.pid: season_ordinal},
+    )
+    # A single edit creates the item with its label and claims
+    episode = repoutil.new_item(
+        labels={"en": title},
+        descriptions=None,
+        claims=[instance_claim, series_claim, season_claim],
+        summary=f"Creating episode {season_ordinal} of {season_id}",
+    )
+    print(f"Created a new Item: {episode.getID()}")
+    return episode
 
 
 def create_episodes(series_id, season_id, titles_file, quickstatements=False, dry=False, confirm_titles=False):
@@ -107,7 +100,7 @@ def create_episodes(series_id, season_id, titles_file, quickstatements=False, dr
     if maybe_erroneous_titles and not confirm_titles:
         raise SuspiciousTitlesError(
             "The following titles have an uncommon character in them: \n"
-            + "\n".join([" * {t}" for t in maybe_erroneous_titles])
+            + "\n".join([f" * {t}" for t in maybe_erroneous_titles])
         )
 
     episode_ids = []
@@ -115,16 +108,16 @@ def create_episodes(series_id, season_id, titles_file, quickstatements=False, dr
         if quickstatements:
             create_episode_quickstatements(series_id, season_id, title, series_ordinal, season_ordinal)
         else:
-            episode_id = create_episode(series_id, season_id, title, series_ordinal, season_ordinal, dry)
-            episode_ids.append(episode_id)
+            episode = create_episode(series_id, season_id, title, series_ordinal, season_ordinal, dry)
+            episode_ids.append(episode.getID() if episode is not None else "Q-1")
 
     return episode_ids
 
 def check_erroneous_titles(titles):
-    uncommon_chars = set("[", "]")
+    uncommon_chars = set("[]")
     maybe_erroneous_titles = [
         title
-        for title in titles
+        for _, _, title in titles
         if any(c in title for c in uncommon_chars)
     ]
     return maybe_erroneous_titles
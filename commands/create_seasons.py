@@ -36,36 +36,36 @@ def create_season(series_id: str, label: str, descr: str, ordinal: int, dry: boo
 
     Returns
     -------
-    season_id: str
-        The Wiki ID of the season that was created
+    season: ItemPage
+        The season that was created, with its content already loaded.
+        None in dry-run mode.
     """
     dry_str = "[DRY-RUN] " if dry else ""
     repoutil = RepoUtils(Site().data_repository())
 
-    season = None
-
     print(f"{dry_str}Creating season with\n\tlabel='{label}'\n\tdescription='{descr}'")
-    if not dry:
-        season = repoutil.new_item(labels={"en": label}, descriptions={"en": descr})
-        print(f"Created a new Item: {season.getID()}")
-
     print(f"{dry_str}Setting {wp.INSTANCE_OF}={wp.TELEVISION_SERIES_SEASON}")
-    if not dry:
-        instance_claim = repoutil.new_claim(wp.INSTANCE_OF.pid)
-        instance_claim.setTarget(ItemPage(repoutil.repo, wp.TELEVISION_SERIES_SEASON))
-        season.addClaim(instance_claim, summary=f"Setting {wp.INSTANCE_OF.pid}")
-
-
     print(f"{dry_str}Setting {wp.PART_OF_THE_SERIES}={series_id}, with {wp.SERIES_ORDINAL.pid}={ordinal}")
-    if not dry:
-        series_claim = repoutil.new_claim(wp.PART_OF_THE_SERIES.pid)
-        series_claim.setTarget(ItemPage(repoutil.repo, series_id))
-        season_ordinal = repoutil.new_claim(wp.SERIES_ORDINAL.pid)
-        season_ordinal.setTarget(str(ordinal))
-        series_claim.addQualifier(season_ordinal)
-        season.addClaim(series_claim, summary=f"Setting {wp.PART_OF_THE_SERIES.pid}")
-
-    return season.getID() if season is not None else "Q-1"
+    if dry:
+        return None
+
+    instance_claim = repoutil.new_claim(
+        wp.INSTANCE_OF.pid, ItemPage(repoutil.repo, wp.TELEVISION_SERIES_SEASON)
+    )
+    series_claim = repoutil.new_claim(
+        wp.PART_OF_THE_SERIES.pid,
+        ItemPage(repoutil.repo, series_id),
+        qualifiers={wp.SERIES_ORDINAL.pid: str(ordinal)},
+    )
+    # A single edit creates the item with its label, description and claims
+    season = repoutil.new_item(
+        labels={"en": label},
+        descriptions={"en": descr},
+        claims=[instance_claim, series_claim],
+        summary=f"Creating season {ordinal} of {series_id}",
+    )
+    print(f"Created a new Item: {season.getID()}")
+    return season
 
 
 def create_seasons(series_id, number_of_seasons, quickstatements=False, dry=False):
@@ -100,7 +100,7 @@ def create_seasons(series_id, number_of_seasons, quickstatements=False, dry=Fals
         if quickstatements:
             create_season_quickstatements(series_id, label, descr, i)
         else:
-            season_id = create_season(series_id, label, descr, i, dry)
-            season_ids.append(season_id)
+            season = create_season(series_id, label, descr, i, dry)
+            season_ids.append(season.getID() if season is not None else "Q-1")
 
     return season_ids
@@ -0,0 +1,170 @@
+"""Create all seasons and episodes of a TV show, and validate them as they are created"""
+import glob
+import queue
+import threading
+from typing import Iterator, List
+
+from pywikibot import ItemPage, Site
+
+import properties.wikidata_properties as wp
+from bots import ConstraintFixerBot
+from cache import load_item
+from model.series_graph import SeriesGraph
+from network.scheduler import EditScheduler
+from .create_episodes import check_erroneous_titles, create_episode, read_titles
+from .create_seasons import create_season
+from .errors import SuspiciousTitlesError
+
+
+def create_show(series_id, titles_dir, dry=False, confirm_titles=False):
+    """Create the seasons and episodes of a TV show from a directory of CSV files
+
+        Every CSV file in titles_dir holds the episodes of one season, in
+        the format expected by create_episodes. Files are taken in sorted
+        order, so the first file is season 1.
+
+        Creations are pipelined: all seasons are created first, then the
+        episodes, one season after another. Items are checked (and fixed)
+        in the same order as check_tv_show checks a whole show, the series,
+        then each season followed by its episodes, as soon as the items they
+        link to exist, while the next ones are being created. All edits, creations and fixes alike, go through one
+        EditScheduler, so the run is limited by the edit rate only.
+
+    Arguments
+    ---------
+    series_id: str
+        The Wiki ID of the series ItemPage
+    titles_dir: str
+        The directory with one CSV file of episode titles per season
+    dry: bool
+        Whether or not this function should run in dry-run mode.
+        In dry-run mode, no real changes are made to WikiData, they are only
+        logged to stdout.
+    confirm_titles: bool
+        If True, create episodes even if some of their titles look suspicious
+
+    Returns
+    -------
+    season_ids: List[str]
+        The Wiki IDs of the seasons that were created
+    episode_ids: List[str]
+        The Wiki IDs of the episodes that were created
+    """
+    files = sorted(glob.glob(f"{titles_dir}/*.csv"))
+    seasons = [read_titles(season_file) for season_file in files]
+
+    maybe_erroneous_titles = [
+        title for titles in seasons for title in check_erroneous_titles(titles)
+    ]
+    if maybe_erroneous_titles and not confirm_titles:
+        raise SuspiciousTitlesError(
+            "The following titles have an uncommon character in them: \n"
+            + "\n".join([f" * {t}" for t in maybe_erroneous_titles])
+        )
+
+    repo = Site().data_repository()
+    series = ItemPage(repo, series_id)
+    load_item(series)
+    series_label = series.labels["en"]
+
+    if dry:
+        for i, titles in enumerate(seasons, start=1):
+            create_season(series_id, f"{series_label}, season {i}", f"season {i} of {series_label}", i, dry=True)
+            for series_ordinal, season_ordinal, title in titles:
+                create_episode(series_id, "Q-1", title, series_ordinal, season_ordinal, dry=True)
+        return [], []
+
+    with EditScheduler() as scheduler:
+        pipeline = CreationPipeline(series, series_label, seasons, scheduler)
+        pipeline.start()
+        bot = ConstraintFixerBot(pipeline.created(), always=True, prefetch=False, edit_scheduler=scheduler)
+        bot.run()
+    return pipeline.season_ids, pipeline.episode_ids
+
+
+class CreationPipeline:
+    """Creates the items of a show on a background thread, and hands them over for validation
+
+        Items are handed over parents first, so that they are fixed before
+        their parts inherit properties (eg: the country of origin) from
+        them: the series once all seasons have been created, then each
+        season once all of its episodes have been created, followed by its
+        episodes. An episode is only handed over once the next episode has
+        been created, so that 'followed by' can be fixed.
+
+        Created items are added to the SeriesGraph of the series directly,
+        since the query service takes a while to pick them up.
+    """
+
+    def __init__(self, series: ItemPage, series_label: str, seasons: List[list], scheduler: EditScheduler):
+        self.series = series
+        self.series_label = series_label
+        self.seasons = seasons
+        self.scheduler = scheduler
+        self.graph = SeriesGraph.for_series(series.title(), series.repo)
+        self.season_ids: List[str] = []
+        self.episode_ids: List[str] = []
+        self._created = queue.Queue()
+        self._thread = threading.Thread(target=self._create_all, name="create", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def created(self) -> Iterator[ItemPage]:
+        """The created items, as soon as they are ready to be validated"""
+        while True:
+            item = self._created.get()
+            if item is None:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+
+    def _create_all(self) -> None:
+        series_id = self.series.title()
+        try:
+            season_items = []
+            for i in range(1, len(self.seasons) + 1):
+                season = self.scheduler.run(
+                    create_season,
+                    series_id,
+                    f"{self.series_label}, season {i}",
+                    f"season {i} of {self.series_label}",
+                    i,
+                    False,
+                )
+                self.graph.add_item(season.getID(), wp.TELEVISION_SERIES_SEASON, i)
+                season_items.append(season)
+                self.season_ids.append(season.getID())
+            self._created.put(self.series)
+
+            previous_episode = None
+            for season, titles in zip(season_items, self.seasons):
+                episodes = []
+                for series_ordinal, season_ordinal, title in titles:
+                    episode = self.scheduler.run(
+                        create_episode, series_id, season.getID(), title, series_ordinal, season_ordinal, False
+                    )
+                    self.graph.add_item(
+                        episode.getID(), wp.TELEVISION_SERIES_EPISODE, series_ordinal, season.getID(), season_ordinal
+                    )
+                    self.episode_ids.append(episode.getID())
+                    if previous_episode is not None:
+                        # The last episode of the previous season, now that the episode following it exists
+                        self._created.put(previous_episode)
+                        previous_episode = None
+                    episodes.append(episode)
+
+                self._created.put(season)
+                if episodes:
+                    # Episodes are handed over one behind, so the last one is still pending
+                    for episode in episodes[:-1]:
+                        self._created.put(episode)
+                    previous_episode = episodes[-1]
+
+            if previous_episode is not None:
+                self._created.put(previous_episode)
+        except BaseException as e:  # pylint: disable=broad-except
+            self._created.put(e)
+        finally:
+            self._created.put(None)
@@ -1,7 +1,8 @@
-import requests
-from bs4 import BeautifulSoup
-
 def get_episode_list(url):
+    # Only needed to list episodes, so they are not imported with the other commands
+    import requests
+    from bs4 import BeautifulSoup
+
     page = requests.get(url)
     html_page = page.content
     soup = BeautifulSoup(html_page, 'html.parser')
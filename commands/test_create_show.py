@@ -0,0 +1,55 @@
+import itertools
+import sys
+import unittest
+from unittest.mock import patch
+
+from .create_show import CreationPipeline
+
+# commands re-exports the create_show function under the name of its module
+create_show = sys.modules[CreationPipeline.__module__]
+
+
+class FakeItem:
+    def __init__(self, qid):
+        self.qid = qid
+        self.repo = None
+
+    def getID(self):
+        return self.qid
+
+    def title(self):
+        return self.qid
+
+
+class FakeScheduler:
+    def run(self, func, *args, **kwargs):
+        return func(*args, **kwargs)
+
+
+class CreationPipelineTests(unittest.TestCase):
+    def test_parents_are_handed_over_before_their_parts(self):
+        ids = (f"Q{n}" for n in itertools.count(100))
+
+        def create_season(series_id, label, description, ordinal, dry):
+            return FakeItem(next(ids))
+
+        def create_episode(series_id, season_id, title, series_ordinal, season_ordinal, dry):
+            return FakeItem(next(ids))
+
+        seasons = [[(1, 1, "One"), (2, 2, "Two")], [], [(3, 1, "Three")]]
+        with patch.object(create_show, "create_season", create_season), \
+                patch.object(create_show, "create_episode", create_episode), \
+                patch.object(create_show, "SeriesGraph"):
+            pipeline = CreationPipeline(FakeItem("Q1"), "Show", seasons, FakeScheduler())
+            pipeline.start()
+            handed_over = [item.getID() for item in pipeline.created()]
+
+        # Seasons are Q100-Q102, and episodes Q103-Q105. The last episode of
+        # season 1 waits for the next episode, past the empty season 2
+        self.assertEqual(handed_over, ["Q1", "Q100", "Q103", "Q101", "Q104", "Q102", "Q105"])
+        self.assertEqual(pipeline.season_ids, ["Q100", "Q101", "Q102"])
+        self.assertEqual(pipeline.episode_ids, ["Q103", "Q104", "Q105"])
+
+
+if __name__ == "__main__":
+    unittest.main()
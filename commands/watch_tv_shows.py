@@ -0,0 +1,106 @@
+"""Check the items of TV shows continuously, as they are edited"""
+import time
+from typing import Dict, Iterable, Optional
+
+from pywikibot import ItemPage, Site
+
+from bots import getbot
+from model.series_graph import SeriesGraph
+from network.events import RECENTCHANGE_URL, ChangeBatcher, item_changes, stream_events
+
+
+class TrackedSeries:
+    """The QIDs of some series, and of all their seasons and episodes
+
+        The seasons and episodes of all series are looked up again (to pick
+        up new ones) at least every max_age seconds, and those of some
+        series whenever refresh is called with them.
+    """
+
+    def __init__(self, series_ids: Iterable[str], repo, max_age: float = 3600):
+        self.series_ids = list(series_ids)
+        self.repo = repo
+        self.max_age = max_age
+        # QID -> the series it is part of
+        self.qids: Dict[str, str] = {}
+        self.refreshed_at = None
+        self.refresh()
+
+    def refresh(self, series_ids: Optional[Iterable[str]] = None) -> None:
+        """Look up the seasons and episodes of these series (all of them by default) again"""
+        everything = series_ids is None
+        series_ids = self.series_ids if everything else set(series_ids)
+        qids = {qid: series_id for qid, series_id in self.qids.items() if series_id not in series_ids}
+        for series_id in series_ids:
+            SeriesGraph.invalidate(series_id)
+            qids.update(dict.fromkeys(SeriesGraph.for_series(series_id, self.repo).nodes, series_id))
+            qids[series_id] = series_id
+        self.qids = qids
+        if everything:
+            self.refreshed_at = time.monotonic()
+
+    def series_of(self, qid: str) -> Optional[str]:
+        """The tracked series this item is part of"""
+        return self.qids.get(qid)
+
+    def __contains__(self, qid: str) -> bool:
+        if time.monotonic() - self.refreshed_at > self.max_age:
+            self.refresh()
+        return qid in self.qids
+
+    def __len__(self):
+        return len(self.qids)
+
+
+def watch_tv_shows(
+    tvshow_ids,
+    autofix=False,
+    interactive=False,
+    filter="",
+    url=RECENTCHANGE_URL,
+    max_batch=50,
+    max_wait=30.0,
+):
+    """Check the constraints of items of these TV shows whenever they are edited
+
+        Listens to the recentchange event stream, and re-checks (and fixes,
+        if autofix is set) the series, seasons and episodes that were
+        edited, in batches. Runs until interrupted.
+
+    Arguments
+    ---------
+    tvshow_ids: List[str]
+        the Wiki IDs of the television series to watch
+    autofix: bool
+        whether or not to attempt auto-fixing constraint failures
+    interactive: bool
+        whether or not to prompt for confirmation before making edits
+    filter: str
+        a comma-separated list of properties in the format P###.
+        Only edits for these properties will be applied.
+    url: str
+        the URL of the recentchange event stream
+    max_batch: int
+        the largest number of items checked at once
+    max_wait: float
+        the number of seconds an edited item can wait for its batch to fill up
+    """
+    repo = Site().data_repository()
+    tracked = TrackedSeries(tvshow_ids, repo)
+    print(f"Watching {len(tracked)} items of {', '.join(tvshow_ids)}")
+
+    # The fixes made here show up in the stream too, and need not be checked again
+    own_user = repo.username()
+    batcher = ChangeBatcher(
+        tracked.__contains__,
+        max_batch=max_batch,
+        max_wait=max_wait,
+        ignore_users=[own_user] if own_user else [],
+    )
+    for batch in batcher.batches(item_changes(stream_events(url))):
+        print(f"Checking {len(batch)} edited items")
+        # Pick up changes to the links between the seasons and episodes of the edited series
+        tracked.refresh({tracked.series_of(change.qid) for change in batch} - {None})
+        items = [ItemPage(repo, change.qid) for change in batch]
+        bot = getbot(items, autofix=autofix, accumulate=False, always=(not interactive), property_filter=filter)
+        bot.run()
@@ -2,7 +2,7 @@
 from __future__ import annotations
 
 from abc import ABC, abstractmethod
-from typing import Callable, Iterable
+from typing import Callable, Dict, Iterable, Optional, Tuple
 
 from pywikibot import Claim, ItemPage
 
@@ -20,6 +20,11 @@ class Constraint:
         Note: The fixer should only fix the item under consideration, and not
               any items referenced by it. This helps keep the script and the
               developer sane.
+
+        A constraint also declares the property IDs that its validator and
+        fixer read, so that a set of constraints can be introspected. A
+        constraint that reads the claims of every property (eg: to look at
+        all qualifiers) declares None.
     """
 
     def __init__(
@@ -27,10 +32,22 @@ class Constraint:
         validator: Callable[..., bool],
         fixer: Callable[..., Iterable] = None,
         name=None,
+        properties: Optional[Iterable[str]] = (),
     ):
         self._validator = validator
         self._name = name
         self._fixer = fixer
+        self._properties = tuple(properties) if properties is not None else None
+
+    @property
+    def name(self) -> str:
+        """The name of this constraint, eg: has_property(P31 (instance of))"""
+        return self._name
+
+    @property
+    def properties(self) -> Optional[Tuple[str, ...]]:
+        """The IDs of the properties that this constraint reads, or None if it reads all of them"""
+        return self._properties
 
     def validate(self, item) -> bool:
         """Return True if the item satisfies the constraint, else False"""
@@ -56,12 +73,31 @@ class Fix(ABC):
         It has 3 subclasses: ClaimFix, LabelFix and DescriptionFix.
 
         In order to apply the fix, the user must call "apply" on an instance of this class.
+
+        Several fixes for the same item can also be applied as a single edit,
+        by adding each of them to the same wbeditentity payload with "add_to".
+
+        A fix can be saved as JSON with "to_json", and loaded back with fix_from_json.
+        The JSON keeps the revision of the item the fix was computed from, so
+        that a fix applied later still conflicts with the edits made since.
     """
+    itempage: ItemPage
+
     @abstractmethod
     def apply(self, *args, **kwargs):
         """Apply this fix, i.e. update the item on Wikidata"""
         pass
 
+    @abstractmethod
+    def add_to(self, data: dict) -> None:
+        """Add this fix to the data of a wbeditentity call"""
+        pass
+
+    @abstractmethod
+    def to_json(self) -> dict:
+        """A JSON-serializable representation of this fix"""
+        pass
+
 
 class ClaimFix(Fix):
     """A Fix to update the item by adding a Claim"""
@@ -73,6 +109,18 @@ class ClaimFix(Fix):
     def apply(self, func, *args, **kwargs):
         return func(item=self.itempage, claim=self.claim, summary=self.summary)
 
+    def add_to(self, data: dict) -> None:
+        data.setdefault("claims", []).append(self.claim.toJSON())
+
+    def to_json(self) -> dict:
+        return {
+            "type": "claim",
+            "qid": self.itempage.title(),
+            "revid": _base_revision(self.itempage),
+            "summary": self.summary,
+            "claim": self.claim.toJSON(),
+        }
+
 
 class LabelFix(Fix):
     """A Fix to update the item by adding a label"""
@@ -89,6 +137,19 @@ class LabelFix(Fix):
             return False
         return True
 
+    def add_to(self, data: dict) -> None:
+        data.setdefault("labels", {})[self.lang] = {"language": self.lang, "value": self.label}
+
+    def to_json(self) -> dict:
+        return {
+            "type": "label",
+            "qid": self.itempage.title(),
+            "revid": _base_revision(self.itempage),
+            "summary": self.summary,
+            "lang": self.lang,
+            "value": self.label,
+        }
+
 
 class DescriptionFix(Fix):
     """A Fix to update the item by adding a description"""
@@ -104,3 +165,43 @@ class DescriptionFix(Fix):
         except:
             return False
         return True
+
+    def add_to(self, data: dict) -> None:
+        data.setdefault("descriptions", {})[self.lang] = {"language": self.lang, "value": self.description}
+
+    def to_json(self) -> dict:
+        return {
+            "type": "description",
+            "qid": self.itempage.title(),
+            "revid": _base_revision(self.itempage),
+            "summary": self.summary,
+            "lang": self.lang,
+            "value": self.description,
+        }
+
+
+def _base_revision(itempage: ItemPage) -> Optional[int]:
+    """The revision the item was loaded at, without loading it"""
+    return getattr(itempage, "_revid", None)
+
+
+def fix_from_json(repo, data: dict, itempages: Optional[Dict[str, ItemPage]] = None) -> Fix:
+    """Load a fix saved with Fix.to_json
+
+        The fix is made on an ItemPage at the revision it was computed
+        from, which its edit sends as baserevid. Pass the same itempages
+        dict for several fixes to have the fixes of an item share its page.
+    """
+    itempages = {} if itempages is None else itempages
+    itempage = itempages.get(data["qid"])
+    if itempage is None:
+        itempage = itempages[data["qid"]] = ItemPage(repo, data["qid"])
+        if data.get("revid") is not None:
+            itempage.latest_revision_id = data["revid"]
+    if data["type"] == "claim":
+        return ClaimFix(Claim.fromJSON(repo, data["claim"]), data["summary"], itempage)
+    if data["type"] == "label":
+        return LabelFix(data["value"], data["lang"], itempage)
+    if data["type"] == "description":
+        return DescriptionFix(data["value"], data["lang"], itempage)
+    raise ValueError(f"Unknown fix type: {data['type']}")
@@ -25,4 +25,6 @@ def has_english_label() -> api.Constraint:
             return [api.LabelFix(label, "en", item.itempage)]
         return []
 
-    return api.Constraint(check, fixer=fix, name="has_english_label()")
\ No newline at end of file
+    return api.Constraint(
+        check, fixer=fix, name="has_english_label()", properties=[wp.BOARD_GAME_GEEK_ID.pid]
+    )
\ No newline at end of file
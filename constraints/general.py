@@ -16,7 +16,7 @@ def has_property(prop: wp.WikidataProperty) -> Constraint:
     def check(item: model.api.BaseType) -> bool:
         return prop.pid in item.claims
 
-    return Constraint(validator=check, name=f"has_property({prop.name})")
+    return Constraint(validator=check, name=f"has_property({prop.name})", properties=[prop.pid])
 
 
 def inherits_property(prop: wp.WikidataProperty) -> Constraint:
@@ -53,7 +53,12 @@ def inherits_property(prop: wp.WikidataProperty) -> Constraint:
 
         return copy_delayed(item.parent.itempage, item.itempage, [prop])
 
-    return Constraint(check, fixer=fix, name=f"inherits_property({prop.name})")
+    return Constraint(
+        check,
+        fixer=fix,
+        name=f"inherits_property({prop.name})",
+        properties=[prop.pid, wp.SEASON.pid, wp.PART_OF_THE_SERIES.pid],
+    )
 
 
 def follows_something() -> Constraint:
@@ -81,7 +86,13 @@ def follows_something() -> Constraint:
         summary = f"Setting {wp.FOLLOWS.pid} ({wp.FOLLOWS.name})"
         return [ClaimFix(new_claim, summary, item.itempage)]
 
-    return Constraint(check, fixer=fix, name=f"follows_something()")
+    return Constraint(
+        check,
+        fixer=fix,
+        name=f"follows_something()",
+        # The property counts as set if it is a qualifier of any claim, so every claim is read
+        properties=None,
+    )
 
 
 def is_followed_by_something() -> Constraint:
@@ -109,7 +120,13 @@ def is_followed_by_something() -> Constraint:
         summary = f"Setting {wp.FOLLOWED_BY.pid} ({wp.FOLLOWED_BY.name})"
         return [ClaimFix(new_claim, summary, item.itempage)]
 
-    return Constraint(check, fixer=fix, name=f"is_followed_by_something()")
+    return Constraint(
+        check,
+        fixer=fix,
+        name=f"is_followed_by_something()",
+        # The property counts as set if it is a qualifier of any claim, so every claim is read
+        properties=None,
+    )
 
 
 def _has_property_as_qualifier(item, prop: wp.WikidataProperty):
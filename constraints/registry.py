@@ -0,0 +1,92 @@
+"""Registry of the compiled constraint sets of each model class
+
+    The constraints of a model class do not depend on the item being
+    checked, so they are built once per class, on first use, and shared by
+    every instance of the class. Use compiled_constraints in place of a
+    `constraints` property:
+
+        class Episode(TvBase):
+            @compiled_constraints
+            def constraints(cls):
+                return [gc.has_property(wp.INSTANCE_OF), ...]
+
+    Episode.constraints (and episode.constraints) is then an immutable
+    ConstraintSet, which can also be looked up with constraint_set("Episode").
+"""
+import threading
+from typing import Callable, Dict, FrozenSet, Iterable, Iterator, Optional, Tuple
+
+from constraints.api import Constraint
+
+_models: Dict[str, "compiled_constraints"] = {}
+_lock = threading.Lock()
+
+
+class ConstraintSet:
+    """An immutable, ordered collection of the constraints of a model class
+
+        Iterating over it or taking its length allocates nothing, so the same
+        set can be reused for any number of items.
+    """
+
+    __slots__ = ("model", "_constraints", "names", "properties")
+
+    def __init__(self, model: str, constraints: Iterable[Constraint]):
+        self.model = model
+        self._constraints: Tuple[Constraint, ...] = tuple(constraints)
+        self.names: Tuple[str, ...] = tuple(c.name for c in self._constraints)
+        # None if any of the constraints reads the claims of every property
+        self.properties: Optional[FrozenSet[str]] = None
+        if all(c.properties is not None for c in self._constraints):
+            self.properties = frozenset(pid for c in self._constraints for pid in c.properties)
+
+    def __iter__(self) -> Iterator[Constraint]:
+        return iter(self._constraints)
+
+    def __len__(self) -> int:
+        return len(self._constraints)
+
+    def __getitem__(self, index) -> Constraint:
+        return self._constraints[index]
+
+    def __str__(self):
+        return f"ConstraintSet({self.model}, {len(self)} constraints)"
+
+    def __repr__(self):
+        return str(self)
+
+
+class compiled_constraints:  # pylint: disable=invalid-name
+    """Descriptor that compiles the constraints of a model class once
+
+        The decorated function is called with the model class the first time
+        the constraints are read, and must return an iterable of Constraints.
+    """
+
+    def __init__(self, builder: Callable[[type], Iterable[Constraint]]):
+        self.builder = builder
+        self.__doc__ = builder.__doc__ or "The compiled constraints that apply to this entity"
+        self.owner = None
+        self.compiled = None
+
+    def __set_name__(self, owner, name):
+        self.owner = owner
+        _models[owner.__name__] = self
+
+    def __get__(self, instance, owner) -> ConstraintSet:
+        if self.compiled is None:
+            with _lock:
+                if self.compiled is None:
+                    self.compiled = ConstraintSet(self.owner.__name__, self.builder(self.owner))
+        return self.compiled
+
+
+def constraint_set(model: str) -> ConstraintSet:
+    """The compiled constraints of the model class with this name"""
+    descriptor = _models[model]
+    return descriptor.__get__(None, descriptor.owner)
+
+
+def registered() -> Dict[str, ConstraintSet]:
+    """The compiled constraints of every model class, by class name"""
+    return {model: constraint_set(model) for model in list(_models)}
@@ -26,7 +26,11 @@ def season_has_no_of_episodes_as_count_of_parts() -> api.Constraint:
             == int(item.first_claim(wp.NUMBER_OF_EPISODES.pid).amount)
         )
 
-    return api.Constraint(check, name=f"season_has_no_of_episodes_as_count_of_parts()")
+    return api.Constraint(
+        check,
+        name=f"season_has_no_of_episodes_as_count_of_parts()",
+        properties=[wp.HAS_PART.pid, wp.NUMBER_OF_EPISODES.pid],
+    )
 
 
 def season_has_parts() -> api.Constraint:
@@ -53,7 +57,7 @@ def season_has_parts() -> api.Constraint:
 
         return claim_fixes
 
-    return api.Constraint(check, fixer=fix, name=f"season_has_parts()")
+    return api.Constraint(check, fixer=fix, name=f"season_has_parts()", properties=[wp.HAS_PART.pid])
 
 
 def has_title() -> api.Constraint:
@@ -89,7 +93,12 @@ def has_title() -> api.Constraint:
         summary = f"Setting {wp.TITLE} to {title}"
         return [api.ClaimFix(new_claim, summary, item.itempage)]
 
-    return api.Constraint(check, fixer=fix, name="has_title()")
+    return api.Constraint(
+        check,
+        fixer=fix,
+        name="has_title()",
+        properties=[wp.TITLE.pid, wp.IMDB_ID.pid, wp.TV_COM_ID.pid],
+    )
 
 
 def has_english_label() -> api.Constraint:
@@ -116,7 +125,12 @@ def has_english_label() -> api.Constraint:
             return [api.LabelFix(label, "en", item.itempage)]
         return []
 
-    return api.Constraint(check, fixer=fix, name="has_english_label()")
+    return api.Constraint(
+        check,
+        fixer=fix,
+        name="has_english_label()",
+        properties=[wp.IMDB_ID.pid, wp.TV_COM_ID.pid],
+    )
 
 
 def episode_has_english_description() -> api.Constraint:
@@ -152,7 +166,12 @@ def episode_has_english_description() -> api.Constraint:
             return []
         return [api.DescriptionFix(description, lang="en", itempage=item.itempage)]
 
-    return api.Constraint(check, fixer=fix, name="episode_has_english_description()")
+    return api.Constraint(
+        check,
+        fixer=fix,
+        name="episode_has_english_description()",
+        properties=[wp.PART_OF_THE_SERIES.pid, wp.SEASON.pid, wp.TITLE.pid, wp.SERIES_ORDINAL.pid],
+    )
 
 
 def series_has_no_of_episodes():
@@ -173,4 +192,9 @@ def series_has_no_of_episodes():
 
         return [api.ClaimFix(claim, summary=summary, itempage=item.itempage)]
 
-    return api.Constraint(check, fixer=fix, name=f"series_has_no_of_episodes()")
+    return api.Constraint(
+        check,
+        fixer=fix,
+        name=f"series_has_no_of_episodes()",
+        properties=[wp.NUMBER_OF_EPISODES.pid, wp.IMDB_ID.pid],
+    )
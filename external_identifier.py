@@ -1,7 +1,8 @@
-import requests
 import re
 from bs4 import BeautifulSoup
 
+from network.client import fetch
+
 
 def imdb_id(title):
     """IMDB identifier
@@ -10,7 +11,7 @@ def imdb_id(title):
     >>> imdb_id("Interstellar")
     'tt0816692'
     """
-    web_text = requests.get(f"https://www.imdb.com/find?q={title}").text
+    web_text = fetch(f"https://www.imdb.com/find?q={title}").text
     soup = BeautifulSoup(web_text, "html.parser")
     candidates = soup.find("table", attrs={"class": "findList"})
     identifier = candidates.find("a", href=True)["href"]
@@ -69,7 +70,7 @@ def board_game_geek_id(title):
     >>> board_game_geek_id("Bunny Kingdom")
     184921
     """
-    res = requests.get('https://boardgamegeek.com/geeksearch.php?action=search&objecttype=boardgame&q={}'.format(title))
+    res = fetch('https://boardgamegeek.com/geeksearch.php?action=search&objecttype=boardgame&q={}'.format(title))
     if res.status_code != 200:
         return ""
     else:
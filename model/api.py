@@ -1,11 +1,34 @@
 """Base interfaces and mixins for model classes"""
 from __future__ import annotations
 
+import functools
 from abc import ABC, abstractmethod
-from typing import Optional, Iterable
+from typing import FrozenSet, Iterable, Optional, Tuple, Union
 
 from pywikibot import ItemPage, Site
 
+from cache import Projection, load_item
+from .snapshot import EntitySnapshot
+
+
+def memoized_property(func):
+    """A read-only property that is computed once per instance
+
+        Use this for properties that are derived from the item's claims, and
+        especially for those that fetch related items. The memoized values
+        are discarded when the instance is refreshed.
+    """
+    name = func.__name__
+
+    @functools.wraps(func)
+    def getter(self):
+        memo = self.__dict__.setdefault("_memo", {})
+        if name not in memo:
+            memo[name] = func(self)
+        return memo[name]
+
+    return property(getter)
+
 
 class BaseType(ABC):
     """The base class for wrapper classes
@@ -14,29 +37,59 @@ class BaseType(ABC):
         by more specific implementations that encapsulate a concept.
     """
 
-    def __init__(self, itempage: ItemPage, repo=None):
-        self._itempage = itempage
-        self._itempage.get()
+    # Properties read by the model itself (eg: to find its parent), on top of those its constraints read
+    model_properties: Tuple[str, ...] = ()
+    # The parts of an item the model reads (see projection), labels and descriptions only in these languages
+    entity_props: FrozenSet[str] = frozenset({"info", "claims", "labels", "descriptions"})
+    languages: FrozenSet[str] = frozenset({"en"})
+
+    def __init__(self, item: Union[ItemPage, EntitySnapshot], repo=None):
+        self._memo = {}
+        if isinstance(item, EntitySnapshot):
+            self._snapshot = item
+            self._itempage = None
+        else:
+            self._snapshot = None
+            self._itempage = item
+            load_item(self._itempage, projection=self.projection())
         self._repo = Site().data_repository() if repo is None else repo
 
     @property
     def itempage(self) -> ItemPage:
-        """The underlying ItemPage for this entity"""
+        """The underlying ItemPage for this entity
+
+            If the entity wraps a snapshot, the full item is only loaded
+            (through the entity cache) the first time this is used, eg: to
+            make an edit.
+        """
+        if self._itempage is None:
+            self._itempage = self._snapshot.to_itempage()
         return self._itempage
 
+    @property
+    def snapshot(self) -> Optional[EntitySnapshot]:
+        """The snapshot this entity wraps, if it was created from one"""
+        return self._snapshot
+
     @property
     def label(self) -> Optional[str]:
         """The English (en) label of this entity"""
+        if self._snapshot is not None:
+            return self._snapshot.label
         return self._itempage.labels.get("en", None)
 
     @property
     def description(self) -> Optional[str]:
         """The English (en) description of this entity"""
+        if self._snapshot is not None:
+            return self._snapshot.description
         return self._itempage.descriptions.get("en", None)
 
     @property
     def qid(self) -> str:
         """The QID of this entity, of the form Q####"""
+        if self._snapshot is not None:
+            return self._snapshot.qid
         return self._itempage.title()
 
     @property
@@ -51,16 +104,38 @@ class BaseType(ABC):
             This lifts the claims property so we don't have to
             violate Demeter's Law all the time
         """
+        if self._snapshot is not None:
+            return self._snapshot.claims
         return self._itempage.claims
 
     def first_claim(self, key: str, default=None):
         """The first claim for this property key, or default"""
+        if self._snapshot is not None:
+            return self._snapshot.first_claim(key, default)
         if key not in self._itempage.claims:
             return default
         if not self._itempage.claims[key]:
             return default
         return self._itempage.claims[key][0].getTarget()
 
+    @classmethod
+    def needed_properties(cls) -> Optional[FrozenSet[str]]:
+        """The IDs of the properties that the model and its constraints read, or None for all of them"""
+        if cls.constraints.properties is None:
+            return None
+        return cls.constraints.properties | frozenset(cls.model_properties)
+
+    @classmethod
+    @functools.lru_cache(maxsize=None)
+    def projection(cls) -> Projection:
+        """The parts of an item that the model and its constraints read
+
+            Items are loaded with only these parts (see cache.Projection),
+            rather than with every label, alias and sitelink. Code that
+            needs more (eg: a fix copying claims) loads the whole item again.
+        """
+        return Projection(cls.entity_props, cls.languages, cls.needed_properties())
+
     @property
     @abstractmethod
     def constraints(self):
@@ -69,7 +144,14 @@ class BaseType(ABC):
 
     def refresh(self) -> None:
         """Fetch the latest data from Wikidata for this item"""
-        self._itempage.get()
+        if self._snapshot is not None:
+            itempage = load_item(ItemPage(self._repo, self.qid), force=True, projection=self.projection())
+            self._snapshot = EntitySnapshot.from_itempage(itempage, self._snapshot.properties)
+            # Keep only the snapshot, the full item is loaded again when needed
+            self._itempage = None
+        else:
+            load_item(self._itempage, force=True, projection=self.projection())
+        self._memo.clear()
 
     def __str__(self):
         return f"{self.__class__.__name__}({self.qid} ({self.label}))"
@@ -1,11 +1,13 @@
-import constraints
+import constraints.board_game
+import constraints.general
 import model.api as api
 import properties.wikidata_properties as wp
+from constraints.registry import compiled_constraints
 
 
 class BoardGame(api.BaseType):
-    @property
-    def constraints(self):
+    @compiled_constraints
+    def constraints(cls):
         return [
             constraints.general.has_property(prop)
             for prop in [wp.INSTANCE_OF, wp.BOARD_GAME_GEEK_ID]
@@ -1,10 +1,16 @@
 """Factory class for generating high-level types from ItemPage instances"""
+import functools
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Type
 
 from pywikibot import ItemPage, Site
 
 import model.api as api
+from cache import Projection, load_item
 from properties.wikidata_properties import (
     INSTANCE_OF,
+    PART_OF_THE_SERIES,
     TELEVISION_SERIES,
     TELEVISION_SERIES_EPISODE,
     TELEVISION_SERIES_SEASON,
@@ -12,32 +18,120 @@ from properties.wikidata_properties import (
     BOARD_GAME
 )
 
-from .television import Episode, Season, Series
+from .television import Episode, Season, Series, TvBase
 from .board_game import BoardGame
+from .snapshot import EntitySnapshot
+
+# Every class the factory can return
+MODEL_CLASSES = (Episode, Season, Series, BoardGame)
+
+# The most items whose preloaded links are kept until they are wrapped, a few prefetched chunks' worth
+MAX_PRELOADED_ITEMS = 500
 
 class Factory:
-    """Factory for creating instances of the wrapper classes exposed by model"""
+    """Factory for creating instances of the wrapper classes exposed by model
+
+        The repository defaults to the data repository of the default site,
+        which is only looked up (and connected to) on first use.
+    """
 
     def __init__(self, repo=None):
-        if repo is None:
-            repo = Site().data_repository()
-        self.repo = repo
+        self._repo = repo
+        # The links looked up by preload_links, by QID, until the item is wrapped
+        self._links: "OrderedDict[str, Dict[str, Optional[str]]]" = OrderedDict()
+        self._links_lock = threading.Lock()
+
+    @property
+    def repo(self):
+        if self._repo is None:
+            self._repo = Site().data_repository()
+        return self._repo
 
     def get_typed_item(self, item_id: str) -> api.BaseType:
-        item_page = ItemPage(self.repo, item_id)
-        item_page.get()
+        return self.typed_item(ItemPage(self.repo, item_id))
+
+    def typed_item(self, item_page: ItemPage, compact: bool = False) -> api.BaseType:
+        """Wrap an ItemPage in the wrapper class for its type
+
+            If the ItemPage has already been loaded, it is not fetched again.
+            If compact is True, the wrapper class wraps a snapshot of the
+            item, with only the properties it needs (see model.snapshot).
+        """
+        load_item(item_page, projection=self.projection())
+        item_id = item_page.title()
         if INSTANCE_OF.pid not in item_page.claims:
             raise ValueError(f"{item_id} has no 'instance of' property")
 
         claims = item_page.claims[INSTANCE_OF.pid]
         instance_ids = {claim.getTarget().id for claim in claims}
+        model_class = self.model_class(instance_ids)
+        if compact:
+            return self._with_links(model_class(EntitySnapshot.from_itempage(item_page, model_class.needed_properties()), self.repo))
+        return self._with_links(model_class(item_page, self.repo))
+
+    def typed_snapshot(self, snapshot: EntitySnapshot) -> api.BaseType:
+        """Wrap an EntitySnapshot in the wrapper class for its type"""
+        if INSTANCE_OF.pid not in snapshot.claims:
+            raise ValueError(f"{snapshot.qid} has no 'instance of' property")
+        return self._with_links(self.model_class(snapshot.instance_ids)(snapshot, self.repo))
+
+    def preload_links(self, item_pages: Iterable[ItemPage]) -> None:
+        """Batch the 'follows' lookups of the episodes and seasons that are not part of a series
+
+            Episodes and seasons of a series find the items following them
+            in the series' graph (see model.series_graph). Those that are
+            not part of one would otherwise make a query per item. Items
+            that are not loaded are skipped.
+
+            The links are handed to the wrapper of each item when it is
+            made, and only kept for the last MAX_PRELOADED_ITEMS items, so
+            that those of items that are never wrapped (eg: filtered out)
+            do not pile up.
+        """
+        qids = []
+        for item_page in item_pages:
+            if not hasattr(item_page, "_content") or INSTANCE_OF.pid not in item_page.claims:
+                continue
+            instance_ids = {claim.getTarget().id for claim in item_page.claims[INSTANCE_OF.pid] if claim.getTarget() is not None}
+            is_linked = TELEVISION_SERIES_EPISODE in instance_ids or TELEVISION_SERIES_SEASON in instance_ids
+            if is_linked and PART_OF_THE_SERIES.pid not in item_page.claims:
+                qids.append(item_page.title())
+        if not qids:
+            return
+        links = TvBase.lookup_links(qids, self.repo)
+        with self._links_lock:
+            self._links.update(links)
+            while len(self._links) > MAX_PRELOADED_ITEMS:
+                self._links.popitem(last=False)
+
+    def _with_links(self, typed_item: api.BaseType) -> api.BaseType:
+        """The wrapper, given the links preloaded for its item, if any"""
+        with self._links_lock:
+            links = self._links.pop(typed_item.qid, None)
+        if links is not None and isinstance(typed_item, TvBase):
+            typed_item.use_links(links)
+        return typed_item
+
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def projection() -> Projection:
+        """The parts of an item that any of the model classes read
+
+            Items are loaded with this projection before their type (and so
+            their model class) is known.
+        """
+        return functools.reduce(Projection.union, (model.projection() for model in MODEL_CLASSES))
+
+    @staticmethod
+    def model_class(instance_ids) -> Type[api.BaseType]:
+        """The wrapper class for an item that is an instance of these QIDs"""
         if TELEVISION_SERIES_EPISODE in instance_ids:
-            return Episode(item_page, self.repo)
+            return Episode
         if TELEVISION_SERIES_SEASON in instance_ids:
-            return Season(item_page, self.repo)
+            return Season
         if TELEVISION_SERIES in instance_ids or ANIMATED_SERIES in instance_ids:
-            return Series(item_page, self.repo)
+            return Series
         if BOARD_GAME in instance_ids:
-            return BoardGame(item_page, self.repo)
+            return BoardGame
 
-        raise ValueError(f"Unsupported item with instance QIDs {instance_ids}")
+        raise ValueError(f"Unsupported item with instance QIDs {set(instance_ids)}")
@@ -0,0 +1,254 @@
+"""A snapshot of every season and episode of a TV series
+
+    Navigating between seasons and episodes (next/previous, next in season,
+    the episodes of a season, ...) used to cost one SPARQL query per lookup.
+    A SeriesGraph answers all of these lookups from a single query per
+    series, using indexes by ordinal and reverse indexes for 'follows'
+    and 'followed by'.
+"""
+from __future__ import annotations
+
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pywikibot import Site
+
+import properties.wikidata_properties as wp
+from sparql.client import select
+from sparql.results import forget_query
+
+
+class GraphNode:
+    """A season or an episode in a SeriesGraph"""
+
+    __slots__ = (
+        "qid",
+        "instance_of",
+        "series_ordinal",
+        "season_qid",
+        "season_ordinal",
+        "follows",
+        "followed_by",
+        "has_part",
+    )
+
+    def __init__(self, qid: str, instance_of: str):
+        self.qid = qid
+        self.instance_of = instance_of
+        self.series_ordinal: Optional[int] = None
+        self.season_qid: Optional[str] = None
+        self.season_ordinal: Optional[int] = None
+        self.follows: List[str] = []
+        self.followed_by: List[str] = []
+        self.has_part: List[str] = []
+
+    @property
+    def is_season(self) -> bool:
+        return self.instance_of == wp.TELEVISION_SERIES_SEASON
+
+    @property
+    def is_episode(self) -> bool:
+        return self.instance_of == wp.TELEVISION_SERIES_EPISODE
+
+    def __repr__(self):
+        return f"GraphNode({self.qid})"
+
+
+class SeriesGraph:
+    """All the seasons and episodes of one series, with their ordinals and links
+
+        Use SeriesGraph.for_series to get the (shared) graph of a series,
+        which is built from a single SPARQL query the first time it is
+        requested.
+    """
+
+    _graphs: Dict[Tuple[str, str], SeriesGraph] = {}
+    _lock = threading.Lock()
+
+    def __init__(self, series_qid: str, nodes: Iterable[GraphNode]):
+        self.series_qid = series_qid
+        self.nodes: Dict[str, GraphNode] = {node.qid: node for node in nodes}
+
+        # Ordinal -> QID. Not lists, since a single bad ordinal (eg: a date) would make them huge
+        self.seasons: Dict[int, str] = {}
+        self.episodes: Dict[int, str] = {}
+        self.season_episodes: Dict[str, Dict[int, str]] = {}
+
+        # Reverse indexes: QID -> the item that follows / is followed by it
+        self._followers: Dict[str, str] = {}
+        self._predecessors: Dict[str, str] = {}
+
+        for node in self.nodes.values():
+            self._index(node)
+
+    def _index(self, node: GraphNode) -> None:
+        if node.is_season:
+            _place(self.seasons, node.series_ordinal, node.qid)
+        elif node.is_episode:
+            _place(self.episodes, node.series_ordinal, node.qid)
+            if node.season_qid is not None:
+                season_episodes = self.season_episodes.setdefault(node.season_qid, {})
+                _place(season_episodes, node.season_ordinal, node.qid)
+        for follows in node.follows:
+            self._followers.setdefault(follows, node.qid)
+        for followed_by in node.followed_by:
+            self._predecessors.setdefault(followed_by, node.qid)
+
+    def add(self, node: GraphNode) -> None:
+        """Add a season or episode that was just created
+
+            The query service takes a while to pick up new items, so items
+            created by this process are added to the graph directly.
+        """
+        with self._lock:
+            if node.qid in self.nodes:
+                return
+            self.nodes[node.qid] = node
+            self._index(node)
+
+    def add_item(self, qid: str, instance_of: str, series_ordinal=None, season_qid: str = None, season_ordinal=None) -> None:
+        """Add a season or episode that was just created, given its ordinals"""
+        node = GraphNode(qid, instance_of)
+        node.series_ordinal = _ordinal(series_ordinal)
+        node.season_qid = season_qid
+        node.season_ordinal = _ordinal(season_ordinal)
+        self.add(node)
+
+    @classmethod
+    def for_series(cls, series_qid: str, repo=None) -> SeriesGraph:
+        """The graph of this series, loading it on first use"""
+        repo = Site().data_repository() if repo is None else repo
+        key = (repo.sitename, series_qid)
+        with cls._lock:
+            graph = cls._graphs.get(key)
+            if graph is None:
+                graph = cls.load(series_qid, repo)
+                cls._graphs[key] = graph
+        return graph
+
+    @classmethod
+    def invalidate(cls, series_qid: str) -> None:
+        """Drop the shared graph of this series, so that it is loaded again on next use"""
+        with cls._lock:
+            for key in [key for key in cls._graphs if key[1] == series_qid]:
+                del cls._graphs[key]
+        forget_query(series_graph_query(series_qid))
+
+    @classmethod
+    def load(cls, series_qid: str, repo=None) -> SeriesGraph:
+        """Build the graph of this series with a single SPARQL query"""
+        repo = Site().data_repository() if repo is None else repo
+        results = select(series_graph_query(series_qid), repo)
+        return cls.from_rows(series_qid, results)
+
+    @classmethod
+    def from_rows(cls, series_qid: str, rows: Iterable[dict]) -> SeriesGraph:
+        """Build the graph from the rows of series_graph_query"""
+        nodes: Dict[str, GraphNode] = {}
+        for row in rows:
+            qid = _entity_id(row["item"])
+            node = nodes.get(qid)
+            if node is None:
+                node = nodes[qid] = GraphNode(qid, _entity_id(row["type"]))
+
+            if row.get("seriesOrdinal") is not None and node.series_ordinal is None:
+                node.series_ordinal = _ordinal(row["seriesOrdinal"])
+            if row.get("season") is not None and node.season_qid is None:
+                node.season_qid = _entity_id(row["season"])
+                node.season_ordinal = _ordinal(row.get("seasonOrdinal"))
+            if row.get("follows") is not None:
+                node.follows.append(_entity_id(row["follows"]))
+            if row.get("followedBy") is not None:
+                node.followed_by.append(_entity_id(row["followedBy"]))
+            if row.get("part") is not None:
+                node.has_part.append(_entity_id(row["part"]))
+        return cls(series_qid, nodes.values())
+
+    def node(self, qid: str) -> Optional[GraphNode]:
+        """The season or episode with this QID, if it is part of the series"""
+        return self.nodes.get(qid)
+
+    def follower_of(self, qid: str) -> Optional[str]:
+        """The item that has 'follows' (P155) set to this QID"""
+        return self._followers.get(qid)
+
+    def predecessor_of(self, qid: str) -> Optional[str]:
+        """The item that has 'followed by' (P156) set to this QID"""
+        return self._predecessors.get(qid)
+
+    def season_at(self, ordinal: Optional[int]) -> Optional[str]:
+        """The season with this ordinal in the series"""
+        return _at(self.seasons, ordinal)
+
+    def episode_at(self, ordinal: Optional[int]) -> Optional[str]:
+        """The episode with this ordinal in the series"""
+        return _at(self.episodes, ordinal)
+
+    def episode_in_season(self, season_qid: str, ordinal: Optional[int]) -> Optional[str]:
+        """The episode with this ordinal in the given season"""
+        return _at(self.season_episodes.get(season_qid, {}), ordinal)
+
+    def parts(self, season_qid: str) -> List[Tuple[int, str]]:
+        """The (ordinal, episode QID) of every episode of this season, in order"""
+        return sorted(self.season_episodes.get(season_qid, {}).items())
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __str__(self):
+        return f"SeriesGraph({self.series_qid}, {len(self.nodes)} items)"
+
+
+def series_graph_query(series_qid: str) -> str:
+    """The query for all seasons and episodes of a series, with their ordinals and links
+
+        Each link ('follows', 'followed by' and 'has part') is returned in a
+        row of its own, so the number of rows grows linearly with the size
+        of the series.
+    """
+    return f"""SELECT ?item ?type ?seriesOrdinal ?season ?seasonOrdinal ?follows ?followedBy ?part WHERE {{
+      VALUES ?type {{ wd:{wp.TELEVISION_SERIES_SEASON} wd:{wp.TELEVISION_SERIES_EPISODE} }}
+      ?item wdt:{wp.INSTANCE_OF.pid} ?type;
+            wdt:{wp.PART_OF_THE_SERIES.pid} wd:{series_qid}.
+      {{
+        OPTIONAL {{
+          ?item p:{wp.PART_OF_THE_SERIES.pid} ?seriesStatement.
+          ?seriesStatement ps:{wp.PART_OF_THE_SERIES.pid} wd:{series_qid};
+                           pq:{wp.SERIES_ORDINAL.pid} ?seriesOrdinal.
+        }}
+        OPTIONAL {{
+          ?item p:{wp.SEASON.pid} ?seasonStatement.
+          ?seasonStatement ps:{wp.SEASON.pid} ?season.
+          OPTIONAL {{ ?seasonStatement pq:{wp.SERIES_ORDINAL.pid} ?seasonOrdinal. }}
+        }}
+      }}
+      UNION {{ ?item wdt:{wp.FOLLOWS.pid} ?follows. }}
+      UNION {{ ?item wdt:{wp.FOLLOWED_BY.pid} ?followedBy. }}
+      UNION {{ ?item wdt:{wp.HAS_PART.pid} ?part. }}
+    }}
+    """
+
+
+def _entity_id(uri: str) -> str:
+    return str(uri).split("/")[-1]
+
+
+def _ordinal(value) -> Optional[int]:
+    """Ordinals are strings on Wikidata, and are sometimes not numbers (eg: '1a')"""
+    try:
+        return int(str(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def _place(ordinals: Dict[int, str], ordinal: Optional[int], qid: str) -> None:
+    if ordinal is None or ordinal < 0:
+        return
+    # If two items claim the same ordinal, keep the first one
+    ordinals.setdefault(ordinal, qid)
+
+
+def _at(ordinals: Dict[int, str], ordinal: Optional[int]) -> Optional[str]:
+    if ordinal is None:
+        return None
+    return ordinals.get(ordinal)
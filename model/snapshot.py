@@ -0,0 +1,247 @@
+"""Compact, read-only copies of items, for scans over many items
+
+    A loaded ItemPage keeps every label, description, alias and sitelink,
+    the raw entity JSON, and a full pywikibot Claim (with its own copy of
+    the JSON) per statement. Checking constraints only needs the English
+    label and description, and the statements of a few properties.
+
+    EntitySnapshot keeps just that, in __slots__ classes: statements are
+    tuples of SnapshotClaim, entity IDs and property IDs are interned (so
+    each is stored once however many items refer to it), and values are
+    kept as plain strings or tuples. Targets are only converted to
+    pywikibot objects (ItemPage, WbQuantity, ...) when asked for:
+
+        snapshot = EntitySnapshot.from_itempage(itempage, Episode.needed_properties())
+        episode = Episode(snapshot, repo)
+
+    The model then reads from the snapshot, and only loads the full
+    ItemPage (from the entity cache) when its `itempage` is needed, eg:
+    to make an edit. That page's edits are based on the snapshot's
+    revision, so that an edit made to the item since it was checked is
+    reported as an edit conflict instead of being overwritten.
+"""
+from sys import intern
+from types import MappingProxyType
+from typing import Iterable, List, Mapping, Optional, Tuple
+
+from pywikibot import Claim, ItemPage
+
+from cache import Projection, load_items
+from cache.entities import BATCH_SIZE
+
+# Datatypes whose value is an entity, kept as its (interned) ID
+ENTITY_DATATYPES = frozenset({"wikibase-item", "wikibase-property", "wikibase-lexeme", "wikibase-form", "wikibase-sense"})
+
+# The wbgetentities props a snapshot is made of
+SNAPSHOT_PROPS = frozenset({"info", "claims", "labels", "descriptions"})
+
+_NO_QUALIFIERS: Mapping[str, tuple] = MappingProxyType({})
+
+
+def _compact(datatype: str, value):
+    """A compact form of a datavalue's value, shared between snapshots wherever possible"""
+    if datatype in ENTITY_DATATYPES:
+        if "id" in value:
+            return intern(value["id"])
+        prefix = "P" if datatype == "wikibase-property" else "Q"
+        return intern(f"{prefix}{value['numeric-id']}")
+    if isinstance(value, dict):
+        # Units, calendar models and languages repeat across items, so interning their strings pays off
+        return tuple(
+            (intern(key), intern(val) if isinstance(val, str) and len(val) < 64 else val)
+            for key, val in value.items()
+        )
+    return value
+
+
+def _expand(datatype: str, value):
+    """The datavalue's value, as in the entity JSON, out of its compact form"""
+    if datatype in ENTITY_DATATYPES:
+        expanded = {"entity-type": datatype[len("wikibase-"):], "id": value}
+        if value[1:].isdigit():
+            expanded["numeric-id"] = int(value[1:])
+        return expanded
+    if isinstance(value, tuple):
+        return dict(value)
+    return value
+
+
+class SnapshotClaim:
+    """A read-only statement (or qualifier) of an EntitySnapshot
+
+        This has the subset of the pywikibot Claim interface the models and
+        constraints use: getTarget(), getSnakType(), getID(), qualifiers,
+        rank and id.
+    """
+
+    __slots__ = ("id", "pid", "datatype", "snaktype", "value", "rank", "qualifiers", "_repo")
+
+    def __init__(self, repo, pid: str, datatype: str, snaktype: str, value, rank: Optional[str] = None,
+                 qualifiers: Mapping[str, tuple] = _NO_QUALIFIERS, claim_id: Optional[str] = None):
+        set_slot = object.__setattr__
+        set_slot(self, "id", claim_id)
+        set_slot(self, "pid", pid)
+        set_slot(self, "datatype", datatype)
+        set_slot(self, "snaktype", snaktype)
+        set_slot(self, "value", value)
+        set_slot(self, "rank", rank)
+        set_slot(self, "qualifiers", qualifiers)
+        set_slot(self, "_repo", repo)
+
+    @classmethod
+    def from_json(cls, repo, data: dict) -> "SnapshotClaim":
+        """A claim out of the JSON of a statement, or of a snak (for qualifiers)"""
+        snak = data.get("mainsnak", data)
+        datatype = intern(snak.get("datatype", ""))
+        value = None
+        if snak["snaktype"] == "value":
+            value = _compact(datatype, snak["datavalue"]["value"])
+        qualifiers = _NO_QUALIFIERS
+        if data.get("qualifiers"):
+            qualifiers = MappingProxyType({
+                intern(pid): tuple(cls.from_json(repo, qualifier) for qualifier in snaks)
+                for pid, snaks in data["qualifiers"].items()
+            })
+        rank = intern(data["rank"]) if "rank" in data else None
+        return cls(repo, intern(snak["property"]), datatype, intern(snak["snaktype"]), value, rank, qualifiers, data.get("id"))
+
+    def getTarget(self):  # pylint: disable=invalid-name
+        """The value of this claim as pywikibot would give it (ItemPage, WbQuantity, str...), or None"""
+        if self.snaktype != "value":
+            return None
+        value = _expand(self.datatype, self.value)
+        return Claim.TARGET_CONVERTER.get(self.datatype, lambda value, site: value)(value, self._repo)
+
+    def getSnakType(self) -> str:  # pylint: disable=invalid-name
+        return self.snaktype
+
+    def getID(self) -> str:  # pylint: disable=invalid-name
+        """The property ID of this claim, like pywikibot's Claim.getID()"""
+        return self.pid
+
+    @property
+    def target_id(self) -> Optional[str]:
+        """The ID of the entity this claim points to, without creating an ItemPage"""
+        return self.value if self.datatype in ENTITY_DATATYPES else None
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is read-only")
+
+    def __repr__(self):
+        return f"SnapshotClaim({self.pid}={self.value!r})"
+
+
+class EntitySnapshot:
+    """A compact, read-only copy of an item
+
+        Arguments
+        ---------
+        repo: DataSite
+            The repository the item comes from, used to convert targets
+        qid: str
+            The ID of the item
+        revid: int
+            The revision of the item this is a copy of
+        label, description: Optional[str]
+            The label and description in the snapshot's language
+        claims: Mapping[str, Tuple[SnapshotClaim, ...]]
+            The statements, by property ID
+        properties: Optional[frozenset]
+            The properties that were kept, or None if all of them were
+    """
+
+    __slots__ = ("qid", "revid", "label", "description", "claims", "properties", "_repo")
+
+    def __init__(self, repo, qid: str, revid: int, label: Optional[str], description: Optional[str],
+                 claims: Mapping[str, Tuple[SnapshotClaim, ...]], properties: Optional[frozenset] = None):
+        set_slot = object.__setattr__
+        set_slot(self, "qid", intern(qid))
+        set_slot(self, "revid", revid)
+        set_slot(self, "label", label)
+        set_slot(self, "description", description)
+        set_slot(self, "claims", MappingProxyType(dict(claims)))
+        set_slot(self, "properties", properties)
+        set_slot(self, "_repo", repo)
+
+    @classmethod
+    def from_json(cls, repo, content: dict, properties: Optional[Iterable[str]] = None, language: str = "en") -> "EntitySnapshot":
+        """A snapshot of entity JSON (as returned by wbgetentities)
+
+            Only the statements of the given properties are kept, or all of
+            them if properties is None.
+        """
+        properties = frozenset(properties) if properties is not None else None
+        label = content.get("labels", {}).get(language)
+        description = content.get("descriptions", {}).get(language)
+        claims = {
+            intern(pid): tuple(SnapshotClaim.from_json(repo, statement) for statement in statements)
+            for pid, statements in content.get("claims", {}).items()
+            if statements and (properties is None or pid in properties)
+        }
+        return cls(
+            repo,
+            content["id"],
+            content.get("lastrevid", 0),
+            label["value"] if label else None,
+            description["value"] if description else None,
+            claims,
+            properties,
+        )
+
+    @classmethod
+    def from_itempage(cls, itempage: ItemPage, properties: Optional[Iterable[str]] = None, language: str = "en") -> "EntitySnapshot":
+        """A snapshot of a loaded ItemPage"""
+        return cls.from_json(itempage.repo, itempage._content, properties, language)
+
+    @property
+    def repo(self):
+        return self._repo
+
+    @property
+    def instance_ids(self) -> frozenset:
+        """The IDs of the classes this item is an instance of (P31)"""
+        return frozenset(claim.target_id for claim in self.claims.get("P31", ()) if claim.target_id is not None)
+
+    def first_claim(self, key: str, default=None):
+        """The target of the first claim for this property key, or default"""
+        claims = self.claims.get(key)
+        if not claims:
+            return default
+        return claims[0].getTarget()
+
+    def to_itempage(self) -> ItemPage:
+        """The full ItemPage of this item, loaded through the entity cache
+
+            Its edits carry the revision of this snapshot as their baserevid,
+            whichever revision the page itself was loaded at.
+        """
+        itempage = load_items([ItemPage(self._repo, self.qid)])[0]
+        if self.revid:
+            itempage.latest_revision_id = self.revid
+        return itempage
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is read-only")
+
+    def __str__(self):
+        return f"EntitySnapshot({self.qid}@{self.revid}, {len(self.claims)} properties)"
+
+    def __repr__(self):
+        return str(self)
+
+
+def snapshot_items(repo, qids: Iterable[str], properties: Optional[Iterable[str]] = None, language: str = "en") -> List[EntitySnapshot]:
+    """Snapshots of these items, loaded through the entity cache
+
+        The items are loaded in batches of BATCH_SIZE, with only the parts a
+        snapshot keeps (see cache.Projection), and each ItemPage is dropped
+        once it has been copied, so that only the snapshots are kept.
+    """
+    properties = frozenset(properties) if properties is not None else None
+    projection = Projection(SNAPSHOT_PROPS, frozenset({language}), properties)
+    qids = list(qids)
+    snapshots = []
+    for start in range(0, len(qids), BATCH_SIZE):
+        pages = load_items([ItemPage(repo, qid) for qid in qids[start : start + BATCH_SIZE]], projection=projection)
+        snapshots.extend(EntitySnapshot.from_itempage(page, properties, language) for page in pages)
+    return snapshots
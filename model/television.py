@@ -2,22 +2,37 @@
 from __future__ import annotations
 
 from abc import ABC, abstractmethod
-from typing import Optional
+from typing import Dict, Iterable, Optional, Union
 
 from pywikibot import ItemPage, WbMonolingualText
-from pywikibot.pagegenerators import WikidataSPARQLPageGenerator
 
+from cache import load_item
 import constraints.general as gc
 import constraints.tv as tvc
 import model.api as api
 import properties.wikidata_properties as wp
+from model.series_graph import SeriesGraph
+from model.snapshot import EntitySnapshot
 import sparql.queries as Q
+from constraints.registry import compiled_constraints
+from sparql.client import select_grouped, select_items
 from sparql.query_builder import generate_sparql_query
 
+# How long the item linking to an item is cached for, so that checking and then fixing the item asks once
+LINKED_FROM_TTL = 10 * 60
 
 class TvBase(api.BaseType, ABC):
     """Superclass for all television related entities"""
 
+    model_properties = (
+        wp.INSTANCE_OF.pid,
+        wp.TITLE.pid,
+        wp.PART_OF_THE_SERIES.pid,
+        wp.SEASON.pid,
+        wp.FOLLOWS.pid,
+        wp.FOLLOWED_BY.pid,
+    )
+
     @property
     @abstractmethod
     def constraints(self):
@@ -31,12 +46,57 @@ class TvBase(api.BaseType, ABC):
             return None
         return title_wb.text
 
+    @api.memoized_property
+    def graph(self) -> Optional[SeriesGraph]:
+        """The SeriesGraph of the series of which this entity is a part, if any"""
+        series_itempage = self.first_claim(wp.PART_OF_THE_SERIES.pid)
+        if series_itempage is None:
+            return None
+        return SeriesGraph.for_series(series_itempage.title(), self.repo)
+
+    def linked_from(self, prop: wp.WikidataProperty) -> Optional[ItemPage]:
+        """The item that has prop (follows/followed by) set to this entity, if any"""
+        if self.graph is not None:
+            if prop == wp.FOLLOWS:
+                qid = self.graph.follower_of(self.qid)
+            else:
+                qid = self.graph.predecessor_of(self.qid)
+            return ItemPage(self.repo, qid) if qid is not None else None
+
+        preloaded = self._memo.get("preloaded_links", {})
+        if prop.pid in preloaded:
+            qid = preloaded[prop.pid]
+            return ItemPage(self.repo, qid) if qid is not None else None
+
+        query = generate_sparql_query({prop.pid: self.qid})
+        return next(select_items(query, self.repo, ttl=LINKED_FROM_TTL), None)
+
+    def use_links(self, links: Dict[str, Optional[str]]) -> None:
+        """Answer linked_from with these links (see lookup_links), until the item is refreshed"""
+        self._memo["preloaded_links"] = links
+
+    @staticmethod
+    def lookup_links(qids: Iterable[str], repo) -> Dict[str, Dict[str, Optional[str]]]:
+        """The items following and followed by each of these items, looked up in a few queries for all of them
+
+            Returns the QID of the item that links to each of these items,
+            or None, by property ID (follows, followed by), by QID.
+        """
+        qids = list(qids)
+        links: Dict[str, Dict[str, Optional[str]]] = {qid: {} for qid in qids}
+        if not qids:
+            return links
+        for prop in (wp.FOLLOWS, wp.FOLLOWED_BY):
+            for qid, linking in select_grouped({prop.pid: qids}, repo).items():
+                links.setdefault(qid, {})[prop.pid] = linking[0] if linking else None
+        return links
+
 
 class Episode(TvBase, api.Heirarchical, api.Chainable):
     """Encapsulates an item of instance 'television series episode'"""
 
-    @property
-    def constraints(self):
+    @compiled_constraints
+    def constraints(cls):
         return (
             [
                 gc.has_property(prop)
@@ -71,7 +131,7 @@ class Episode(TvBase, api.Heirarchical, api.Chainable):
             ]
         )
 
-    @property
+    @api.memoized_property
     def parent(self):
         """The Season/Series of this Episode"""
         if self.season_itempage is not None:
@@ -88,15 +148,13 @@ class Episode(TvBase, api.Heirarchical, api.Chainable):
         # Check if it has the FOLLOWED_BY field set
         next_episode_itempage = self.first_claim(wp.FOLLOWED_BY.pid)
         if next_episode_itempage is not None:
-            return Episode(next_episode_itempage)
+            return Episode(next_episode_itempage, self._repo)
 
         # Find the item that has the FOLLOWS field set to this item
-        query = generate_sparql_query({wp.FOLLOWS.pid: self.qid})
-        gen = WikidataSPARQLPageGenerator(query)
-        is_followed_by = next(gen, None)
+        is_followed_by = self.linked_from(wp.FOLLOWS)
 
         if is_followed_by is not None:
-            return Episode(is_followed_by)
+            return Episode(is_followed_by, self._repo)
 
         # Find the item whose ordinal is one higher for this series
         if self.ordinal_in_series is not None:
@@ -114,15 +172,13 @@ class Episode(TvBase, api.Heirarchical, api.Chainable):
         # Check if it has the FOLLOWS field set
         previous_episode_itempage = self.first_claim(wp.FOLLOWS.pid)
         if previous_episode_itempage is not None:
-            return Episode(previous_episode_itempage)
+            return Episode(previous_episode_itempage, self._repo)
 
         # Find the item that has the FOLLOWED_BY field set to this item
-        query = generate_sparql_query({wp.FOLLOWED_BY.pid: self.qid})
-        gen = WikidataSPARQLPageGenerator(query)
-        follows = next(gen, None)
+        follows = self.linked_from(wp.FOLLOWED_BY)
 
         if follows is not None:
-            return Episode(follows)
+            return Episode(follows, self._repo)
 
         # Find the item whose ordinal is one lower for this series
         if self.ordinal_in_series is not None:
@@ -137,120 +193,84 @@ class Episode(TvBase, api.Heirarchical, api.Chainable):
     @property
     def previous_in_season(self) -> Optional[Episode]:
         """The previous Episode from the same season"""
-        if self.ordinal_in_season is None:
-            return None
-        query = f"""SELECT ?item WHERE {{
-            ?item wdt:{wp.INSTANCE_OF.pid} wd:{wp.TELEVISION_SERIES_EPISODE}.
-            ?item wdt:{wp.PART_OF_THE_SERIES.pid} wd:{self.series_qid}.
-            ?item wdt:{wp.SEASON.pid} wd:{self.season_qid}.
-            ?item p:{wp.SEASON.pid}/pq:{wp.SERIES_ORDINAL.pid} "{self.ordinal_in_season - 1}"
-            }}
-        """
-        gen = WikidataSPARQLPageGenerator(query)
-        previous_episode_itempage = next(gen, None)
-        if previous_episode_itempage is None:
+        if self.ordinal_in_season is None or self.graph is None:
             return None
-
-        return Episode(previous_episode_itempage)
+        return self._episode(self.graph.episode_in_season(self.season_qid, self.ordinal_in_season - 1))
 
     @property
     def next_in_season(self) -> Optional[Episode]:
         """The next Episode from the same season"""
-        if self.ordinal_in_season is None:
+        if self.ordinal_in_season is None or self.graph is None:
             return None
-        query = f"""SELECT ?item WHERE {{
-            ?item wdt:{wp.INSTANCE_OF.pid} wd:{wp.TELEVISION_SERIES_EPISODE}.
-            ?item wdt:{wp.PART_OF_THE_SERIES.pid} wd:{self.series_qid}.
-            ?item wdt:{wp.SEASON.pid} wd:{self.season_qid}.
-            ?item p:{wp.SEASON.pid}/pq:{wp.SERIES_ORDINAL.pid} "{self.ordinal_in_season + 1}"
-            }}
-        """
-        gen = WikidataSPARQLPageGenerator(query)
-        next_episode_itempage = next(gen, None)
-        if next_episode_itempage is None:
-            return None
-
-        return Episode(next_episode_itempage)
+        return self._episode(self.graph.episode_in_season(self.season_qid, self.ordinal_in_season + 1))
 
     @property
     def previous_in_series(self) -> Optional[Episode]:
         """The previous Episode from the same series"""
-        if self.ordinal_in_series is None:
-            return None
-        query = f"""SELECT ?item WHERE {{
-            ?item wdt:{wp.INSTANCE_OF.pid} wd:{wp.TELEVISION_SERIES_EPISODE}.
-            ?item wdt:{wp.PART_OF_THE_SERIES.pid} wd:{self.series_qid}.
-            ?item p:{wp.PART_OF_THE_SERIES.pid}/pq:{wp.SERIES_ORDINAL.pid} "{self.ordinal_in_series - 1}"
-            }}
-        """
-        gen = WikidataSPARQLPageGenerator(query)
-        previous_episode_itempage = next(gen, None)
-        if previous_episode_itempage is None:
+        if self.ordinal_in_series is None or self.graph is None:
             return None
-
-        return Episode(previous_episode_itempage)
+        return self._episode(self.graph.episode_at(self.ordinal_in_series - 1))
 
     @property
     def next_in_series(self) -> Optional[Episode]:
         """The next Episode from the same series"""
-        if self.ordinal_in_series is None:
-            return None
-        query = f"""SELECT ?item WHERE {{
-            ?item wdt:{wp.INSTANCE_OF.pid} wd:{wp.TELEVISION_SERIES_EPISODE}.
-            ?item wdt:{wp.PART_OF_THE_SERIES.pid} wd:{self.series_qid}.
-            ?item p:{wp.PART_OF_THE_SERIES.pid}/pq:{wp.SERIES_ORDINAL.pid} "{self.ordinal_in_series + 1}"
-            }}
-        """
-        gen = WikidataSPARQLPageGenerator(query)
-        next_episode_itempage = next(gen, None)
-        if next_episode_itempage is None:
+        if self.ordinal_in_series is None or self.graph is None:
             return None
+        return self._episode(self.graph.episode_at(self.ordinal_in_series + 1))
 
-        return Episode(next_episode_itempage)
+    def _episode(self, qid: Optional[str]) -> Optional[Episode]:
+        if qid is None:
+            return None
+        return Episode(ItemPage(self.repo, qid), self._repo)
 
-    @property
+    @api.memoized_property
     def series_itempage(self) -> Optional[ItemPage]:
         """The itempage of the series of which this episode is a part"""
         series_itempage = self.first_claim(wp.PART_OF_THE_SERIES.pid)
         if series_itempage is None:
             return None
-        series_itempage.get()
+        # The series is read by the constraints of this episode too (eg: inherits_property)
+        load_item(series_itempage, projection=Series.projection().union(self.projection()))
         return series_itempage
 
-    @property
+    @api.memoized_property
     def series(self) -> Optional[Series]:
+        """The series of which this episode is a part"""
         if self.series_itempage is None:
             return None
         return Series(self.series_itempage, self._repo)
 
-    @property
+    @api.memoized_property
     def series_qid(self) -> Optional[str]:
         """The ID of the series of which this episode is a part"""
-        if self.series_itempage is None:
+        series_itempage = self.first_claim(wp.PART_OF_THE_SERIES.pid)
+        if series_itempage is None:
             return None
-        return self.series_itempage.title()
+        return series_itempage.title()
 
-    @property
+    @api.memoized_property
     def season_itempage(self) -> Optional[ItemPage]:
         """The itempage of the season of which this episode is a part"""
         season_itempage = self.first_claim(wp.SEASON.pid)
         if season_itempage is None:
             return None
-        season_itempage.get()
+        load_item(season_itempage, projection=Season.projection().union(self.projection()))
         return season_itempage
 
-    @property
+    @api.memoized_property
     def season(self) -> Optional[Season]:
-        """The ID of the season of which this episode is a part"""
+        """The season of which this episode is a part"""
         if self.season_itempage is None:
             return None
         return Season(self.season_itempage, self._repo)
 
-    @property
+    @api.memoized_property
     def season_qid(self) -> Optional[str]:
-        if self.season_itempage is None:
+        """The ID of the season of which this episode is a part"""
+        season_itempage = self.first_claim(wp.SEASON.pid)
+        if season_itempage is None:
             return None
-        return self.season_itempage.title()
+        return season_itempage.title()
 
     @property
     def ordinal_in_series(self) -> Optional[int]:
@@ -278,25 +298,27 @@ class Episode(TvBase, api.Heirarchical, api.Chainable):
 class Season(TvBase, api.Heirarchical, api.Chainable):
     """Encapsulates an item of instance 'television series season'"""
 
-    def __init__(self, itempage: ItemPage, repo=None):
+    def __init__(self, itempage: Union[ItemPage, EntitySnapshot], repo=None):
         super(Season, self).__init__(itempage, repo)
-        if wp.INSTANCE_OF.pid not in itempage.claims:
+        if wp.INSTANCE_OF.pid not in self.claims:
             raise ValueError(
-                f"'instance of' unset. Must be set to 'television series season' for {itempage.title()}"
+                f"'instance of' unset. Must be set to 'television series season' for {self.qid}"
             )
-        instance_of = itempage.claims[wp.INSTANCE_OF.pid][0].getTarget().title()
+        instance_of = self.claims[wp.INSTANCE_OF.pid][0].getTarget().title()
         if instance_of != wp.TELEVISION_SERIES_SEASON:
             raise ValueError(
-                f"expected 'instance of' to be set to 'television series season' for {itempage.title()}, found {instance_of}"
+                f"expected 'instance of' to be set to 'television series season' for {self.qid}, found {instance_of}"
             )
 
-    @property
+    @api.memoized_property
     def parent(self):
         """The Series of which this season is a part"""
         series_itempage = self.first_claim(wp.PART_OF_THE_SERIES.pid)
-        return Series(series_itempage)
+        if series_itempage is None:
+            return None
+        return Series(series_itempage, self._repo)
 
-    @property
+    @api.memoized_property
     def series_qid(self) -> Optional[str]:
         """The ID of the series of which this episode is a part"""
         series = self.first_claim(wp.PART_OF_THE_SERIES.pid)
@@ -318,38 +340,16 @@ class Season(TvBase, api.Heirarchical, api.Chainable):
     @property
     def next_in_series(self) -> Optional[Season]:
         """The next season from the same series"""
-        if self.ordinal_in_series is None:
-            return None
-        query = f"""SELECT ?item WHERE {{
-            ?item wdt:{wp.INSTANCE_OF.pid} wd:{wp.TELEVISION_SERIES_SEASON}.
-            ?item wdt:{wp.PART_OF_THE_SERIES.pid} wd:{self.series_qid}.
-            ?item p:{wp.PART_OF_THE_SERIES.pid}/pq:{wp.SERIES_ORDINAL.pid} "{self.ordinal_in_series + 1}"
-            }}
-        """
-        gen = WikidataSPARQLPageGenerator(query)
-        next_season_itempage = next(gen, None)
-        if next_season_itempage is None:
+        if self.ordinal_in_series is None or self.graph is None:
             return None
-
-        return Season(next_season_itempage)
+        return self._season(self.graph.season_at(self.ordinal_in_series + 1))
 
     @property
     def previous_in_series(self) -> Optional[Season]:
         """The previous season from the same series"""
-        if self.ordinal_in_series is None:
-            return None
-        query = f"""SELECT ?item WHERE {{
-            ?item wdt:{wp.INSTANCE_OF.pid} wd:{wp.TELEVISION_SERIES_SEASON}.
-            ?item wdt:{wp.PART_OF_THE_SERIES.pid} wd:{self.series_qid}.
-            ?item p:{wp.PART_OF_THE_SERIES.pid}/pq:{wp.SERIES_ORDINAL.pid} "{self.ordinal_in_series - 1}"
-            }}
-        """
-        gen = WikidataSPARQLPageGenerator(query)
-        previous_season_itempage = next(gen, None)
-        if previous_season_itempage is None:
+        if self.ordinal_in_series is None or self.graph is None:
             return None
-
-        return Season(previous_season_itempage)
+        return self._season(self.graph.season_at(self.ordinal_in_series - 1))
 
     @property
     def next(self) -> Optional[Season]:
@@ -357,15 +357,13 @@ class Season(TvBase, api.Heirarchical, api.Chainable):
         # Check if it has the FOLLOWED_BY field set
         next_season_itempage = self.first_claim(wp.FOLLOWED_BY.pid)
         if next_season_itempage is not None:
-            return Season(next_season_itempage)
+            return Season(next_season_itempage, self._repo)
 
         # Find the item that has the FOLLOWS field set to this item
-        query = generate_sparql_query({wp.FOLLOWS.pid: self.qid})
-        gen = WikidataSPARQLPageGenerator(query)
-        is_followed_by = next(gen, None)
+        is_followed_by = self.linked_from(wp.FOLLOWS)
 
         if is_followed_by is not None:
-            return Season(is_followed_by)
+            return Season(is_followed_by, self._repo)
 
         # Find the item whose ordinal is one higher for this series
         if self.ordinal_in_series is not None:
@@ -379,15 +377,13 @@ class Season(TvBase, api.Heirarchical, api.Chainable):
         # Check if it has the FOLLOWS field set
         previous_season_itempage = self.first_claim(wp.FOLLOWS.pid)
         if previous_season_itempage is not None:
-            return Season(previous_season_itempage)
+            return Season(previous_season_itempage, self._repo)
 
         # Find the item that has the FOLLOWED_BY field set to this item
-        query = generate_sparql_query({wp.FOLLOWED_BY.pid: self.qid})
-        gen = WikidataSPARQLPageGenerator(query)
-        follows = next(gen, None)
+        follows = self.linked_from(wp.FOLLOWED_BY)
 
         if follows is not None:
-            return Season(follows)
+            return Season(follows, self._repo)
 
         # Find the item whose ordinal is one lower for this series
         if self.ordinal_in_series is not None:
@@ -398,11 +394,20 @@ class Season(TvBase, api.Heirarchical, api.Chainable):
     @property
     def parts(self):
         """An iterable of (ordinal, Episode) that are parts of this season"""
-        for ordinal, episode_id, _ in sorted(Q.episodes(self.qid)):
-            yield ordinal, Episode(ItemPage(self.repo, episode_id))
+        if self.graph is not None:
+            parts = self.graph.parts(self.qid)
+        else:
+            parts = [(ordinal, episode_id) for ordinal, episode_id, _ in sorted(Q.episodes(self.qid))]
+        for ordinal, episode_id in parts:
+            yield ordinal, Episode(ItemPage(self.repo, episode_id), self._repo)
+
+    def _season(self, qid: Optional[str]) -> Optional[Season]:
+        if qid is None:
+            return None
+        return Season(ItemPage(self.repo, qid), self._repo)
 
-    @property
-    def constraints(self):
+    @compiled_constraints
+    def constraints(cls):
         return (
             [
                 gc.has_property(prop)
@@ -438,8 +443,8 @@ class Season(TvBase, api.Heirarchical, api.Chainable):
 class Series(TvBase, api.Heirarchical):
     """Encapsulates an item of instance 'television series'"""
 
-    @property
-    def constraints(self):
+    @compiled_constraints
+    def constraints(cls):
         return [
             gc.has_property(prop)
             for prop in (
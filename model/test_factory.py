@@ -0,0 +1,84 @@
+import sys
+import unittest
+from unittest.mock import patch
+
+import model.factory as factory_module
+from model.factory import Factory
+from model.snapshot import EntitySnapshot
+from model.television import Episode
+
+television_module = sys.modules[Episode.__module__]
+
+
+class Claim:
+    def __init__(self, qid):
+        self.qid = qid
+
+    def getTarget(self):  # pylint: disable=invalid-name
+        return self
+
+    @property
+    def id(self):
+        return self.qid
+
+
+class LoadedPage:
+    """A loaded episode that is not part of a series"""
+    def __init__(self, qid):
+        self.qid = qid
+        self._content = {}
+        self.claims = {"P31": [Claim("Q21191270")]}
+
+    def title(self):
+        return self.qid
+
+
+def _episode(qid):
+    return EntitySnapshot.from_json("repo", {
+        "id": qid,
+        "claims": {"P31": [{"mainsnak": {
+            "snaktype": "value", "property": "P31", "datatype": "wikibase-item", "datavalue": {"value": {"id": "Q21191270"}}
+        }}]},
+    })
+
+
+class PreloadedLinksTests(unittest.TestCase):
+    def setUp(self):
+        self.queries = []
+
+        def select_grouped(key_val_pairs, repo):
+            (pid, qids), = key_val_pairs.items()
+            self.queries.append(pid)
+            return {qid: [f"{qid}-{pid}"] for qid in qids}
+
+        for patcher in (
+            patch.object(television_module, "select_grouped", select_grouped),
+            patch.object(television_module, "select_items", lambda query, repo, ttl: iter(["queried"])),
+            patch.object(television_module, "ItemPage", lambda repo, qid: qid),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_wrappers_take_the_links_of_their_item(self):
+        factory = Factory("repo")
+        factory.preload_links([LoadedPage("Q1"), LoadedPage("Q2")])
+        self.assertEqual(self.queries, ["P155", "P156"])
+
+        episode = factory.typed_snapshot(_episode("Q1"))
+        self.assertEqual(episode.linked_from(television_module.wp.FOLLOWS), "Q1-P155")
+        self.assertEqual(episode.linked_from(television_module.wp.FOLLOWED_BY), "Q1-P156")
+        # The factory lets go of the links once they are handed over
+        self.assertEqual(list(factory._links), ["Q2"])
+        # Other factories (eg: of other runs) do not see them
+        self.assertEqual(Factory("repo").typed_snapshot(_episode("Q2")).linked_from(television_module.wp.FOLLOWS), "queried")
+
+    def test_keeps_the_links_of_the_last_items(self):
+        factory = Factory("repo")
+        with patch.object(factory_module, "MAX_PRELOADED_ITEMS", 3):
+            for start in range(0, 10, 2):
+                factory.preload_links([LoadedPage(f"Q{start}"), LoadedPage(f"Q{start + 1}")])
+        self.assertEqual(list(factory._links), ["Q7", "Q8", "Q9"])
+
+
+if __name__ == "__main__":
+    unittest.main()
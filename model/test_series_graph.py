@@ -0,0 +1,25 @@
+import unittest
+
+import properties.wikidata_properties as wp
+
+from .series_graph import SeriesGraph
+
+
+class SeriesGraphTests(unittest.TestCase):
+    def test_ordinals_that_are_dates(self):
+        graph = SeriesGraph.from_rows("Q1", [])
+        graph.add_item("Q10", wp.TELEVISION_SERIES_SEASON, series_ordinal="1")
+        graph.add_item("Q11", wp.TELEVISION_SERIES_EPISODE, "20190101", season_qid="Q10", season_ordinal="20190101")
+        graph.add_item("Q12", wp.TELEVISION_SERIES_EPISODE, "2", season_qid="Q10", season_ordinal="1")
+        graph.add_item("Q13", wp.TELEVISION_SERIES_EPISODE, "3", season_qid="Q10", season_ordinal="1")
+
+        self.assertEqual(len(graph.episodes), 3)
+        self.assertEqual(graph.episode_at(20190101), "Q11")
+        self.assertIsNone(graph.episode_at(20190102))
+        self.assertEqual(graph.episode_in_season("Q10", 1), "Q12")
+        self.assertEqual(graph.parts("Q10"), [(1, "Q12"), (20190101, "Q11")])
+        self.assertEqual(graph.season_at(1), "Q10")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+import json
+import sys
+import unittest
+from unittest.mock import patch
+
+import constraints.general as gc
+from model.snapshot import EntitySnapshot
+from model.television import Episode
+
+
+def _snak(pid, datatype, value):
+    return {"snaktype": "value", "property": pid, "datatype": datatype, "datavalue": {"value": value}}
+
+
+def _episode(qid, languages=300):
+    labels = {f"l{n}": {"language": f"l{n}", "value": f"Episode {n}"} for n in range(languages)}
+    labels["en"] = {"language": "en", "value": "Pilot"}
+    return {
+        "id": qid,
+        "lastrevid": 42,
+        "labels": labels,
+        "descriptions": {lang: {"language": lang, "value": f"An episode ({lang})"} for lang in labels},
+        "aliases": {},
+        "sitelinks": {f"{lang}wiki": {"site": f"{lang}wiki", "title": "Pilot", "badges": []} for lang in labels},
+        "claims": {
+            "P31": [{"mainsnak": _snak("P31", "wikibase-item", {"entity-type": "item", "numeric-id": 21191270}), "rank": "normal"}],
+            "P4908": [{
+                "mainsnak": _snak("P4908", "wikibase-item", {"entity-type": "item", "numeric-id": 11, "id": "Q11"}),
+                "rank": "normal",
+                "qualifiers": {"P1545": [_snak("P1545", "string", "3")]},
+            }],
+            "P345": [{"mainsnak": _snak("P345", "external-id", "tt0000001"), "rank": "normal"}],
+            "P1113": [{"mainsnak": {"snaktype": "somevalue", "property": "P1113", "datatype": "quantity"}, "rank": "normal"}],
+        },
+    }
+
+
+def _deep_size(obj, seen=None) -> int:
+    """The memory used by obj and everything it refers to, counting shared objects once"""
+    seen = set() if seen is None else seen
+    if id(obj) in seen or obj is None:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_deep_size(key, seen) + _deep_size(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(_deep_size(value, seen) for value in obj)
+    elif hasattr(obj, "__slots__"):
+        size += sum(_deep_size(getattr(obj, name), seen) for name in obj.__slots__)
+    elif hasattr(obj, "items"):
+        size += sum(_deep_size(key, seen) + _deep_size(value, seen) for key, value in obj.items())
+    return size
+
+
+class SnapshotTests(unittest.TestCase):
+    def test_keeps_the_needed_parts(self):
+        snapshot = EntitySnapshot.from_json(None, _episode("Q12"), properties={"P31", "P4908", "P1113", "P179"})
+        self.assertEqual((snapshot.qid, snapshot.revid, snapshot.label, snapshot.description), ("Q12", 42, "Pilot", "An episode (en)"))
+        self.assertEqual(sorted(snapshot.claims), ["P1113", "P31", "P4908"])
+        self.assertEqual(snapshot.instance_ids, {"Q21191270"})
+
+        season = snapshot.claims["P4908"][0]
+        self.assertEqual(season.target_id, "Q11")
+        self.assertEqual(season.qualifiers["P1545"][0].getTarget(), "3")
+        self.assertIsNone(snapshot.first_claim("P1113"))
+        self.assertEqual(snapshot.first_claim("P179", "default"), "default")
+
+    def test_is_read_only(self):
+        snapshot = EntitySnapshot.from_json(None, _episode("Q12"))
+        with self.assertRaises(AttributeError):
+            snapshot.label = "Renamed"
+        with self.assertRaises(AttributeError):
+            snapshot.claims["P31"][0].value = "Q5"
+        with self.assertRaises(TypeError):
+            snapshot.claims["P1"] = ()
+
+    def test_ids_are_shared_between_snapshots(self):
+        first, second = (EntitySnapshot.from_json(None, json.loads(json.dumps(_episode(qid)))) for qid in ("Q12", "Q13"))
+        self.assertIs(first.claims["P4908"][0].value, second.claims["P4908"][0].value)
+        self.assertIs(next(iter(first.claims)), next(iter(second.claims)))
+
+    def test_is_an_order_of_magnitude_smaller(self):
+        content = _episode("Q12")
+        snapshot = EntitySnapshot.from_json(None, content, properties={"P31", "P4908"})
+        self.assertLess(_deep_size(snapshot) * 10, _deep_size(content))
+
+    def test_edits_are_based_on_the_snapshot_revision(self):
+        class Page:
+            """An ItemPage the entity cache loaded at a later revision"""
+            def __init__(self, repo, qid):
+                self.latest_revision_id = 43
+
+        snapshot = EntitySnapshot.from_json(None, _episode("Q12"))
+        module = sys.modules[EntitySnapshot.__module__]
+        with patch.object(module, "ItemPage", Page), patch.object(module, "load_items", lambda pages: pages):
+            self.assertEqual(snapshot.to_itempage().latest_revision_id, 42)
+
+
+class ProjectionTests(unittest.TestCase):
+    def test_follows_as_a_qualifier_of_any_property(self):
+        content = _episode("Q12")
+        # 'part of' (P361), with 'follows' and 'followed by' as qualifiers
+        content["claims"]["P361"] = [{
+            "mainsnak": _snak("P361", "wikibase-item", {"entity-type": "item", "numeric-id": 10, "id": "Q10"}),
+            "rank": "normal",
+            "qualifiers": {
+                "P155": [_snak("P155", "wikibase-item", {"entity-type": "item", "numeric-id": 11, "id": "Q11"})],
+                "P156": [_snak("P156", "wikibase-item", {"entity-type": "item", "numeric-id": 13, "id": "Q13"})],
+            },
+        }]
+
+        projected = Episode.projection().apply(content)
+        self.assertIn("P361", projected["claims"])
+
+        episode = Episode(EntitySnapshot.from_json(None, projected, Episode.needed_properties()), repo=object())
+        self.assertTrue(gc.follows_something().validate(episode))
+        self.assertTrue(gc.is_followed_by_something().validate(episode))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1 @@
+"""Shared plumbing for outbound requests (Wikidata API, SPARQL and scraping)"""
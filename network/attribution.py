@@ -0,0 +1,166 @@
+"""Attributing outbound requests to the item, model and constraint making them
+
+    Code that is about to make requests tags them with tagged(...), eg:
+    the bots tag the validation of each constraint with the item, its
+    model class, the constraint and the "validate" phase. Tags are kept per
+    thread and nest, an inner tag overriding the fields it sets.
+
+    Every request is timed with request(kind), which endpoint() (see
+    limits.py) does for reads, and every active NetworkAttribution records
+    it against the tag of the thread making it.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+API_READ = "api read"
+API_WRITE = "api write"
+SPARQL = "sparql"
+SCRAPE = "scrape"
+
+KINDS = (API_READ, API_WRITE, SPARQL, SCRAPE)
+
+
+class Tag(NamedTuple):
+    """What a request is made for"""
+
+    item: Optional[str] = None
+    model: Optional[str] = None
+    constraint: Optional[str] = None
+    phase: Optional[str] = None
+
+
+_local = threading.local()
+
+
+def _tags() -> List[Tag]:
+    tags = getattr(_local, "tags", None)
+    if tags is None:
+        tags = _local.tags = [Tag()]
+    return tags
+
+
+def current_tag() -> Tag:
+    """The tag of the requests made on the current thread"""
+    return _tags()[-1]
+
+
+class tagged:
+    """Tag the requests made on the current thread within the block
+
+        Arguments are fields of Tag. The fields that are not given keep
+        their value from the enclosing tag.
+    """
+
+    def __init__(self, **fields):
+        self.fields = fields
+
+    def __enter__(self):
+        tags = _tags()
+        tags.append(tags[-1]._replace(**self.fields))
+        return tags[-1]
+
+    def __exit__(self, *exc_info):
+        _tags().pop()
+
+
+class CallStats:
+    """The number of requests made, and the seconds they took"""
+
+    __slots__ = ("count", "seconds")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def add(self, count: int, seconds: float) -> None:
+        self.count += count
+        self.seconds += seconds
+
+
+class NetworkAttribution:
+    """Collects the requests made by all threads while it is active
+
+        Use it as a context manager. Several attributions can be active at
+        once, in which case every request is recorded by all of them.
+    """
+
+    _active: List["NetworkAttribution"] = []
+    _active_lock = threading.Lock()
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls: Dict[Tuple[Tag, str], CallStats] = {}
+
+    def record(self, tag: Tag, kind: str, seconds: float) -> None:
+        with self._lock:
+            stats = self.calls.get((tag, kind))
+            if stats is None:
+                stats = self.calls[(tag, kind)] = CallStats()
+            stats.add(1, seconds)
+
+    def by_constraint(self) -> Dict[Tuple[str, str, str], Dict[str, CallStats]]:
+        """The requests made for each (model, constraint, phase), by kind"""
+        totals: Dict[Tuple[str, str, str], Dict[str, CallStats]] = {}
+        with self._lock:
+            for (tag, kind), stats in self.calls.items():
+                key = (tag.model or "-", tag.constraint or "-", tag.phase or "-")
+                totals.setdefault(key, {}).setdefault(kind, CallStats()).add(stats.count, stats.seconds)
+        return totals
+
+    def by_item(self) -> Dict[str, CallStats]:
+        """The requests made for each item, all kinds together"""
+        totals: Dict[str, CallStats] = {}
+        with self._lock:
+            for (tag, _), stats in self.calls.items():
+                totals.setdefault(tag.item or "-", CallStats()).add(stats.count, stats.seconds)
+        return totals
+
+    def summary(self, width: int = 60) -> str:
+        """A table of the requests made for each constraint, most time consuming first
+
+            Each kind of request has a count and a total latency in seconds.
+        """
+        rows = sorted(
+            self.by_constraint().items(),
+            key=lambda row: sum(stats.seconds for stats in row[1].values()),
+            reverse=True,
+        )
+        header = f"{'model':<12}{'constraint':<{width}}{'phase':<10}" + "".join(f"{kind:>18}" for kind in KINDS)
+        lines = [header, "-" * len(header)]
+        for (model, constraint, phase), kinds in rows:
+            cells = []
+            for kind in KINDS:
+                stats = kinds.get(kind)
+                cells.append(f"{stats.count:>8} {stats.seconds:>8.2f}s" if stats else f"{'':>18}")
+            lines.append(f"{model:<12}{constraint[:width - 1]:<{width}}{phase:<10}" + "".join(cells))
+        return "\n".join(lines)
+
+    def __bool__(self):
+        return bool(self.calls)
+
+    def __enter__(self):
+        with NetworkAttribution._active_lock:
+            NetworkAttribution._active.append(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        with NetworkAttribution._active_lock:
+            NetworkAttribution._active.remove(self)
+
+
+@contextmanager
+def request(kind: str):
+    """Time the request made within the block, and attribute it to the current tag"""
+    if not NetworkAttribution._active:
+        yield
+        return
+    tag = current_tag()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        for attribution in list(NetworkAttribution._active):
+            attribution.record(tag, kind, seconds)
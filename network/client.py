@@ -0,0 +1,137 @@
+"""A shared, pooled HTTP client for scraping external sites
+
+    All scrapers (see utils.py and external_identifier.py) fetch pages
+    through a single requests.Session, so connections are kept alive and
+    reused instead of paying for a new TLS handshake on every lookup.
+
+    Every request has a timeout, is retried on connection errors and on
+    429/5xx responses, and holds a slot of the SCRAPE endpoint (see
+    limits.py) as well as one of a few slots for its host, so that a batch
+    fetch never hammers a single site.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import urlsplit
+
+import pywikibot.logging as botlogging
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .limits import SCRAPE, endpoint
+
+# (connect, read) timeouts in seconds
+DEFAULT_TIMEOUT = (5, 30)
+DEFAULT_PER_HOST = 4
+DEFAULT_RETRIES = 2
+USER_AGENT = "wikidata-toolkit (https://github.com/havanagrawal/wikidata-toolkit)"
+
+
+class ScrapingClient:
+    """A thread-safe HTTP client with connection pooling and per-host limits
+
+        Arguments
+        ---------
+        per_host: int
+            The maximum number of concurrent requests to a single host
+        timeout: tuple
+            The (connect, read) timeout of every request, in seconds
+        retries: int
+            The number of times a failed request is retried
+        pool_size: int
+            The number of connections kept alive per host
+    """
+
+    def __init__(
+        self,
+        per_host: int = DEFAULT_PER_HOST,
+        timeout=DEFAULT_TIMEOUT,
+        retries: int = DEFAULT_RETRIES,
+        pool_size: int = 10,
+    ):
+        self.per_host = per_host
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = USER_AGENT
+        retry = Retry(
+            total=retries,
+            backoff_factor=0.5,
+            status_forcelist=(429, 500, 502, 503, 504),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._hosts: Dict[str, threading.BoundedSemaphore] = {}
+        self._hosts_lock = threading.Lock()
+
+    def _host_slots(self, url: str) -> threading.BoundedSemaphore:
+        host = urlsplit(url).netloc
+        with self._hosts_lock:
+            if host not in self._hosts:
+                self._hosts[host] = threading.BoundedSemaphore(self.per_host)
+            return self._hosts[host]
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """GET this URL, waiting for a free slot for its host first
+
+            Keyword arguments are passed on to requests.Session.get.
+            Responses are returned whatever their status code.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        with self._host_slots(url), endpoint(SCRAPE):
+            return self.session.get(url, **kwargs)
+
+    def fetch_many(
+        self, urls: Iterable[str], workers: int = 8, headers: Iterable[Optional[dict]] = None
+    ) -> List[Optional[requests.Response]]:
+        """GET all these URLs concurrently
+
+            headers, if given, holds the extra request headers for each URL
+            (or None), in the same order as the URLs.
+
+            Returns the responses in the same order as the URLs. A URL that
+            could not be fetched at all (eg: it timed out) has None instead.
+        """
+        urls = list(urls)
+        if not urls:
+            return []
+        headers = [None] * len(urls) if headers is None else list(headers)
+        with ThreadPoolExecutor(max_workers=min(workers, len(urls)), thread_name_prefix="scrape") as executor:
+            return list(executor.map(self._get_or_none, urls, headers))
+
+    def _get_or_none(self, url: str, headers: Optional[dict] = None) -> Optional[requests.Response]:
+        try:
+            return self.get(url, headers=headers)
+        except requests.RequestException as e:
+            botlogging.warning(f"Unable to fetch {url}: {e}")
+            return None
+
+    def close(self) -> None:
+        self.session.close()
+
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def default_client() -> ScrapingClient:
+    """The process-wide scraping client"""
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = ScrapingClient()
+        return _default_client
+
+
+def fetch(url: str, **kwargs) -> requests.Response:
+    """GET a URL with the default scraping client"""
+    return default_client().get(url, **kwargs)
+
+
+def fetch_many(
+    urls: Iterable[str], workers: int = 8, headers: Iterable[Optional[dict]] = None
+) -> List[Optional[requests.Response]]:
+    """GET several URLs concurrently with the default scraping client"""
+    return default_client().fetch_many(urls, workers=workers, headers=headers)
@@ -0,0 +1,185 @@
+"""Consuming the Wikimedia recentchange event stream
+
+    The stream is served as Server-Sent Events (SSE). stream_events reads
+    it over a plain streaming HTTP request, reconnecting (with the ID of
+    the last event received, so nothing is missed) whenever the connection
+    drops. item_changes turns the events into edits of Wikidata items, and
+    ChangeBatcher groups the edits of the items we care about into
+    batches, so that a burst of edits to one item is only handled once.
+
+    stream_events takes the URL of the stream, so it can be pointed at a
+    local stand-in for testing.
+"""
+import json
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+import requests
+
+RECENTCHANGE_URL = "https://stream.wikimedia.org/v2/stream/recentchange"
+
+
+class Event(NamedTuple):
+    """A single Server-Sent Event"""
+
+    id: Optional[str]
+    event: Optional[str]
+    data: str
+
+
+class ItemChange(NamedTuple):
+    """An edit (or creation) of a Wikidata item"""
+
+    qid: str
+    revision: Optional[int]
+    user: Optional[str]
+    timestamp: Optional[int]
+
+
+def read_events(lines: Iterable[str]) -> Iterator[Event]:
+    """Parse the lines of an SSE stream into events"""
+    event_id, event_type, data = None, None, []
+    for line in lines:
+        if not line:
+            # A blank line dispatches the event
+            if data:
+                yield Event(event_id, event_type, "\n".join(data))
+            event_type, data = None, []
+            continue
+        if line.startswith(":"):
+            # Comments are used as keep-alives
+            continue
+        field, _, value = line.partition(":")
+        if value.startswith(" "):
+            value = value[1:]
+        if field == "data":
+            data.append(value)
+        elif field == "id":
+            event_id = value
+        elif field == "event":
+            event_type = value
+    if data:
+        yield Event(event_id, event_type, "\n".join(data))
+
+
+def stream_events(
+    url: str = RECENTCHANGE_URL,
+    last_event_id: str = None,
+    session: requests.Session = None,
+    timeout=(5, 60),
+    reconnect_delay: float = 5.0,
+    max_reconnects: int = None,
+) -> Iterator[Event]:
+    """The events of an SSE stream, reconnecting whenever the connection drops
+
+        The stream is resumed from the last event received. With
+        max_reconnects=None, it reconnects forever.
+    """
+    session = session if session is not None else requests.Session()
+    reconnects = 0
+    while True:
+        headers = {"Accept": "text/event-stream"}
+        if last_event_id is not None:
+            headers["Last-Event-ID"] = last_event_id
+        try:
+            with session.get(url, headers=headers, stream=True, timeout=timeout) as response:
+                response.raise_for_status()
+                for event in read_events(response.iter_lines(decode_unicode=True)):
+                    if event.id is not None:
+                        last_event_id = event.id
+                    yield event
+        except requests.RequestException as e:
+            print(f"Lost connection to {url}: {e}")
+
+        if max_reconnects is not None and reconnects >= max_reconnects:
+            return
+        reconnects += 1
+        time.sleep(reconnect_delay)
+
+
+def item_changes(events: Iterable[Event], wiki: str = "wikidatawiki") -> Iterator[ItemChange]:
+    """The edits and creations of items on this wiki, out of a stream of recentchange events"""
+    for event in events:
+        if event.event not in (None, "message"):
+            continue
+        try:
+            change = json.loads(event.data)
+        except ValueError:
+            continue
+        if change.get("wiki") != wiki or change.get("namespace") != 0:
+            continue
+        if change.get("type") not in ("edit", "new"):
+            continue
+        revision = change.get("revision") or {}
+        yield ItemChange(change["title"], revision.get("new"), change.get("user"), change.get("timestamp"))
+
+
+class ChangeBatcher:
+    """Groups the changes to tracked items into batches of distinct items
+
+        A batch is handed out once it holds max_batch items, or max_wait
+        seconds after its first change. Several changes to one item in the
+        meantime end up as a single entry, with the latest revision, and a
+        revision that was already handed out is never handed out again.
+
+        Since batches are only checked for when a change arrives, a batch
+        can be late by as long as the stream is quiet. The recentchange
+        stream of Wikimedia sees several changes a second.
+
+        Arguments
+        ---------
+        is_tracked: Callable[[str], bool]
+            Whether changes to the item with this QID should be handled
+        max_batch: int
+            The largest number of items in a batch
+        max_wait: float
+            The number of seconds a change can wait for its batch to fill up
+        ignore_users: Iterable[str]
+            Changes made by these users (eg: this bot) are ignored
+    """
+
+    def __init__(
+        self,
+        is_tracked: Callable[[str], bool],
+        max_batch: int = 50,
+        max_wait: float = 30.0,
+        ignore_users: Iterable[str] = (),
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.is_tracked = is_tracked
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.ignore_users = set(ignore_users)
+        self.clock = clock
+        self.handed_out: Dict[str, int] = {}
+
+    def _is_new(self, change: ItemChange) -> bool:
+        if change.user in self.ignore_users or not self.is_tracked(change.qid):
+            return False
+        if change.revision is None:
+            return True
+        return change.revision > self.handed_out.get(change.qid, 0)
+
+    def batches(self, changes: Iterable[ItemChange]) -> Iterator[List[ItemChange]]:
+        pending: Dict[str, ItemChange] = {}
+        started = None
+        for change in changes:
+            if self._is_new(change):
+                previous = pending.get(change.qid)
+                if previous is None or (change.revision or 0) >= (previous.revision or 0):
+                    pending[change.qid] = change
+                if started is None:
+                    started = self.clock()
+
+            if pending and (len(pending) >= self.max_batch or self.clock() - started >= self.max_wait):
+                yield self._hand_out(pending)
+                pending, started = {}, None
+
+        if pending:
+            yield self._hand_out(pending)
+
+    def _hand_out(self, pending: Dict[str, ItemChange]) -> List[ItemChange]:
+        for change in pending.values():
+            if change.revision is not None:
+                self.handed_out[change.qid] = change.revision
+        return list(pending.values())
@@ -0,0 +1,53 @@
+"""Per-endpoint concurrency caps
+
+    Every outbound request is made inside `with endpoint(<name>):`, where
+    the name is one of API, SPARQL or SCRAPE. By default there are no caps.
+    Once caps are configured (eg: by a bot running with several workers),
+    at most that many requests to each endpoint are in flight at a time,
+    however many threads are making requests.
+
+    The requests are also timed and attributed (see attribution.py), once
+    they hold their slot.
+"""
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from .attribution import API_READ, request
+
+API = "api"
+SPARQL = "sparql"
+SCRAPE = "scrape"
+
+# The kind of requests made to each endpoint, for attribution
+_KINDS = {API: API_READ}
+
+# WDQS asks for no more than 5 parallel queries per client
+DEFAULT_LIMITS = {API: 4, SPARQL: 2, SCRAPE: 4}
+
+_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+
+
+def configure(limits: Optional[Dict[str, int]] = None) -> None:
+    """Cap the number of concurrent requests to each endpoint
+
+        Endpoints that are not in limits are not capped. Passing None
+        applies DEFAULT_LIMITS, and passing an empty dict removes all caps.
+    """
+    global _semaphores
+    if limits is None:
+        limits = DEFAULT_LIMITS
+    _semaphores = {name: threading.BoundedSemaphore(n) for name, n in limits.items()}
+
+
+@contextmanager
+def endpoint(name: str):
+    """Hold one of the concurrency slots of this endpoint for the duration of the block"""
+    semaphore = _semaphores.get(name)
+    kind = _KINDS.get(name, name)
+    if semaphore is None:
+        with request(kind):
+            yield
+        return
+    with semaphore, request(kind):
+        yield
@@ -0,0 +1,42 @@
+"""A single, shared queue for all edits
+
+    Reads can run concurrently, but edits should not: Wikidata asks bots to
+    make one edit at a time, and to pause whenever the servers are lagged.
+    An EditScheduler runs every edit submitted to it on one writer thread,
+    in the order they were submitted.
+
+    pywikibot sends maxlag with every write and waits while the servers are
+    lagged. Since only one edit is ever in flight, a lag pause holds back
+    every queued edit, rather than each thread backing off on its own.
+"""
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable
+
+
+class EditScheduler:
+    """Runs edits one at a time, in submission order, on a writer thread
+
+        Use it as a context manager, so that queued edits are finished
+        before moving on.
+    """
+
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="edits")
+
+    def submit(self, func: Callable, *args, **kwargs) -> Future:
+        """Queue an edit, and return a Future of its result"""
+        return self._executor.submit(func, *args, **kwargs)
+
+    def run(self, func: Callable, *args, **kwargs):
+        """Queue an edit, and wait for its result"""
+        return self.submit(func, *args, **kwargs).result()
+
+    def close(self) -> None:
+        """Wait for all queued edits to finish"""
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
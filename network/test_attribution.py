@@ -0,0 +1,41 @@
+import threading
+import unittest
+
+from .attribution import API_READ, SPARQL, NetworkAttribution, Tag, current_tag, request, tagged
+from .limits import SPARQL as SPARQL_ENDPOINT, endpoint
+
+
+class AttributionTests(unittest.TestCase):
+    def test_tags_nest(self):
+        with tagged(item="Q1", model="Episode"):
+            with tagged(constraint="has_title", phase="validate"):
+                self.assertEqual(current_tag(), Tag("Q1", "Episode", "has_title", "validate"))
+            self.assertEqual(current_tag(), Tag("Q1", "Episode", None, None))
+        self.assertEqual(current_tag(), Tag())
+
+    def test_requests_are_attributed_across_threads(self):
+        def work(qid):
+            with tagged(item=qid, model="Episode", constraint="follows_something", phase="validate"):
+                with endpoint(SPARQL_ENDPOINT):
+                    pass
+                with request(API_READ):
+                    pass
+
+        with NetworkAttribution() as attribution:
+            threads = [threading.Thread(target=work, args=(f"Q{n}",)) for n in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        # Not recorded, since the attribution is no longer active
+        with request(API_READ):
+            pass
+
+        kinds = attribution.by_constraint()[("Episode", "follows_something", "validate")]
+        self.assertEqual({kind: stats.count for kind, stats in kinds.items()}, {SPARQL: 4, API_READ: 4})
+        self.assertEqual(sorted(attribution.by_item()), ["Q0", "Q1", "Q2", "Q3"])
+        self.assertIn("follows_something", attribution.summary())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .events import ChangeBatcher, ItemChange, item_changes, read_events, stream_events
+
+
+def change(qid, revision, user="Someone", wiki="wikidatawiki", namespace=0, type="edit"):
+    return {
+        "wiki": wiki,
+        "namespace": namespace,
+        "type": type,
+        "title": qid,
+        "user": user,
+        "revision": {"old": revision - 1, "new": revision},
+    }
+
+
+class StandInStream(BaseHTTPRequestHandler):
+    """Serves a fixed recentchange stream, resuming after Last-Event-ID"""
+
+    changes = [
+        change("Q1", 10),
+        change("Q2", 11, wiki="enwiki"),
+        change("Q1", 12),
+        change("Q3", 13),
+        change("Q4", 14, namespace=1),
+        change("Q3", 15, user="Bot"),
+    ]
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        start = int(self.headers.get("Last-Event-ID", -1)) + 1
+        self.wfile.write(b":ok\n\n")
+        for i, data in enumerate(self.changes[start:], start=start):
+            self.wfile.write(f"event: message\nid: {i}\ndata: {json.dumps(data)}\n\n".encode("utf-8"))
+
+    def log_message(self, *args):
+        pass
+
+
+class EventStreamTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StandInStream)
+        cls.url = f"http://127.0.0.1:{cls.server.server_address[1]}/v2/stream/recentchange"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def test_read_events(self):
+        lines = [": keep-alive", "", "id: 1", "data: {\"a\":", "data: 1}", "", "data: x"]
+        events = list(read_events(lines))
+        self.assertEqual([e.data for e in events], ['{"a":\n1}', "x"])
+        self.assertEqual(events[0].id, "1")
+
+    def test_item_changes_from_stream(self):
+        events = stream_events(self.url, max_reconnects=0)
+        changes = list(item_changes(events))
+        self.assertEqual([(c.qid, c.revision) for c in changes], [("Q1", 10), ("Q1", 12), ("Q3", 13), ("Q3", 15)])
+
+    def test_resumes_after_last_event(self):
+        events = list(stream_events(self.url, last_event_id="3", max_reconnects=0))
+        self.assertEqual([e.id for e in events], ["4", "5"])
+
+    def test_batches_are_deduplicated(self):
+        batcher = ChangeBatcher(lambda qid: qid in {"Q1", "Q3"}, max_batch=10, ignore_users=["Bot"])
+        changes = item_changes(stream_events(self.url, max_reconnects=0))
+        batches = list(batcher.batches(changes))
+        self.assertEqual([[(c.qid, c.revision) for c in batch] for batch in batches], [[("Q1", 12), ("Q3", 13)]])
+
+        # Revisions that were already handed out are not handed out again
+        changes = item_changes(stream_events(self.url, max_reconnects=0))
+        self.assertEqual(list(batcher.batches(changes)), [])
+
+    def test_batches_are_handed_out_after_max_wait(self):
+        now = [0.0]
+        batcher = ChangeBatcher(lambda qid: True, max_batch=10, max_wait=5, clock=lambda: now[0])
+
+        def changes():
+            for i, qid in enumerate(["Q1", "Q2", "Q3", "Q4"]):
+                now[0] = 4.0 * i
+                yield ItemChange(qid, i + 1, "Someone", None)
+
+        batches = [[c.qid for c in batch] for batch in batcher.batches(changes())]
+        # The change that arrives after max_wait is still part of the batch
+        self.assertEqual(batches, [["Q1", "Q2", "Q3"], ["Q4"]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+"""Single entry point for running SPARQL queries against WDQS"""
+from typing import Dict, Iterator, List, Optional
+
+from pywikibot import ItemPage, Site
+from pywikibot.data.sparql import SparqlQuery
+
+from network.limits import SPARQL, endpoint
+from sparql.query_builder import KEY, Values, generate_sparql_queries
+from sparql.results import default_cache
+
+
+def select(query: str, repo=None, ttl: float = 0) -> List[Dict[str, Optional[str]]]:
+    """Run a SELECT query, returning a list of rows
+
+        Each row is a dict from variable name to value. Unbound variables
+        are None.
+
+        By default (ttl=0), the query is always sent and its results are
+        not cached, so that edits made by others show up. Callers that can
+        live with stale results opt in to the disk cache (see
+        sparql.results) with a ttl in seconds, or None for the cache's
+        default TTL.
+    """
+    repo = Site().data_repository() if repo is None else repo
+    cache = default_cache() if ttl != 0 else None
+    if cache is not None:
+        rows = cache.get(repo.sitename, query)
+        if rows is not None:
+            return rows
+
+    with endpoint(SPARQL):
+        rows = SparqlQuery(repo=repo).select(query)
+    # A failed query gives None, and is not cached
+    if rows is not None and cache is not None:
+        cache.put(repo.sitename, query, rows, ttl)
+    return rows or []
+
+
+def select_items(query: str, repo=None, item_name: str = "item", ttl: float = 0) -> Iterator[ItemPage]:
+    """Run a SELECT query, and yield an ItemPage for each value of ?item"""
+    repo = Site().data_repository() if repo is None else repo
+    for row in select(query, repo, ttl):
+        value = row.get(item_name)
+        if value is not None:
+            yield ItemPage(repo, str(value).split("/")[-1])
+
+
+def select_grouped(key_val_pairs: Dict[str, Values], repo=None, ttl: float = 0) -> Dict[str, List[str]]:
+    """The QIDs of the items that have these property values, grouped by the value they matched
+
+        One property is given a collection of QIDs (see
+        sparql.query_builder.generate_sparql_query), eg: {FOLLOWS: episode_ids}
+        finds the episodes following each of the episodes. Every one of
+        those QIDs is a key of the result, with an empty list if no item
+        matched it. The values are split across as few queries as fit.
+    """
+    repo = Site().data_repository() if repo is None else repo
+    groups: Dict[str, List[str]] = {}
+    for val in key_val_pairs.values():
+        if not isinstance(val, str):
+            groups.update((qid, []) for qid in val)
+
+    for query in generate_sparql_queries(key_val_pairs):
+        for row in select(query, repo, ttl):
+            if row.get("item") is None or row.get(KEY) is None:
+                continue
+            key = str(row[KEY]).split("/")[-1]
+            groups.setdefault(key, []).append(str(row["item"]).split("/")[-1])
+    return groups
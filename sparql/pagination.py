@@ -0,0 +1,139 @@
+"""Running large SELECT queries in pages of QID ranges
+
+    A query over every item of some type (especially one going through
+    the label service) easily runs into the 60 second WDQS timeout, and
+    its rows are only available once all of them are in. Instead, the
+    query is run once per range of QIDs (Q1..Q10000000,
+    Q10000001..Q20000000, and so on), by replacing the QID_RANGE marker of
+    the query with a filter on the numeric part of the item's QID. Rows are
+    yielded as each page comes in, and a page that fails (eg: times out)
+    is split in two and retried. The pages after it are as narrow as the
+    ones that worked.
+
+    The range filter is computed from the item's IRI, so WDQS cannot use
+    an index for it: every page still goes through all the items matching
+    the patterns before the marker (eg: every film), and the filter only
+    spares the page the patterns after it and the label service. That
+    scan is paid once per page, so pages are wide by default (about 13
+    for all of Wikidata, rather than the 130 that ranges of a million
+    QIDs take), and are only narrowed when one fails.
+
+    If a checkpoint is given, the last QID covered by a fully consumed
+    page is recorded in it, and a resumed run starts from the page after.
+"""
+from functools import partial
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from pywikibot import Site
+from pywikibot.exceptions import Error
+from requests import RequestException
+
+from cache import Checkpoint
+from network.limits import API, endpoint
+from sparql.client import select
+
+# The marker replaced by the range filter, on a line of its own in the WHERE clause
+QID_RANGE = "#QID_RANGE"
+
+# The key under which the covered QIDs are recorded in a checkpoint
+PAGES_KEY = "#pages"
+
+# The number of QIDs covered by a page, unless one fails
+DEFAULT_WIDTH = 10_000_000
+
+Row = Dict[str, Optional[str]]
+
+
+def qid_range_filter(variable: str, start: int, stop: int) -> str:
+    """A filter keeping the values of ?variable from Q(start + 1) to Q(stop)"""
+    # Skip "http://www.wikidata.org/entity/Q" (32 characters)
+    return (
+        f"BIND(xsd:integer(SUBSTR(STR(?{variable}), 33)) AS ?{variable}Number)\n"
+        f"    FILTER(?{variable}Number > {start} && ?{variable}Number <= {stop})"
+    )
+
+
+def latest_qid(repo=None) -> int:
+    """The numeric part of the QID of the most recently created item"""
+    repo = Site().data_repository() if repo is None else repo
+    request = repo.simple_request(
+        action="query", list="recentchanges", rctype="new", rcnamespace=0, rclimit=1, rcprop="title"
+    )
+    with endpoint(API):
+        changes = request.submit()["query"]["recentchanges"]
+    return int(changes[0]["title"][1:])
+
+
+def select_pages(
+    query: str,
+    variable: str = "item",
+    width: int = DEFAULT_WIDTH,
+    start: int = 0,
+    stop: int = None,
+    checkpoint: Checkpoint = None,
+    min_width: int = 10_000,
+    repo=None,
+    run_query: Callable[[str], List[Row]] = None,
+) -> Iterator[Row]:
+    """Run a SELECT query one range of QIDs at a time, yielding rows as they come in
+
+        Arguments
+        ---------
+        query: str
+            The query, with QID_RANGE on a line of its own where the range
+            filter should go (after ?variable is bound)
+        variable: str
+            The name of the variable holding the item
+        width: int
+            The number of QIDs covered by a page. Each page scans every
+            item matching the patterns before the marker, so fewer, wider
+            pages are cheaper as long as they do not time out.
+        start: int
+            Only items after Q(start) are queried
+        stop: int
+            Only items up to Q(stop) are queried, the latest item if None
+        checkpoint: Checkpoint
+            Where to record the pages done, and to resume from
+        min_width: int
+            Pages that fail are split down to this many QIDs, before giving up
+        repo: DataSite
+            The repository to query
+        run_query: Callable[[str], List[Row]]
+            The function running a single query, an uncached select by default
+    """
+    if QID_RANGE not in query:
+        raise ValueError(f"The query has no {QID_RANGE} marker")
+    if run_query is None:
+        repo = Site().data_repository() if repo is None else repo
+        # The rows change as the items are fixed, so they are not cached
+        run_query = partial(select, repo=repo, ttl=0)
+    if stop is None:
+        stop = latest_qid(repo)
+    if checkpoint is not None and checkpoint.resumed:
+        start = max(start, checkpoint.result(PAGES_KEY) or 0)
+
+    while start < stop:
+        page_stop = min(start + width, stop)
+        rows, narrowed = _select_range(query, variable, start, page_stop, min_width, run_query)
+        yield from rows
+        if narrowed is not None:
+            # The next pages are likely as dense, so they start out as narrow as the ones that worked
+            width = narrowed
+        start = page_stop
+        if checkpoint is not None:
+            checkpoint.record(PAGES_KEY, start)
+
+
+def _select_range(query, variable, start, stop, min_width, run_query) -> Tuple[List[Row], Optional[int]]:
+    """The rows of this range, and the width of the narrowest range it was split into, None if it was not"""
+    page_query = query.replace(QID_RANGE, qid_range_filter(variable, start, stop))
+    try:
+        return run_query(page_query), None
+    except (Error, RequestException) as e:
+        if stop - start <= min_width:
+            raise
+        middle = (start + stop) // 2
+        print(f"Query for Q{start + 1}..Q{stop} failed ({e}), splitting it in two")
+        first, first_width = _select_range(query, variable, start, middle, min_width, run_query)
+        second, second_width = _select_range(query, variable, middle, stop, min_width, run_query)
+        return first + second, min(first_width or middle - start, second_width or stop - middle)
@@ -1,7 +1,6 @@
-from pywikibot import Site
-from pywikibot.data.sparql import SparqlQuery
-
 from properties import wikidata_properties as wp
+from sparql.client import select
+from sparql.pagination import QID_RANGE, select_pages
 
 
 def episodes(season_id):
@@ -18,7 +17,7 @@ def episodes(season_id):
     }}
     ORDER BY (?seasonOrdinal)
     """
-    results = SparqlQuery(repo=Site().data_repository()).select(query)
+    results = select(query)
     for result in results:
         ordinal = int(result["seasonOrdinal"])
         episode_id = result["episode"].split("/")[-1]
@@ -52,7 +51,7 @@ def episodes_with_titles_and_missing_labels():
     ORDER BY (?seriesLabel) (?title)
     """
     print(query)
-    results = SparqlQuery(repo=Site().data_repository()).select(query)
+    results = select(query)
     for result in results:
         episode_id = result["episode"].split("/")[-1]
         title = result["title"]
@@ -84,22 +83,27 @@ def movies_with_missing_labels_with_title():
     ORDER BY (?title)
     """
     print(query)
-    results = SparqlQuery(repo=Site().data_repository()).select(query)
+    results = select(query)
     for result in results:
         movie_label = result["movieLabel"]
         title = result["title"]
         yield movie_label, title
 
 
-def movies_with_missing_titles():
+def movies_with_missing_titles(checkpoint=None):
     """find English movies with missing titles, but with label
 
+        The query is run in pages of QID ranges, and the rows of each page
+        are yielded as soon as it comes in. Pass a checkpoint to be able to
+        resume from the last page.
+
         Returns an iterable of (movie QID, movie label)
     """
     query = f"""
     SELECT ?movie ?movieLabel WHERE {{
       ?movie wdt:{wp.INSTANCE_OF.pid} wd:{wp.FILM};
         wdt:{wp.ORIGNAL_LANGUAGE_OF_FILM_OR_TV_SHOW.pid} wd:{wp.ENGLISH}.
+    {QID_RANGE}
       OPTIONAL {{ ?movie wdt:{wp.TITLE.pid} ?title. }}
       OPTIONAL {{ ?movie wdt:{wp.IMDB_ID.pid}  ?imdbId. }}
 
@@ -116,21 +120,20 @@ def movies_with_missing_titles():
         ?movie rdfs:label ?movieLabel.
       }}
     }}
-    ORDER BY (?movieLabel)
     """
-    print(query)
-    results = SparqlQuery(repo=Site().data_repository()).select(query)
-    for result in results:
+    for result in select_pages(query, variable="movie", checkpoint=checkpoint):
         movie_id = result["movie"].split("/")[-1]
         movie_label = result["movieLabel"]
         yield movie_id, movie_label
 
 
-def books_with_missing_labels_with_title():
+def books_with_missing_labels_with_title(checkpoint=None):
     """Find English books with missing labels, but with a title
 
       Missing labels are identified by checking if the label is equal to
-      the QID
+      the QID. The query is run in pages of QID ranges, and the rows of
+      each page are yielded as soon as it comes in. Pass a checkpoint to be
+      able to resume from the last page.
 
       Returns an iterable of (book QID, title)
   """
@@ -138,7 +141,8 @@ def books_with_missing_labels_with_title():
   SELECT ?book ?bookLabel ?title WHERE {{
     ?book wdt:{wp.INSTANCE_OF.pid} wd:{wp.BOOK};
       wdt:{wp.LANGUAGE_OF_WORK_OR_NAME.pid} wd:{wp.ENGLISH};
-      wdt:{wp.TITLE.pid} ?title;
+      wdt:{wp.TITLE.pid} ?title.
+    {QID_RANGE}
     FILTER(REGEX(?bookLabel, SUBSTR(STR(?book), 32 )))
     FILTER((LANG(?title)) = "en")
     SERVICE wikibase:label {{
@@ -146,21 +150,20 @@ def books_with_missing_labels_with_title():
       ?book rdfs:label ?bookLabel.
     }}
   }}
-  ORDER BY (?title)
   """
-    print(query)
-    results = SparqlQuery(repo=Site().data_repository()).select(query)
-    for result in results:
+    for result in select_pages(query, variable="book", checkpoint=checkpoint):
         book_label = result["bookLabel"]
         title = result["title"]
         yield book_label, title
 
 
-def items_with_missing_labels_with_title():
+def items_with_missing_labels_with_title(checkpoint=None):
     """Find items with missing labels, but with a title
 
       Missing labels are identified by checking if the label is equal to
-      the QID
+      the QID. The query is run in pages of QID ranges, and the rows of
+      each page are yielded as soon as it comes in. Pass a checkpoint to be
+      able to resume from the last page.
 
       Returns an iterable of (item, item QID, title)
   """
@@ -180,6 +183,7 @@ def items_with_missing_labels_with_title():
     }}
     # Skip "http://www.wikidata.org/entity/" (31 characters)
     BIND(SUBSTR(STR(?item), 32 ) AS ?itemId)
+    {QID_RANGE}
 
     # Only look for titles that are in English, since we add the English label
     FILTER((LANG(?title)) = "en")
@@ -193,9 +197,7 @@ def items_with_missing_labels_with_title():
     }}
   }}
   """
-    print(query)
-    results = SparqlQuery(repo=Site().data_repository()).select(query)
-    for result in results:
+    for result in select_pages(query, checkpoint=checkpoint):
         item_link = result["item"]
         item_id = result["itemId"]
         title = result["title"]
@@ -1,5 +1,72 @@
-def generate_sparql_query(key_val_pairs):
+"""Building simple SELECT queries over ?item out of property/value pairs"""
+from typing import Collection, Dict, List, Union
+from urllib.parse import quote
+
+# The variable bound to the value matched, when a property is given several values
+KEY = "key"
+
+# Keep the URL of a GET request to WDQS well under the usual 8KB limit
+MAX_URL_LENGTH = 7000
+MAX_VALUES = 200
+
+Values = Union[str, Collection[str]]
+
+
+def _is_set(val: Values) -> bool:
+    return not isinstance(val, str)
+
+
+def generate_sparql_query(key_val_pairs: Dict[str, Values]) -> str:
+    """A query for the items that have all these property values
+
+        A value may also be a collection of QIDs, in which case the items
+        having any of them match, and the one they have is bound to ?key.
+        At most one property can be given several values.
+    """
+    set_keys = [key for key, val in key_val_pairs.items() if _is_set(val)]
+    if len(set_keys) > 1:
+        raise ValueError(f"Only one property can have several values, got {set_keys}")
+
+    select = "SELECT ?item ?" + KEY if set_keys else "SELECT ?item"
     where_clause = ""
     for key, val in key_val_pairs.items():
-        where_clause = where_clause + f"\t?item wdt:{key} wd:{val}.\n"
-    return "SELECT ?item WHERE {\n" + where_clause + "}"
+        if _is_set(val):
+            values = " ".join(f"wd:{v}" for v in val)
+            where_clause = where_clause + f"\tVALUES ?{KEY} {{ {values} }}\n"
+            where_clause = where_clause + f"\t?item wdt:{key} ?{KEY}.\n"
+        else:
+            where_clause = where_clause + f"\t?item wdt:{key} wd:{val}.\n"
+    return select + " WHERE {\n" + where_clause + "}"
+
+
+def generate_sparql_queries(
+    key_val_pairs: Dict[str, Values], max_values: int = MAX_VALUES, max_url_length: int = MAX_URL_LENGTH
+) -> List[str]:
+    """The queries for generate_sparql_query, with the values of a property split across as many as needed
+
+        Each query has at most max_values values, and its URL-encoded text
+        is at most max_url_length characters long (unless a single value
+        does not fit).
+    """
+    set_keys = [key for key, val in key_val_pairs.items() if _is_set(val)]
+    if not set_keys:
+        return [generate_sparql_query(key_val_pairs)]
+    if len(set_keys) > 1:
+        raise ValueError(f"Only one property can have several values, got {set_keys}")
+
+    set_key = set_keys[0]
+    # Sorted and deduplicated, so that the same values give the same (cacheable) queries
+    values = sorted(set(key_val_pairs[set_key]))
+    # Every value adds " wd:Q..." to the VALUES block
+    base_length = len(quote(generate_sparql_query({**key_val_pairs, set_key: []})))
+    queries, chunk, length = [], [], base_length
+    for value in values:
+        value_length = len(quote(f" wd:{value}"))
+        if chunk and (len(chunk) >= max_values or length + value_length > max_url_length):
+            queries.append(generate_sparql_query({**key_val_pairs, set_key: chunk}))
+            chunk, length = [], base_length
+        chunk.append(value)
+        length += value_length
+    if chunk:
+        queries.append(generate_sparql_query({**key_val_pairs, set_key: chunk}))
+    return queries
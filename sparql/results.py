@@ -0,0 +1,211 @@
+"""Persistent cache for the results of SPARQL queries
+
+    Some queries are sent to WDQS over and over (eg: the predecessor of an
+    episode, looked up to check it and again to fix it). Their rows can be
+    cached on disk, keyed by the normalized text of the query, so a query
+    differing only in whitespace or comments is the same query.
+
+    Caching is opt-in: a call site passes the TTL its query can be cached
+    for to sparql.client.select, and queries whose results must reflect
+    edits made by others (the graph of a series, the items a bot works
+    through) are not cached.
+    Since WDQS lags behind our own edits anyway, the cache also records the
+    QIDs each query mentions or returned, and forget_entities drops every
+    result involving an item we just edited or created.
+"""
+import hashlib
+import json
+import os
+import re
+import time
+from typing import Dict, Iterable, List, Optional, Set
+
+from cache.sqlite import SqliteStore, default_cache_dir
+
+DEFAULT_TTL = 60 * 60
+
+Row = Dict[str, Optional[str]]
+
+_QID = re.compile(r"\bQ\d+\b")
+
+
+def normalize_query(query: str) -> str:
+    """The query without comment lines, and with runs of whitespace collapsed
+
+        Whitespace inside string literals is collapsed as well, which is
+        fine for the queries of this repository.
+    """
+    lines = [line for line in query.splitlines() if not line.strip().startswith("#")]
+    return " ".join(" ".join(lines).split())
+
+
+def query_key(query: str) -> str:
+    return hashlib.sha1(normalize_query(query).encode("utf-8")).hexdigest()
+
+
+def entities_of(query: str, rows: Iterable[Row]) -> Set[str]:
+    """The QIDs mentioned in a query, or in its results"""
+    qids = set(_QID.findall(normalize_query(query)))
+    for row in rows:
+        for value in row.values():
+            if value is not None:
+                qids.update(_QID.findall(str(value)))
+    return qids
+
+
+def referenced_qids(data) -> Set[str]:
+    """The QIDs of the items referenced by some entity JSON (eg: claim targets)"""
+    qids = set()
+    if isinstance(data, dict):
+        entity_id = data.get("id")
+        if isinstance(entity_id, str) and _QID.fullmatch(entity_id):
+            qids.add(entity_id)
+        if data.get("entity-type") == "item" and "numeric-id" in data:
+            qids.add(f"Q{data['numeric-id']}")
+        for value in data.values():
+            qids |= referenced_qids(value)
+    elif isinstance(data, list):
+        for value in data:
+            qids |= referenced_qids(value)
+    return qids
+
+
+class ResultCache(SqliteStore):
+    """An on-disk store of SPARQL query results
+
+        Arguments
+        ---------
+        path: str
+            The SQLite file to use. It is created if it does not exist.
+        ttl: float
+            The number of seconds results are trusted, unless a query asks
+            for its own TTL
+    """
+
+    SCHEMA = (
+        """CREATE TABLE IF NOT EXISTS results (
+            site TEXT NOT NULL,
+            key TEXT NOT NULL,
+            rows TEXT NOT NULL,
+            expires_at REAL NOT NULL,
+            PRIMARY KEY (site, key)
+        )""",
+        """CREATE TABLE IF NOT EXISTS result_entities (
+            site TEXT NOT NULL,
+            key TEXT NOT NULL,
+            qid TEXT NOT NULL,
+            PRIMARY KEY (site, key, qid)
+        )""",
+        "CREATE INDEX IF NOT EXISTS result_entities_qid ON result_entities (qid)",
+    )
+
+    def __init__(self, path: str, ttl: float = DEFAULT_TTL):
+        super().__init__(path)
+        self.ttl = ttl
+
+    def get(self, site: str, query: str) -> Optional[List[Row]]:
+        """The cached rows of this query, or None if they are missing or expired"""
+        row = self.connection().execute(
+            "SELECT rows, expires_at FROM results WHERE site = ? AND key = ?", (site, query_key(query))
+        ).fetchone()
+        if row is None or row[1] <= time.time():
+            return None
+        return json.loads(row[0])
+
+    def put(self, site: str, query: str, rows: List[Row], ttl: float = None) -> None:
+        """Store the rows of a query, which expire after ttl (the cache's TTL if None)"""
+        key = query_key(query)
+        ttl = self.ttl if ttl is None else ttl
+        conn = self.connection()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                (site, key, json.dumps(rows), time.time() + ttl),
+            )
+            conn.execute("DELETE FROM result_entities WHERE site = ? AND key = ?", (site, key))
+            conn.executemany(
+                "INSERT INTO result_entities VALUES (?, ?, ?)",
+                [(site, key, qid) for qid in entities_of(query, rows)],
+            )
+
+    def invalidate(self, query: str) -> None:
+        """Drop the results of this query, on every site"""
+        key = query_key(query)
+        conn = self.connection()
+        with conn:
+            conn.execute("DELETE FROM results WHERE key = ?", (key,))
+            conn.execute("DELETE FROM result_entities WHERE key = ?", (key,))
+
+    def invalidate_entities(self, qids: Iterable[str]) -> int:
+        """Drop the results of every query that mentions or returned one of these QIDs
+
+            Returns the number of results dropped.
+        """
+        qids = list(set(qids))
+        dropped = 0
+        conn = self.connection()
+        with conn:
+            for qid in qids:
+                keys = conn.execute("SELECT site, key FROM result_entities WHERE qid = ?", (qid,)).fetchall()
+                for site, key in keys:
+                    dropped += conn.execute(
+                        "DELETE FROM results WHERE site = ? AND key = ?", (site, key)
+                    ).rowcount
+                    conn.execute("DELETE FROM result_entities WHERE site = ? AND key = ?", (site, key))
+        return dropped
+
+    def clear(self) -> None:
+        """Drop every cached result"""
+        conn = self.connection()
+        with conn:
+            conn.execute("DELETE FROM results")
+            conn.execute("DELETE FROM result_entities")
+
+
+_default_cache = None
+_default_cache_config = {
+    "path": os.path.join(default_cache_dir(), "sparql.sqlite3"),
+    "ttl": DEFAULT_TTL,
+    "enabled": True,
+}
+
+
+def configure(**kwargs) -> None:
+    """Configure the default result cache
+
+        Accepts the keyword arguments path and ttl (see ResultCache), and
+        enabled. Passing enabled=False turns off caching, and every query
+        is sent to WDQS.
+    """
+    global _default_cache
+    unknown = set(kwargs) - set(_default_cache_config)
+    if unknown:
+        raise ValueError(f"Unknown SPARQL cache options: {sorted(unknown)}")
+    _default_cache_config.update(kwargs)
+    _default_cache = None
+
+
+def default_cache() -> Optional[ResultCache]:
+    """The process-wide result cache, or None if caching is disabled"""
+    global _default_cache
+    if not _default_cache_config["enabled"]:
+        return None
+    if _default_cache is None:
+        config = dict(_default_cache_config)
+        del config["enabled"]
+        _default_cache = ResultCache(**config)
+    return _default_cache
+
+
+def forget_query(query: str) -> None:
+    """Drop the cached results of this query, eg: to see changes made by others"""
+    cache = default_cache()
+    if cache is not None:
+        cache.invalidate(query)
+
+
+def forget_entities(qids: Iterable[str]) -> None:
+    """Drop the cached results involving these items, eg: after editing them"""
+    cache = default_cache()
+    if cache is not None:
+        cache.invalidate_entities(qids)
@@ -0,0 +1,80 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from . import client
+from .client import select, select_grouped
+
+# The module client caches results with, whichever name this test module was imported under
+results = sys.modules[client.default_cache.__module__]
+
+
+class Repo:
+    sitename = "wikidata:wikidata"
+
+
+class SelectTests(unittest.TestCase):
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        saved = dict(results._default_cache_config)
+        results.configure(path=os.path.join(tmpdir.name, "sparql.sqlite3"))
+        self.addCleanup(results.configure, **saved)
+        self.sent = []
+
+        class SparqlQuery:
+            def __init__(query_self, repo):
+                pass
+
+            def select(query_self, query):
+                self.sent.append(query)
+                return [{"item": f"http://www.wikidata.org/entity/Q{len(self.sent)}"}]
+
+        patcher = patch.object(client, "SparqlQuery", SparqlQuery)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_queries_are_sent_every_time_by_default(self):
+        query = "SELECT ?item WHERE { ?item wdt:P179 wd:Q1 }"
+        self.assertEqual(select(query, Repo()), [{"item": "http://www.wikidata.org/entity/Q1"}])
+        self.assertEqual(select(query, Repo()), [{"item": "http://www.wikidata.org/entity/Q2"}])
+        self.assertEqual(len(self.sent), 2)
+
+    def test_callers_opt_in_to_the_cache(self):
+        query = "SELECT ?item WHERE { ?item wdt:P155 wd:Q1 }"
+        first = select(query, Repo(), ttl=60)
+        self.assertEqual(select(query, Repo(), ttl=60), first)
+        self.assertEqual(len(self.sent), 1)
+
+
+class SelectGroupedTests(unittest.TestCase):
+    def test_groups_by_key(self):
+        queries = []
+
+        def select(query, repo, ttl):
+            queries.append(query)
+            return [
+                {"item": "http://www.wikidata.org/entity/Q11", "key": "http://www.wikidata.org/entity/Q1"},
+                {"item": "http://www.wikidata.org/entity/Q12", "key": "http://www.wikidata.org/entity/Q1"},
+                {"item": "http://www.wikidata.org/entity/Q13", "key": "http://www.wikidata.org/entity/Q2"},
+                {"item": None, "key": "http://www.wikidata.org/entity/Q3"},
+            ]
+
+        with patch.object(client, "select", side_effect=select):
+            groups = select_grouped({"P155": ["Q1", "Q2", "Q3", "Q4"]}, repo=object())
+        self.assertEqual(groups, {"Q1": ["Q11", "Q12"], "Q2": ["Q13"], "Q3": [], "Q4": []})
+        self.assertEqual(len(queries), 1)
+        self.assertIn("VALUES ?key { wd:Q1 wd:Q2 wd:Q3 wd:Q4 }", queries[0])
+
+    def test_splits_long_lookups(self):
+        qids = [f"Q{n}" for n in range(1, 451)]
+        with patch.object(client, "select", return_value=[]) as select:
+            groups = select_grouped({"P155": qids}, repo=object())
+        self.assertEqual(select.call_count, 3)
+        self.assertEqual(groups, {qid: [] for qid in qids})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import os
+import re
+import tempfile
+import unittest
+
+from pywikibot.exceptions import Error
+
+from cache import Checkpoint, CheckpointStore
+from .pagination import QID_RANGE, select_pages
+
+QUERY = f"""SELECT ?item WHERE {{
+  ?item wdt:P31 wd:Q5.
+  {QID_RANGE}
+}}"""
+
+
+class FakeQueryService:
+    """Answers range queries over items Q1..Q100, failing for ranges wider than max_width"""
+
+    def __init__(self, max_width=None):
+        self.max_width = max_width
+        self.ranges = []
+
+    def __call__(self, query):
+        start, stop = map(int, re.search(r"> (\d+) && \?itemNumber <= (\d+)", query).groups())
+        self.ranges.append((start, stop))
+        if self.max_width is not None and stop - start > self.max_width:
+            raise Error("Query timeout")
+        return [{"item": f"http://www.wikidata.org/entity/Q{n}"} for n in range(start + 1, min(stop, 100) + 1)]
+
+
+def qids(rows):
+    return [row["item"].split("/")[-1] for row in rows]
+
+
+class SelectPagesTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.store = CheckpointStore(os.path.join(self.tmpdir.name, "checkpoints.sqlite3"))
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_pages_cover_every_item_once(self):
+        service = FakeQueryService()
+        rows = select_pages(QUERY, width=30, stop=100, run_query=service)
+        self.assertEqual(qids(rows), [f"Q{n}" for n in range(1, 101)])
+        self.assertEqual(service.ranges, [(0, 30), (30, 60), (60, 90), (90, 100)])
+
+    def test_failed_pages_are_split(self):
+        service = FakeQueryService(max_width=10)
+        rows = select_pages(QUERY, width=40, stop=40, min_width=5, run_query=service)
+        self.assertEqual(qids(rows), [f"Q{n}" for n in range(1, 41)])
+
+        # The pages after a failed one are as narrow as those that worked
+        service = FakeQueryService(max_width=10)
+        rows = select_pages(QUERY, width=40, stop=70, min_width=5, run_query=service)
+        self.assertEqual(qids(rows), [f"Q{n}" for n in range(1, 71)])
+        self.assertEqual(service.ranges[-3:], [(40, 50), (50, 60), (60, 70)])
+
+        service = FakeQueryService(max_width=1)
+        with self.assertRaises(Error):
+            list(select_pages(QUERY, width=40, stop=40, min_width=5, run_query=service))
+
+    def test_resumes_after_last_consumed_page(self):
+        rows = select_pages(QUERY, width=30, stop=100, checkpoint=Checkpoint("run", store=self.store),
+                            run_query=FakeQueryService())
+        # Stop halfway through the second page
+        self.assertEqual(len([row for _, row in zip(range(45), rows)]), 45)
+
+        service = FakeQueryService()
+        checkpoint = Checkpoint("run", resume=True, store=self.store)
+        rows = select_pages(QUERY, width=30, stop=100, checkpoint=checkpoint, run_query=service)
+        self.assertEqual(qids(rows)[0], "Q31")
+        self.assertEqual(service.ranges[0], (30, 60))
+
+
+if __name__ == "__main__":
+    unittest.main()
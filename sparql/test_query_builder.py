@@ -0,0 +1,37 @@
+import unittest
+from urllib.parse import quote
+
+from .query_builder import KEY, generate_sparql_queries, generate_sparql_query
+
+
+class QueryBuilderTests(unittest.TestCase):
+    def test_single_values(self):
+        query = generate_sparql_query({"P179": "Q1", "P31": "Q21191270"})
+        self.assertEqual(query, "SELECT ?item WHERE {\n\t?item wdt:P179 wd:Q1.\n\t?item wdt:P31 wd:Q21191270.\n}")
+
+    def test_several_values(self):
+        query = generate_sparql_query({"P155": ["Q1", "Q2"], "P31": "Q21191270"})
+        self.assertTrue(query.startswith(f"SELECT ?item ?{KEY} WHERE"))
+        self.assertIn(f"VALUES ?{KEY} {{ wd:Q1 wd:Q2 }}", query)
+        self.assertIn(f"?item wdt:P155 ?{KEY}.", query)
+
+        with self.assertRaises(ValueError):
+            generate_sparql_query({"P155": ["Q1"], "P156": ["Q2"]})
+
+    def test_values_are_chunked(self):
+        qids = [f"Q{n}" for n in range(1000, 1300)]
+        queries = generate_sparql_queries({"P155": qids + qids[:10]}, max_values=100)
+        self.assertEqual(len(queries), 3)
+        self.assertEqual(sum(query.count(" wd:Q") for query in queries), 300)
+
+        queries = generate_sparql_queries({"P155": qids}, max_url_length=1000)
+        self.assertGreater(len(queries), 3)
+        self.assertTrue(all(len(quote(query)) <= 1000 for query in queries))
+        self.assertEqual(sum(query.count(" wd:Q") for query in queries), 300)
+
+    def test_no_chunking_without_several_values(self):
+        self.assertEqual(generate_sparql_queries({"P179": "Q1"}), [generate_sparql_query({"P179": "Q1"})])
+
+
+if __name__ == "__main__":
+    unittest.main()
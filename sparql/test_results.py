@@ -0,0 +1,52 @@
+import os
+import tempfile
+import time
+import unittest
+
+from .results import ResultCache, normalize_query, referenced_qids
+
+QUERY = """SELECT ?item WHERE {
+    # Episodes following Q100
+    ?item wdt:P155 wd:Q100.
+}"""
+
+
+class ResultCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache = ResultCache(os.path.join(self.tmpdir.name, "sparql.sqlite3"))
+        self.rows = [{"item": "http://www.wikidata.org/entity/Q101"}]
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_queries_are_normalized(self):
+        self.cache.put("wikidata:wikidata", QUERY, self.rows)
+        same = "SELECT ?item WHERE { ?item wdt:P155   wd:Q100. }"
+        self.assertEqual(normalize_query(same), normalize_query(QUERY))
+        self.assertEqual(self.cache.get("wikidata:wikidata", same), self.rows)
+        self.assertIsNone(self.cache.get("wikidata:test", same))
+
+    def test_results_expire(self):
+        self.cache.put("wikidata:wikidata", QUERY, self.rows, ttl=0.01)
+        time.sleep(0.02)
+        self.assertIsNone(self.cache.get("wikidata:wikidata", QUERY))
+
+    def test_edits_invalidate_results(self):
+        self.cache.put("wikidata:wikidata", QUERY, self.rows)
+        self.assertEqual(self.cache.invalidate_entities(["Q5"]), 0)
+
+        # Q101 is one of the results
+        self.assertEqual(self.cache.invalidate_entities(["Q101"]), 1)
+        self.assertIsNone(self.cache.get("wikidata:wikidata", QUERY))
+
+        # Q100 is mentioned by the query
+        self.cache.put("wikidata:wikidata", QUERY, self.rows)
+        data = {"claims": [{"mainsnak": {"datavalue": {"value": {"entity-type": "item", "numeric-id": 100}}}}]}
+        self.assertEqual(referenced_qids(data), {"Q100"})
+        self.cache.invalidate_entities(referenced_qids(data))
+        self.assertIsNone(self.cache.get("wikidata:wikidata", QUERY))
+
+
+if __name__ == "__main__":
+    unittest.main()
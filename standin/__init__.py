@@ -0,0 +1,4 @@
+"""A local stand-in for the Wikidata API and query service, to run the bots against without touching Wikidata"""
+from .configuration import write_config
+from .server import StandinServer, serve
+from .store import EntityError, EntityStore
@@ -0,0 +1,72 @@
+"""Serve fixture entities the way Wikidata would, and point pywikibot at them
+
+    python3 -m standin serve --load fixtures/entities --port 8181
+    python3 -m standin config /tmp/standin --url http://localhost:8181
+    PYWIKIBOT_DIR=/tmp/standin python3 -m cli.check_tv_show Q3577037
+"""
+import signal
+import sys
+
+import click
+
+from .configuration import write_config
+from .server import serve as make_server
+
+
+def _account(ctx, param, values):
+    accounts = {}
+    for value in values:
+        username, sep, password = value.partition(":")
+        if not sep:
+            raise click.BadParameter(f"Expected USERNAME:PASSWORD, got {value}")
+        accounts[username] = password
+    return accounts or None
+
+
+@click.group()
+def main():
+    pass
+
+
+@main.command()
+@click.option("--host", default="127.0.0.1")
+@click.option("--port", type=click.IntRange(min=0), default=8181)
+@click.option("--load", "paths", type=click.Path(exists=True), multiple=True, help="A fixture file, or a directory of them")
+@click.option("--latency-ms", type=click.FloatRange(min=0), default=0.0, help="Delay every response by this much")
+@click.option("--lag", type=click.FloatRange(min=0), default=0.0, help="Simulated replication lag, in seconds")
+@click.option("--lag-every", type=click.IntRange(min=0), default=0, help="Only lag every n-th request that sets maxlag")
+@click.option("--account", "accounts", multiple=True, callback=_account, help="USERNAME:PASSWORD, only accept these logins")
+@click.option("--save", type=click.Path(dir_okay=False), default=None, help="Write the entities to this file on exit")
+@click.option("--verbose", is_flag=True, default=False)
+def serve(host, port, paths, latency_ms, lag, lag_every, accounts, save, verbose):
+    """Serve the action API and SPARQL endpoint over the fixture entities"""
+    server, loaded = make_server(
+        list(paths), host, port, latency=latency_ms / 1000, verbose=verbose, accounts=accounts, lag=lag, lag_every=lag_every
+    )
+    print(f"Serving {loaded} entities at {server.api_url} and {server.url}/sparql")
+    # Stopped with kill as often as with Ctrl-C, and both should still save
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if save:
+            server.store.dump(save)
+            print(f"Saved the entities to {save}")
+
+
+@main.command()
+@click.argument("directory", type=click.Path(file_okay=False))
+@click.option("--url", default="http://127.0.0.1:8181", help="Where the stand-in is served")
+@click.option("--username", default="StandinBot")
+@click.option("--password", default="standin")
+def config(directory, url, username, password):
+    """Write a pywikibot configuration for the stand-in into DIRECTORY"""
+    path = write_config(directory, url, username, password)
+    print(f"Wrote {path}, run with PYWIKIBOT_DIR={directory}")
+
+
+if __name__ == "__main__":
+    main()
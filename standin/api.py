@@ -0,0 +1,602 @@
+"""The subset of the MediaWiki action API (and of Wikibase's modules) that the stand-in serves
+
+    Reads:
+    - action=query with meta=siteinfo, userinfo, tokens and wikibase,
+      prop=info and list=recentchanges
+    - action=wbgetentities
+    - action=paraminfo, describing the modules above (pywikibot checks
+      its requests against it)
+
+    Writes (posted, with a CSRF token):
+    - action=wbeditentity, wbcreateclaim, wbsetclaim, wbsetlabel,
+      wbsetdescription, wbsetqualifier, wbsetreference and wbremoveclaims
+
+    A write with a baserevid fails with an editconflict if the entity was
+    edited since that revision. This is stricter than Wikibase, which only
+    reports the conflicts it cannot merge.
+
+    Logging in works with both action=login (bot passwords) and
+    action=clientlogin, and is tracked with a session cookie. Any password
+    is accepted, unless the API is given the accounts to check against.
+
+    Replication lag can be simulated: while ActionApi.lag is set, requests
+    with a lower maxlag get a maxlag error (every lag_every-th such
+    request only, if set), with the Retry-After header MediaWiki sends.
+"""
+import json
+import math
+import secrets
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+from .graph import ENTITY
+from .store import EntityError, EntityStore
+
+ANONYMOUS_TOKEN = "+\\"
+WRITE_ACTIONS = {
+    "wbeditentity",
+    "wbcreateclaim",
+    "wbsetclaim",
+    "wbsetlabel",
+    "wbsetdescription",
+    "wbsetqualifier",
+    "wbsetreference",
+    "wbremoveclaims",
+}
+READ_ACTIONS = {"query", "paraminfo", "login", "clientlogin", "logout", "wbgetentities"}
+USER_RIGHTS = ["read", "edit", "createpage", "writeapi", "item-term", "property-term", "item-merge", "bot", "apihighlimits"]
+ANONYMOUS_RIGHTS = ["read", "edit", "createpage", "writeapi", "item-term"]
+
+NAMESPACES = {
+    -2: "Media",
+    -1: "Special",
+    0: "",
+    1: "Talk",
+    2: "User",
+    3: "User talk",
+    4: "Wikidata",
+    5: "Wikidata talk",
+    6: "File",
+    7: "File talk",
+    8: "MediaWiki",
+    9: "MediaWiki talk",
+    10: "Template",
+    11: "Template talk",
+    12: "Help",
+    13: "Help talk",
+    14: "Category",
+    15: "Category talk",
+    120: "Property",
+    121: "Property talk",
+    146: "Lexeme",
+    147: "Lexeme talk",
+}
+CONTENT_NAMESPACES = {0, 120, 146}
+CONTENT_MODELS = {0: "wikibase-item", 120: "wikibase-property", 146: "wikibase-lexeme"}
+
+
+class ApiError(Exception):
+    """An error response of the API"""
+
+    def __init__(self, code: str, info: str, **extra):
+        super().__init__(info)
+        self.code = code
+        self.info = info
+        self.extra = extra
+
+
+class Session:
+    """A client of the API, identified by its session cookie"""
+
+    def __init__(self, key: str):
+        self.key = key
+        self.user: Optional[str] = None
+        self.csrf_token = secrets.token_hex(20) + ANONYMOUS_TOKEN
+        self.login_token = secrets.token_hex(20) + ANONYMOUS_TOKEN
+
+    @property
+    def token(self) -> str:
+        return self.csrf_token if self.user else ANONYMOUS_TOKEN
+
+
+def _json_param(params: Dict[str, str], name: str):
+    try:
+        return json.loads(params[name])
+    except KeyError:
+        raise ApiError("missingparam", f"The \"{name}\" parameter must be set.")
+    except ValueError:
+        raise ApiError("invalid-json", f"Could not parse the \"{name}\" parameter as JSON.")
+
+
+def _required(params: Dict[str, str], name: str) -> str:
+    if not params.get(name):
+        raise ApiError("missingparam", f"The \"{name}\" parameter must be set.")
+    return params[name]
+
+
+def _flag(params: Dict[str, str], name: str) -> bool:
+    # MediaWiki flags are set by their presence, whatever their value
+    return name in params
+
+
+class ActionApi:
+    """Answers action API requests from the entities of a store
+
+        Arguments
+        ---------
+        store: EntityStore
+            The entities to serve and edit
+        url: str
+            The base URL the API is served at (eg: http://localhost:8181)
+        accounts: dict
+            If given, the only usernames (and their passwords) that can log in
+        lag: float
+            The replication lag, in seconds, to report to requests with a lower maxlag
+        lag_every: int
+            If given, only report the lag to every lag_every-th such request
+    """
+
+    def __init__(self, store: EntityStore, url: str, accounts: Dict[str, str] = None, lag: float = 0.0, lag_every: int = 0):
+        self.store = store
+        self.url = url.rstrip("/")
+        self.accounts = accounts
+        self.lag = lag
+        self.lag_every = lag_every
+        self._lock = threading.Lock()
+        self._sessions: Dict[str, Session] = {}
+        self._lagged_requests = 0
+        self._user_ids: Dict[str, int] = {}
+
+    def session(self, key: Optional[str]) -> Session:
+        """The session with this key, or a new one"""
+        with self._lock:
+            session = self._sessions.get(key) if key else None
+            if session is None:
+                session = Session(secrets.token_hex(16))
+                self._sessions[session.key] = session
+            return session
+
+    def handle(self, params: Dict[str, str], session: Session, posted: bool) -> Tuple[dict, Dict[str, str]]:
+        """The response body, and the extra headers, of a request"""
+        headers = {}
+        try:
+            self._check_lag(params, headers)
+            action = params.get("action", "help")
+            if action not in READ_ACTIONS and action not in WRITE_ACTIONS:
+                raise ApiError("badvalue", f"Unrecognized value for parameter \"action\": {action}.")
+            if action in WRITE_ACTIONS:
+                self._check_write(params, session, posted)
+                self._check_base_revision(params)
+            body = getattr(self, f"_{action}")(params, session)
+        except ApiError as e:
+            body = {"error": {"code": e.code, "info": e.info, **e.extra}}
+        except EntityError as e:
+            body = {"error": {"code": e.code, "info": e.info}}
+        body["servedby"] = "standin"
+        return body, headers
+
+    def _check_lag(self, params: Dict[str, str], headers: Dict[str, str]) -> None:
+        if not self.lag or "maxlag" not in params:
+            return
+        try:
+            maxlag = float(params["maxlag"])
+        except ValueError:
+            raise ApiError("badinteger", "Invalid value for parameter \"maxlag\".")
+        if self.lag <= maxlag:
+            return
+        with self._lock:
+            self._lagged_requests += 1
+            lagged = not self.lag_every or self._lagged_requests % self.lag_every == 0
+        if lagged:
+            headers["Retry-After"] = str(math.ceil(self.lag))
+            headers["X-Database-Lag"] = str(math.ceil(self.lag))
+            raise ApiError("maxlag", f"Waiting for standin: {self.lag} seconds lagged.", host="standin", lag=self.lag, type="db")
+
+    def _check_write(self, params: Dict[str, str], session: Session, posted: bool) -> None:
+        if not posted:
+            raise ApiError("mustbeposted", f"The \"{params['action']}\" module requires a POST request.")
+        expected = params.get("assert")
+        if expected in ("user", "bot") and not session.user:
+            raise ApiError(f"assert{expected}failed", "You are no longer logged in, so the action could not be completed.")
+        if "token" not in params:
+            raise ApiError("missingparam", "The \"token\" parameter must be set.")
+        if params["token"] != session.token:
+            raise ApiError("badtoken", "Invalid CSRF token.")
+
+    def _check_base_revision(self, params: Dict[str, str]) -> None:
+        if not params.get("baserevid"):
+            return
+        entity_id = params.get("id") or params.get("entity")
+        if entity_id is None and params.get("claim"):
+            entity_id = (_json_param(params, "claim").get("id") or "").split("$", 1)[0]
+        if not entity_id:
+            return
+        current = self.store.revision_of(entity_id.upper())
+        if current is not None and current != int(params["baserevid"]):
+            raise ApiError("editconflict", f"Edit conflict: {entity_id} was edited since revision {params['baserevid']}.")
+
+    def _user(self, session: Session) -> str:
+        return session.user or "127.0.0.1"
+
+    def _user_id(self, name: str) -> int:
+        with self._lock:
+            return self._user_ids.setdefault(name, len(self._user_ids) + 1)
+
+    # Logging in
+
+    def _authenticate(self, username: str, password: str) -> Optional[str]:
+        """The name the user is logged in as, or None if the credentials are wrong"""
+        name = username.split("@", 1)[0]
+        if not name or not password:
+            return None
+        if self.accounts is not None and self.accounts.get(username, self.accounts.get(name)) != password:
+            return None
+        return name[:1].upper() + name[1:]
+
+    def _login(self, params: Dict[str, str], session: Session) -> dict:
+        if params.get("lgtoken") != session.login_token:
+            return {"login": {"result": "NeedToken", "token": session.login_token}}
+        name = self._authenticate(params.get("lgname", ""), params.get("lgpassword", ""))
+        if name is None:
+            return {"login": {"result": "Failed", "reason": "Incorrect username or password entered."}}
+        session.user = name
+        return {"login": {"result": "Success", "lguserid": self._user_id(name), "lgusername": name}}
+
+    def _clientlogin(self, params: Dict[str, str], session: Session) -> dict:
+        if params.get("logintoken") != session.login_token:
+            raise ApiError("badtoken", "Invalid login token.")
+        name = self._authenticate(params.get("username", ""), params.get("password", ""))
+        if name is None:
+            return {"clientlogin": {"status": "FAIL", "message": "Incorrect username or password entered.", "messagecode": "wrongpassword"}}
+        session.user = name
+        return {"clientlogin": {"status": "PASS", "username": name}}
+
+    def _logout(self, params: Dict[str, str], session: Session) -> dict:
+        session.user = None
+        return {}
+
+    # Queries
+
+    def _paraminfo(self, params: Dict[str, str], session: Session) -> dict:
+        modules = []
+        for path in filter(None, params.get("modules", "").split("|")):
+            module = _module_info(path)
+            modules.append(module if module is not None else {"name": path, "missing": True})
+        return {"paraminfo": {"modules": modules}}
+
+    def _query(self, params: Dict[str, str], session: Session) -> dict:
+        query = {}
+        for meta in filter(None, params.get("meta", "").split("|")):
+            handler = getattr(self, f"_meta_{meta}", None)
+            if handler is None:
+                raise ApiError("badvalue", f"Unrecognized value for parameter \"meta\": {meta}.")
+            query.update(handler(params, session))
+        props = set(filter(None, params.get("prop", "").split("|")))
+        if props - {"info"}:
+            raise ApiError("badvalue", f"Unrecognized value for parameter \"prop\": {'|'.join(sorted(props - {'info'}))}.")
+        if props or "titles" in params or "pageids" in params:
+            query.update(self._pages(params))
+        lists = set(filter(None, params.get("list", "").split("|")))
+        if lists - {"recentchanges"}:
+            raise ApiError("badvalue", f"Unrecognized value for parameter \"list\": {'|'.join(sorted(lists))}.")
+        if lists:
+            query.update(self._recentchanges(params))
+        response = {"batchcomplete": True}
+        if query:
+            response["query"] = query
+        return response
+
+    def _meta_siteinfo(self, params: Dict[str, str], session: Session) -> dict:
+        server = urlsplit(self.url)
+        general = {
+            "mainpage": "Main Page",
+            "base": f"{self.url}/wiki/Main_Page",
+            "sitename": "Wikidata stand-in",
+            "generator": "MediaWiki 1.43.0",
+            "phpversion": "8.1.0",
+            "phpsapi": "standin",
+            "dbtype": "sqlite",
+            "dbversion": "3",
+            "case": "first-letter",
+            "lang": "en",
+            "fallback": [],
+            "rtl": False,
+            "fallback8bitEncoding": "windows-1252",
+            "readonly": False,
+            "writeapi": True,
+            "maxarticlesize": 2097152,
+            "timezone": "UTC",
+            "timeoffset": 0,
+            "articlepath": "/wiki/$1",
+            "scriptpath": "/w",
+            "script": "/w/index.php",
+            "variantarticlepath": False,
+            "server": self.url,
+            "servername": server.hostname,
+            "wikiid": "standin",
+            "time": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "legaltitlechars": " %!\"$&'()*,\\-.\\/0-9:;=?@A-Z\\\\^_`a-z~\\x80-\\xFF+",
+            "invalidusernamechars": "@:>=",
+            "thumblimits": {"0": 120, "1": 150, "2": 180, "3": 200, "4": 220, "5": 250},
+            "imagelimits": {"0": {"width": 320, "height": 240}, "1": {"width": 640, "height": 480}},
+            "magiclinks": {"ISBN": False, "PMID": False, "RFC": False},
+            "wikibase-conceptbaseuri": ENTITY,
+            "wikibase-sparql": f"{self.url}/sparql",
+        }
+        namespaces = {}
+        for ns, name in NAMESPACES.items():
+            namespaces[str(ns)] = {
+                "id": ns,
+                "case": "first-letter",
+                "name": name,
+                "*": name,
+                "canonical": name,
+                "subpages": ns % 2 == 1 or ns == 2,
+                "content": ns in CONTENT_NAMESPACES,
+                "nonincludable": False,
+            }
+            if ns in CONTENT_MODELS:
+                namespaces[str(ns)]["defaultcontentmodel"] = CONTENT_MODELS[ns]
+        extensions = [
+            {"type": "wikibase", "name": "WikibaseRepository"},
+            {"type": "wikibase", "name": "WikibaseClient"},
+        ]
+        info = {
+            "general": general,
+            "namespaces": namespaces,
+            "namespacealiases": [{"id": 120, "alias": "P"}, {"id": 4, "alias": "WD"}],
+            "extensions": extensions,
+            "interwikimap": [],
+            "magicwords": [],
+            "specialpagealiases": [],
+            "restrictions": {"types": ["edit", "move"], "levels": ["", "autoconfirmed", "sysop"], "cascadinglevels": ["sysop"], "semiprotectedlevels": ["autoconfirmed"]},
+            "languages": [{"code": "en", "bcp47": "en", "name": "English"}],
+            "skins": [],
+            "statistics": {"pages": len(self.store.entities), "articles": len(self.store.entities), "edits": len(self.store.changes)},
+        }
+        requested = params.get("siprop", "general").split("|")
+        return {prop: info[prop] for prop in requested if prop in info}
+
+    def _meta_userinfo(self, params: Dict[str, str], session: Session) -> dict:
+        if session.user:
+            user = {
+                "id": self._user_id(session.user),
+                "name": session.user,
+                "groups": ["*", "user", "autoconfirmed", "bot"],
+                "rights": USER_RIGHTS,
+            }
+        else:
+            user = {"id": 0, "name": self._user(session), "anon": True, "groups": ["*"], "rights": ANONYMOUS_RIGHTS}
+        user["ratelimits"] = {}
+        user["messages"] = False
+        return {"userinfo": user}
+
+    def _meta_tokens(self, params: Dict[str, str], session: Session) -> dict:
+        tokens = {}
+        for kind in params.get("type", "csrf").split("|"):
+            tokens[f"{kind}token"] = session.login_token if kind == "login" else session.token
+        return {"tokens": tokens}
+
+    def _meta_wikibase(self, params: Dict[str, str], session: Session) -> dict:
+        url = {"base": self.url, "scriptpath": "/w", "articlepath": "/wiki/$1"}
+        return {"wikibase": {"repo": {"url": url}, "siteid": "standin"}}
+
+    def _pages(self, params: Dict[str, str]) -> dict:
+        pages = []
+        by_page_id = {entity["pageid"]: entity_id for entity_id, entity in self.store.entities.items()}
+        titles = [title for title in params.get("titles", "").split("|") if title]
+        titles += [by_page_id.get(int(page_id), page_id) for page_id in params.get("pageids", "").split("|") if page_id]
+        for title in titles:
+            entity_id = title.split(":", 1)[1] if title.startswith("Property:") else title
+            entity = self.store.get(entity_id) if entity_id[:1] in "QP" and entity_id[1:].isdigit() else None
+            if entity is None or "lastrevid" not in entity:
+                pages.append({"ns": 0, "title": title, "missing": True})
+                continue
+            pages.append(
+                {
+                    "pageid": entity["pageid"],
+                    "ns": entity["ns"],
+                    "title": entity["title"],
+                    "contentmodel": f"wikibase-{entity['type']}",
+                    "pagelanguage": "en",
+                    "touched": entity["modified"],
+                    "lastrevid": entity["lastrevid"],
+                    "length": len(json.dumps(entity)),
+                }
+            )
+        if params.get("formatversion") != "2":
+            return {"pages": {str(page.get("pageid", -index - 1)): page for index, page in enumerate(pages)}}
+        return {"pages": pages}
+
+    def _recentchanges(self, params: Dict[str, str]) -> dict:
+        namespaces = None
+        if params.get("rcnamespace"):
+            namespaces = [int(ns) for ns in params["rcnamespace"].split("|")]
+        limit = params.get("rclimit", "10")
+        limit = 500 if limit == "max" else int(limit)
+        changes = self.store.recent_changes("new" in params.get("rctype", "").split("|"), namespaces, limit)
+        return {"recentchanges": changes}
+
+    # Wikibase
+
+    def _wbgetentities(self, params: Dict[str, str], session: Session) -> dict:
+        if "ids" not in params:
+            raise ApiError("param-missing", "Either provide the item \"ids\" or pairs of \"sites\" and \"titles\" for corresponding pages")
+        props = params.get("props", "info|sitelinks|aliases|labels|descriptions|claims|datatype").split("|")
+        languages = set(params["languages"].split("|")) if params.get("languages") else None
+        entities = {}
+        for entity_id in params["ids"].split("|"):
+            entity_id = entity_id.strip().upper()
+            try:
+                entity = self.store.get(entity_id)
+            except EntityError:
+                raise ApiError("no-such-entity", f"Could not find an entity with the ID \"{entity_id}\".", id=entity_id)
+            if entity is None:
+                entities[entity_id] = {"id": entity_id, "missing": ""}
+                continue
+            entities[entity_id] = _project(entity, props, languages)
+        return {"entities": entities, "success": 1}
+
+    def _wbeditentity(self, params: Dict[str, str], session: Session) -> dict:
+        data = _json_param(params, "data")
+        summary = params.get("summary", "")
+        if params.get("new"):
+            entity = self.store.create(params["new"], data, self._user(session), summary)
+        else:
+            entity = self.store.edit(_required(params, "id"), data, self._user(session), summary, clear=_flag(params, "clear"))
+        return {"entity": entity, "success": 1}
+
+    def _wbsetlabel(self, params: Dict[str, str], session: Session) -> dict:
+        return self._set_term(params, session, "labels")
+
+    def _wbsetdescription(self, params: Dict[str, str], session: Session) -> dict:
+        return self._set_term(params, session, "descriptions")
+
+    def _set_term(self, params: Dict[str, str], session: Session, key: str) -> dict:
+        language = _required(params, "language")
+        value = params.get("value", "")
+        entity = self.store.set_term(_required(params, "id"), key, language, value, self._user(session), params.get("summary", ""))
+        term = entity[key].get(language, {"language": language, "removed": ""})
+        return {
+            "entity": {"id": entity["id"], "type": entity["type"], "lastrevid": entity["lastrevid"], key: {language: term}},
+            "success": 1,
+        }
+
+    def _snak(self, params: Dict[str, str]) -> dict:
+        snak = {"snaktype": params.get("snaktype", "value"), "property": _required(params, "property").upper()}
+        if snak["snaktype"] == "value":
+            value = _json_param(params, "value")
+            snak["datavalue"] = {"value": value, "type": _datavalue_type(value)}
+        return snak
+
+    def _wbcreateclaim(self, params: Dict[str, str], session: Session) -> dict:
+        statement = {"mainsnak": self._snak(params), "type": "statement", "rank": "normal"}
+        entity = self.store.add_statement(_required(params, "entity").upper(), statement, self._user(session), params.get("summary", ""))
+        created = entity["claims"][statement["mainsnak"]["property"]][-1]
+        return {"pageinfo": {"lastrevid": entity["lastrevid"]}, "success": 1, "claim": created}
+
+    def _wbsetclaim(self, params: Dict[str, str], session: Session) -> dict:
+        statement = _json_param(params, "claim")
+        guid = statement.get("id") or ""
+        if "$" not in guid:
+            raise ApiError("invalid-guid", "The statement needs an ID of the form ENTITY$GUID")
+        entity = self.store.edit(guid.split("$", 1)[0].upper(), {"claims": [statement]}, self._user(session), params.get("summary", ""))
+        return {"pageinfo": {"lastrevid": entity["lastrevid"]}, "success": 1, "claim": self.store.statement(guid)}
+
+    def _wbsetqualifier(self, params: Dict[str, str], session: Session) -> dict:
+        statement = self.store.set_qualifier(
+            _required(params, "claim"), self._snak(params), self._user(session), params.get("snakhash"), params.get("summary", "")
+        )
+        entity_id = statement["id"].split("$", 1)[0].upper()
+        return {"pageinfo": {"lastrevid": self.store.revision_of(entity_id)}, "success": 1, "claim": statement}
+
+    def _wbsetreference(self, params: Dict[str, str], session: Session) -> dict:
+        guid = _required(params, "statement")
+        reference = self.store.set_reference(
+            guid, _json_param(params, "snaks"), self._user(session), params.get("reference"), params.get("summary", "")
+        )
+        entity_id = guid.split("$", 1)[0].upper()
+        return {"pageinfo": {"lastrevid": self.store.revision_of(entity_id)}, "success": 1, "reference": reference}
+
+    def _wbremoveclaims(self, params: Dict[str, str], session: Session) -> dict:
+        guids = _required(params, "claim").split("|")
+        entity = self.store.remove_statements(guids, self._user(session), params.get("summary", ""))
+        return {"pageinfo": {"lastrevid": entity["lastrevid"]}, "success": 1, "claims": guids}
+
+
+# Query submodule -> (group, parameter prefix)
+QUERY_MODULES = {
+    "info": ("prop", "in"),
+    "recentchanges": ("list", "rc"),
+    "siteinfo": ("meta", "si"),
+    "userinfo": ("meta", "ui"),
+    "tokens": ("meta", ""),
+    "wikibase": ("meta", "wb"),
+}
+
+
+def _parameter(name: str, **fields) -> dict:
+    return {"name": name, "type": "string", **fields}
+
+
+def _module_info(path: str) -> Optional[dict]:
+    """What action=paraminfo says about a module, which pywikibot checks requests against"""
+    actions = sorted(READ_ACTIONS | WRITE_ACTIONS | {"help"})
+    info = {"path": path, "name": path.rsplit("+", 1)[-1], "classname": path, "prefix": "", "source": "standin"}
+    if path == "main":
+        info["parameters"] = [
+            _parameter("action", type=actions, submodules={action: action for action in actions}),
+            _parameter("format", type=["json"], submodules={"json": "json"}),
+            _parameter("maxlag", type="integer"),
+            _parameter("assert", type=["anon", "user", "bot"]),
+        ]
+    elif path == "query":
+        info["parameters"] = [
+            _parameter(
+                group,
+                type=[name for name, (kind, _) in QUERY_MODULES.items() if kind == group],
+                submodules={name: f"query+{name}" for name, (kind, _) in QUERY_MODULES.items() if kind == group},
+                multi=True,
+                limit=50,
+                highlimit=500,
+            )
+            for group in ("prop", "list", "meta")
+        ]
+        info["parameters"] += [
+            _parameter("titles", multi=True, limit=50, highlimit=500),
+            _parameter("pageids", type="integer", multi=True, limit=50, highlimit=500),
+            _parameter("generator", type=[], submodules={}),
+        ]
+    elif path.startswith("query+") and path[len("query+"):] in QUERY_MODULES:
+        group, prefix = QUERY_MODULES[path[len("query+"):]]
+        info.update(group=group, prefix=prefix, parameters=[])
+        if path == "query+tokens":
+            info["parameters"] = [_parameter("type", type=["csrf", "login"], multi=True)]
+    elif path in READ_ACTIONS or path == "help":
+        info["parameters"] = []
+    elif path in WRITE_ACTIONS:
+        info.update(mustbeposted=True, writerights=True)
+        info["parameters"] = [_parameter("token", tokentype="csrf", required=True)]
+    else:
+        return None
+    return info
+
+
+def _datavalue_type(value) -> str:
+    if isinstance(value, str):
+        return "string"
+    if "entity-type" in value or "numeric-id" in value:
+        return "wikibase-entityid"
+    if "text" in value:
+        return "monolingualtext"
+    if "amount" in value:
+        return "quantity"
+    if "time" in value:
+        return "time"
+    if "latitude" in value:
+        return "globecoordinate"
+    raise ApiError("invalid-snak", "Unknown type of value")
+
+
+_INFO = ("pageid", "ns", "title", "lastrevid", "modified", "type", "id")
+
+
+def _project(entity: dict, props, languages) -> dict:
+    """The parts of an entity wbgetentities was asked for"""
+    result = {key: entity[key] for key in ("type", "id") if key in entity}
+    if "info" in props:
+        result.update({key: entity[key] for key in _INFO if key in entity})
+    if "datatype" in props and "datatype" in entity:
+        result["datatype"] = entity["datatype"]
+    for key in ("labels", "descriptions", "aliases"):
+        if key in props:
+            values = entity.get(key, {})
+            result[key] = {lang: value for lang, value in values.items() if languages is None or lang in languages}
+    if "claims" in props:
+        result["claims"] = entity.get("claims", {})
+    if "sitelinks" in props and "sitelinks" in entity:
+        result["sitelinks"] = entity["sitelinks"]
+    return result
+
@@ -0,0 +1,70 @@
+"""Pointing pywikibot at a stand-in server
+
+    pywikibot reads its configuration from user-config.py in the
+    directory named by PYWIKIBOT_DIR. write_config() writes one where the
+    default site is the stand-in (a family file written next to it),
+    so that the cli and bots run against it unchanged:
+
+        python3 -m standin config /tmp/standin --url http://localhost:8181
+        PYWIKIBOT_DIR=/tmp/standin python3 -m cli.check_tv_show Q3577037
+"""
+import glob
+import os
+import shutil
+from urllib.parse import urlsplit
+
+FAMILY = "standin"
+
+USER_CONFIG = """\
+# Generated by "python3 -m standin config", points pywikibot at a stand-in server
+family_files[{family!r}] = {family_path!r}
+family = {family!r}
+mylang = {family!r}
+usernames[{family!r}][{family!r}] = {username!r}
+password_file = "user-password.py"
+
+# The stand-in has no rate limits worth respecting
+put_throttle = 0
+minthrottle = 0
+maxthrottle = 0
+"""
+
+# A Wikibase family of a single site, so that pywikibot sees the stand-in as a data repository
+FAMILY_FILE = """\
+from pywikibot import family
+
+
+class Family(family.SingleSiteFamily, family.DefaultWikibaseFamily):
+    name = {family!r}
+    domain = {domain!r}
+
+    def protocol(self, code):
+        return {protocol!r}
+
+    def scriptpath(self, code):
+        return "/w"
+"""
+
+
+def write_config(directory: str, url: str, username: str = "StandinBot", password: str = "standin") -> str:
+    """Write user-config.py (and user-password.py) for the stand-in at url into directory
+
+        Returns the path of user-config.py
+    """
+    os.makedirs(directory, exist_ok=True)
+    # pywikibot caches the repository URL of a site for days, which would point at an older stand-in
+    for cache in glob.glob(os.path.join(directory, "apicache*")):
+        shutil.rmtree(cache)
+    parts = urlsplit(url)
+    family_path = os.path.join(os.path.abspath(directory), f"{FAMILY}_family.py")
+    with open(family_path, "w") as f:
+        f.write(FAMILY_FILE.format(family=FAMILY, domain=parts.netloc, protocol=parts.scheme))
+    path = os.path.join(directory, "user-config.py")
+    with open(path, "w") as f:
+        f.write(USER_CONFIG.format(family=FAMILY, family_path=family_path, username=username))
+    password_path = os.path.join(directory, "user-password.py")
+    with open(password_path, "w") as f:
+        f.write(f"({username!r}, {password!r})\n")
+    # pywikibot refuses password files that others can read
+    os.chmod(password_path, 0o600)
+    return path
@@ -0,0 +1,185 @@
+"""The RDF view of the stand-in's entities, as the SPARQL endpoint sees it
+
+    Entities are mapped to triples the way the Wikidata Query Service maps
+    them, for the parts our queries use:
+
+    - labels, descriptions and aliases (rdfs:label, schema:description
+      and skos:altLabel)
+    - truthy claims (wdt:), ie: the best ranked, non-deprecated statements
+    - full statements (p:, ps: and pq:), with wikibase:rank
+
+    Terms are IRIs (a str subclass) or Literals. The graph is indexed by
+    subject and by (predicate, object), and is updated one entity at a
+    time as entities are edited.
+"""
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+ENTITY = "http://www.wikidata.org/entity/"
+
+PREFIXES = {
+    "wd": ENTITY,
+    "wds": ENTITY + "statement/",
+    "wdt": "http://www.wikidata.org/prop/direct/",
+    "p": "http://www.wikidata.org/prop/",
+    "ps": "http://www.wikidata.org/prop/statement/",
+    "pq": "http://www.wikidata.org/prop/qualifier/",
+    "wikibase": "http://wikiba.se/ontology#",
+    "bd": "http://www.bigdata.com/rdf#",
+    "rdf": "http://www.w3.org/1999/02/22-rdf-syntax-ns#",
+    "rdfs": "http://www.w3.org/2000/01/rdf-schema#",
+    "schema": "http://schema.org/",
+    "skos": "http://www.w3.org/2004/02/skos/core#",
+    "xsd": "http://www.w3.org/2001/XMLSchema#",
+    "geo": "http://www.opengis.net/ont/geosparql#",
+}
+
+XSD = PREFIXES["xsd"]
+RDFS_LABEL = PREFIXES["rdfs"] + "label"
+SCHEMA_DESCRIPTION = PREFIXES["schema"] + "description"
+SKOS_ALT_LABEL = PREFIXES["skos"] + "altLabel"
+RANK = PREFIXES["wikibase"] + "rank"
+RANKS = {"preferred": "PreferredRank", "normal": "NormalRank", "deprecated": "DeprecatedRank"}
+
+
+class IRI(str):
+    """An IRI, as opposed to a string literal"""
+
+    __slots__ = ()
+
+    def __repr__(self):
+        return f"<{self}>"
+
+
+class Literal(NamedTuple):
+    """A literal, with either a language tag or a datatype (or neither)"""
+
+    value: str
+    lang: Optional[str] = None
+    datatype: Optional[str] = None
+
+
+Term = object  # IRI or Literal
+Triple = Tuple[IRI, IRI, Term]
+
+
+def datavalue_term(datavalue: dict) -> Optional[Term]:
+    """The RDF term of a snak's datavalue"""
+    kind, value = datavalue.get("type"), datavalue.get("value")
+    if kind == "wikibase-entityid":
+        entity_id = value.get("id") or f"{value['entity-type'][0].upper()}{value['numeric-id']}"
+        return IRI(ENTITY + entity_id)
+    if kind == "string":
+        return Literal(value)
+    if kind == "monolingualtext":
+        return Literal(value["text"], lang=value["language"])
+    if kind == "quantity":
+        return Literal(value["amount"].lstrip("+"), datatype=XSD + "decimal")
+    if kind == "time":
+        return Literal(value["time"].lstrip("+"), datatype=XSD + "dateTime")
+    if kind == "globecoordinate":
+        return Literal(f"Point({value['longitude']} {value['latitude']})", datatype=PREFIXES["geo"] + "wktLiteral")
+    return None
+
+
+def snak_term(snak: dict) -> Optional[Term]:
+    """The RDF term of a snak, or None for 'no value' and 'unknown value' snaks"""
+    if snak.get("snaktype", "value") != "value" or "datavalue" not in snak:
+        return None
+    term = datavalue_term(snak["datavalue"])
+    if snak.get("datatype") in ("url", "commonsMedia") and isinstance(term, Literal):
+        return IRI(term.value)
+    return term
+
+
+def statement_iri(statement_id: str) -> IRI:
+    return IRI(PREFIXES["wds"] + statement_id.replace("$", "-"))
+
+
+def entity_triples(entity: dict) -> List[Triple]:
+    """All triples of an entity, without duplicates"""
+    subject = IRI(ENTITY + entity["id"])
+    triples = {}
+
+    def add(s, p, o):
+        if o is not None:
+            triples[(s, IRI(p), o)] = None
+
+    for lang, label in entity.get("labels", {}).items():
+        add(subject, RDFS_LABEL, Literal(label["value"], lang=lang))
+    for lang, description in entity.get("descriptions", {}).items():
+        add(subject, SCHEMA_DESCRIPTION, Literal(description["value"], lang=lang))
+    for lang, aliases in entity.get("aliases", {}).items():
+        for alias in aliases:
+            add(subject, SKOS_ALT_LABEL, Literal(alias["value"], lang=lang))
+
+    for pid, statements in entity.get("claims", {}).items():
+        ranks = {statement.get("rank", "normal") for statement in statements}
+        best = "preferred" if "preferred" in ranks else "normal"
+        for statement in statements:
+            rank = statement.get("rank", "normal")
+            value = snak_term(statement["mainsnak"])
+            if rank == best:
+                add(subject, PREFIXES["wdt"] + pid, value)
+            if "id" not in statement:
+                continue
+            node = statement_iri(statement["id"])
+            add(subject, PREFIXES["p"] + pid, node)
+            add(node, PREFIXES["ps"] + pid, value)
+            add(node, RANK, IRI(PREFIXES["wikibase"] + RANKS.get(rank, "NormalRank")))
+            for qualifier_pid, snaks in statement.get("qualifiers", {}).items():
+                for snak in snaks:
+                    add(node, PREFIXES["pq"] + qualifier_pid, snak_term(snak))
+    return list(triples)
+
+
+class Graph:
+    """The triples of all entities, indexed for lookups by subject and by (predicate, object)
+
+        Not thread-safe on its own, the store guards it.
+    """
+
+    def __init__(self):
+        # subject -> predicate -> objects, and predicate -> object -> subjects.
+        # Dicts are used as ordered sets, so that results come in a stable order
+        self._spo: Dict[IRI, Dict[IRI, Dict[Term, None]]] = {}
+        self._pos: Dict[IRI, Dict[Term, Dict[IRI, None]]] = {}
+        self._triples: Dict[str, List[Triple]] = {}
+
+    def set_entity(self, entity_id: str, triples: Iterable[Triple]) -> None:
+        """Replace the triples of an entity"""
+        for s, p, o in self._triples.pop(entity_id, ()):
+            _discard(self._spo, s, p, o)
+            _discard(self._pos, p, o, s)
+        triples = list(triples)
+        for s, p, o in triples:
+            self._spo.setdefault(s, {}).setdefault(p, {})[o] = None
+            self._pos.setdefault(p, {}).setdefault(o, {})[s] = None
+        self._triples[entity_id] = triples
+
+    def objects(self, subject: Term, predicate: IRI) -> Iterable[Term]:
+        return self._spo.get(subject, {}).get(predicate, {}).keys()
+
+    def subjects(self, predicate: IRI, obj: Term) -> Iterable[IRI]:
+        return self._pos.get(predicate, {}).get(obj, {}).keys()
+
+    def pairs(self, predicate: IRI) -> Iterator[Tuple[IRI, Term]]:
+        for obj, subjects in self._pos.get(predicate, {}).items():
+            for subject in subjects:
+                yield subject, obj
+
+    def all_subjects(self) -> Iterable[IRI]:
+        return self._spo.keys()
+
+    def __len__(self):
+        return sum(len(triples) for triples in self._triples.values())
+
+
+def _discard(index: dict, a, b, c) -> None:
+    inner = index.get(a)
+    if inner is None or b not in inner:
+        return
+    inner[b].pop(c, None)
+    if not inner[b]:
+        del inner[b]
+        if not inner:
+            del index[a]
@@ -0,0 +1,183 @@
+"""The stand-in's HTTP server
+
+    /w/api.php serves the action API (see api.py), and /sparql (as well
+    as WDQS's own /bigdata/namespace/wdq/sparql) the SPARQL endpoint, over
+    the same in-memory store. /standin/stats returns the number of
+    requests served so far, by action, which load tests can compare with
+    what the client thinks it sent.
+
+    Every request is handled on a thread of its own, and can be delayed
+    by a fixed latency to make concurrency measurable.
+"""
+import json
+import threading
+import time
+from collections import Counter
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+from .api import ActionApi
+from .sparql import SparqlError
+from .store import EntityStore
+
+API_PATH = "/w/api.php"
+SPARQL_PATHS = ("/sparql", "/bigdata/namespace/wdq/sparql")
+STATS_PATH = "/standin/stats"
+SESSION_COOKIE = "standin_session"
+
+
+class StandinServer(ThreadingHTTPServer):
+    """A local stand-in for the Wikidata API and query service
+
+        Use it as a context manager to serve in a background thread, or
+        call serve_forever().
+
+        Arguments
+        ---------
+        store: EntityStore
+            The entities to serve
+        host, port: str, int
+            The address to listen on. With port 0, a free port is picked
+        latency: float
+            Seconds to wait before answering each request
+        verbose: bool
+            If True, log every request to stderr
+        api_options:
+            Passed on to ActionApi (accounts, lag and lag_every)
+    """
+
+    daemon_threads = True
+
+    def __init__(self, store: EntityStore, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0, verbose: bool = False, **api_options):
+        super().__init__((host, port), _Handler)
+        self.store = store
+        self.latency = latency
+        self.verbose = verbose
+        self.api = ActionApi(store, self.url, **api_options)
+        self.stats: Counter = Counter()
+        self._stats_lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def api_url(self) -> str:
+        return self.url + API_PATH
+
+    def count(self, key: str) -> None:
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.serve_forever, name="standin", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
+        self._thread.join()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: StandinServer
+
+    def do_GET(self):
+        self._dispatch(posted=False)
+
+    def do_POST(self):
+        self._dispatch(posted=True)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _dispatch(self, posted: bool) -> None:
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        url = urlsplit(self.path)
+        try:
+            params = dict(parse_qsl(url.query, keep_blank_values=True))
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0)) if posted else b""
+            params.update(self._form(body))
+        except ValueError as e:
+            self._send(400, {"Content-Type": "text/plain; charset=utf-8"}, f"Malformed request: {e}".encode("utf-8"))
+            return
+
+        if url.path == API_PATH:
+            self._api(params, posted)
+        elif url.path in SPARQL_PATHS:
+            if "query" not in params and body and self.headers.get("Content-Type", "").startswith("application/sparql-query"):
+                params["query"] = body.decode("utf-8")
+            self._sparql(params)
+        elif url.path == STATS_PATH:
+            with self.server._stats_lock:
+                stats = dict(self.server.stats)
+            self._send_json(200, {}, stats)
+        else:
+            self._send(404, {"Content-Type": "text/plain; charset=utf-8"}, b"Not found")
+
+    def _form(self, body: bytes) -> Dict[str, str]:
+        content_type = self.headers.get("Content-Type", "")
+        if not body:
+            return {}
+        if content_type.startswith("application/x-www-form-urlencoded"):
+            return dict(parse_qsl(body.decode("utf-8"), keep_blank_values=True, strict_parsing=True))
+        if content_type.startswith("multipart/form-data"):
+            message = BytesParser(policy=HTTP).parsebytes(b"Content-Type: " + content_type.encode("latin-1") + b"\r\n\r\n" + body)
+            return {
+                part.get_param("name", header="content-disposition"): part.get_content()
+                for part in message.iter_parts()
+            }
+        return {}
+
+    def _api(self, params: Dict[str, str], posted: bool) -> None:
+        cookie = SimpleCookie(self.headers.get("Cookie", ""))
+        key = cookie[SESSION_COOKIE].value if SESSION_COOKIE in cookie else None
+        session = self.server.api.session(key)
+        self.server.count(f"api:{params.get('action', 'help')}")
+        body, headers = self.server.api.handle(params, session, posted)
+        if session.key != key:
+            headers["Set-Cookie"] = f"{SESSION_COOKIE}={session.key}; Path=/; HttpOnly"
+        if "error" in body:
+            headers["MediaWiki-API-Error"] = body["error"]["code"]
+        self._send_json(200, headers, body)
+
+    def _sparql(self, params: Dict[str, str]) -> None:
+        self.server.count("sparql")
+        if "query" not in params:
+            self._send(400, {"Content-Type": "text/plain; charset=utf-8"}, b"Missing the query parameter")
+            return
+        try:
+            results = self.server.store.select(params["query"])
+        except SparqlError as e:
+            self._send(400, {"Content-Type": "text/plain; charset=utf-8"}, f"MalformedQueryException: {e}".encode("utf-8"))
+            return
+        self._send_json(200, {"Content-Type": "application/sparql-results+json; charset=utf-8"}, results)
+
+    def _send_json(self, status: int, headers: Dict[str, str], body) -> None:
+        headers = {"Content-Type": "application/json; charset=utf-8", **headers}
+        self._send(status, headers, json.dumps(body).encode("utf-8"))
+
+    def _send(self, status: int, headers: Dict[str, str], content: bytes) -> None:
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+
+def serve(paths: List[str], host: str = "127.0.0.1", port: int = 8181, **options) -> Tuple[StandinServer, int]:
+    """A server over the entities of these fixture files (or directories), and the number of entities loaded"""
+    store = EntityStore()
+    loaded = sum(store.load(path) for path in paths)
+    return StandinServer(store, host, port, **options), loaded
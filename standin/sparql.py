@@ -0,0 +1,1110 @@
+"""A small SPARQL engine over the stand-in's graph
+
+    It covers the SELECT queries this repository (and most bots) send to
+    the Wikidata Query Service:
+
+    - basic graph patterns, with ; and , and the usual WDQS prefixes
+      (PREFIX declarations may add more)
+    - property paths (/, |, ^, *, + and ?)
+    - OPTIONAL, UNION, MINUS, nested groups, FILTER (NOT) EXISTS, BIND
+      and VALUES
+    - FILTER expressions, with the common string, numeric and type
+      functions, and xsd: casts
+    - the label service (SERVICE wikibase:label), which falls back to the
+      QID when an item has no label in the requested languages, as WDQS
+      does
+    - SELECT [DISTINCT] of variables and expressions, ORDER BY, LIMIT and
+      OFFSET
+
+    Aggregates, sub-queries, named graphs and blank nodes are not
+    supported, and raise SparqlError like malformed queries do.
+
+    Patterns are evaluated in order, each one for every solution of the
+    patterns before it (the triples of a block are reordered so that the
+    most bound ones come first), and a group's filters are applied once
+    all of its patterns are. This is not exactly the bottom-up evaluation
+    of the SPARQL algebra, but it gives the same results for the queries
+    we write, and keeps lookups indexed.
+"""
+import operator
+import re
+from decimal import Decimal, InvalidOperation
+from functools import cmp_to_key
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from .graph import ENTITY, PREFIXES, RDFS_LABEL, SCHEMA_DESCRIPTION, SKOS_ALT_LABEL, XSD, IRI, Graph, Literal
+
+RDF_TYPE = IRI(PREFIXES["rdf"] + "type")
+LABEL_SERVICE = PREFIXES["wikibase"] + "label"
+SERVICE_PARAM = PREFIXES["bd"] + "serviceParam"
+LANGUAGE_PARAM = PREFIXES["wikibase"] + "language"
+LABEL_SUFFIXES = {"Label": RDFS_LABEL, "Description": SCHEMA_DESCRIPTION, "AltLabel": SKOS_ALT_LABEL}
+
+INTEGER = XSD + "integer"
+DECIMAL = XSD + "decimal"
+DOUBLE = XSD + "double"
+BOOLEAN = XSD + "boolean"
+STRING = XSD + "string"
+NUMERIC = {INTEGER, DECIMAL, DOUBLE, XSD + "float", XSD + "int", XSD + "long"}
+
+TRUE = Literal("true", datatype=BOOLEAN)
+FALSE = Literal("false", datatype=BOOLEAN)
+
+
+class SparqlError(Exception):
+    """A query that is malformed, or that uses a feature the stand-in does not support"""
+
+
+class _ExprError(Exception):
+    """An expression that cannot be evaluated for a solution (eg: an unbound variable)"""
+
+
+class Var(str):
+    """A variable, as opposed to an IRI"""
+
+    __slots__ = ()
+
+
+class Query(NamedTuple):
+    projection: list  # [(variable, expression or None)], or None for SELECT *
+    distinct: bool
+    where: list
+    order: List[Tuple[tuple, bool]]  # [(expression, descending)]
+    limit: Optional[int]
+    offset: int
+    variables: List[str]  # All variables of the query, in order of appearance
+
+
+_TOKEN = re.compile(
+    r"""
+    (?P<ws>\s+|\#[^\n]*)
+    | (?P<iri><[^<>"{}|^`\\\s]*>)
+    | (?P<string>"(?:[^"\\\n]|\\.)*"|'(?:[^'\\\n]|\\.)*')
+    | (?P<var>[?$]\w+)
+    | (?P<lang>@[A-Za-z]+(?:-[A-Za-z0-9]+)*)
+    | (?P<number>\d+\.\d+|\d+|\.\d+)
+    | (?P<pname>[A-Za-z][\w-]*:(?:[\w-]+(?:\.[\w-]+)*)?)
+    | (?P<name>[A-Za-z_]\w*)
+    | (?P<op>&&|\|\||!=|<=|>=|\^\^|[{}()\[\].,;=<>!*/|+\-^?])
+    """,
+    re.VERBOSE,
+)
+
+_ESCAPES = {"t": "\t", "n": "\n", "r": "\r", "b": "\b", "f": "\f", '"': '"', "'": "'", "\\": "\\"}
+
+
+def _tokenize(text: str) -> List[Tuple[str, str]]:
+    tokens, position = [], 0
+    while position < len(text):
+        match = _TOKEN.match(text, position)
+        if match is None:
+            raise SparqlError(f"Unexpected character {text[position]!r} at {position}")
+        position = match.end()
+        if match.lastgroup != "ws":
+            tokens.append((match.lastgroup, match.group()))
+    return tokens
+
+
+def _unescape(text: str) -> str:
+    return re.sub(r"\\(.)", lambda m: _ESCAPES.get(m.group(1), m.group(1)), text[1:-1])
+
+
+class _Parser:
+    def __init__(self, text: str):
+        self.tokens = _tokenize(text)
+        self.position = 0
+        self.prefixes = dict(PREFIXES)
+        self.variables: Dict[str, None] = {}
+
+    # Tokens
+
+    def peek(self, offset: int = 0) -> Tuple[str, str]:
+        index = self.position + offset
+        return self.tokens[index] if index < len(self.tokens) else ("end", "")
+
+    def next(self) -> Tuple[str, str]:
+        token = self.peek()
+        self.position += 1
+        return token
+
+    def is_keyword(self, *words: str) -> bool:
+        kind, text = self.peek()
+        return kind == "name" and text.upper() in words
+
+    def accept_keyword(self, word: str) -> bool:
+        if self.is_keyword(word):
+            self.position += 1
+            return True
+        return False
+
+    def expect_keyword(self, word: str) -> None:
+        if not self.accept_keyword(word):
+            self.error(f"Expected {word}")
+
+    def is_op(self, *ops: str) -> bool:
+        kind, text = self.peek()
+        return kind == "op" and text in ops
+
+    def accept(self, op: str) -> bool:
+        if self.is_op(op):
+            self.position += 1
+            return True
+        return False
+
+    def expect(self, op: str) -> None:
+        if not self.accept(op):
+            self.error(f"Expected {op!r}")
+
+    def error(self, message: str):
+        kind, text = self.peek()
+        raise SparqlError(f"{message}, got {text or kind!r} (token {self.position})")
+
+    # Query
+
+    def query(self) -> Query:
+        while self.is_keyword("PREFIX", "BASE"):
+            if self.accept_keyword("BASE"):
+                self.error("BASE is not supported")
+            self.next()
+            kind, prefix = self.next()
+            if kind != "pname" or not prefix.endswith(":"):
+                self.error("Expected a prefix")
+            self.prefixes[prefix[:-1]] = self.iri_ref()
+
+        if self.is_keyword("ASK", "CONSTRUCT", "DESCRIBE"):
+            self.error("Only SELECT queries are supported")
+        self.expect_keyword("SELECT")
+        distinct = self.accept_keyword("DISTINCT") or self.accept_keyword("REDUCED")
+        projection = None
+        if not self.accept("*"):
+            projection = []
+            while not self.is_keyword("WHERE") and not self.is_op("{"):
+                if self.accept("("):
+                    expression = self.expression()
+                    self.expect_keyword("AS")
+                    projection.append((self.var(), expression))
+                    self.expect(")")
+                else:
+                    projection.append((self.var(), None))
+            if not projection:
+                self.error("Expected variables to select")
+        self.accept_keyword("WHERE")
+        where = self.group()
+
+        order, limit, offset = [], None, 0
+        if self.accept_keyword("ORDER"):
+            self.expect_keyword("BY")
+            while True:
+                if self.is_keyword("ASC", "DESC"):
+                    descending = self.next()[1].upper() == "DESC"
+                    self.expect("(")
+                    order.append((self.expression(), descending))
+                    self.expect(")")
+                elif self.peek()[0] in ("var", "name", "pname", "iri") and not self.is_keyword("LIMIT", "OFFSET") or self.is_op("("):
+                    order.append((self.primary(), False))
+                else:
+                    break
+            if not order:
+                self.error("Expected an ORDER BY condition")
+        while self.is_keyword("LIMIT", "OFFSET"):
+            keyword = self.next()[1].upper()
+            kind, number = self.next()
+            if kind != "number" or not number.isdigit():
+                self.error(f"Expected a number after {keyword}")
+            if keyword == "LIMIT":
+                limit = int(number)
+            else:
+                offset = int(number)
+        if self.peek()[0] != "end":
+            self.error("Unsupported or unexpected clause")
+        return Query(projection, distinct, where, order, limit, offset, list(self.variables))
+
+    # Graph patterns
+
+    def group(self) -> list:
+        self.expect("{")
+        if self.is_keyword("SELECT"):
+            self.error("Sub-queries are not supported")
+        elements = []
+        while not self.accept("}"):
+            if self.accept_keyword("OPTIONAL"):
+                elements.append(("optional", self.group()))
+            elif self.accept_keyword("MINUS"):
+                elements.append(("minus", self.group()))
+            elif self.accept_keyword("FILTER"):
+                elements.append(("filter", self.constraint()))
+            elif self.accept_keyword("BIND"):
+                self.expect("(")
+                expression = self.expression()
+                self.expect_keyword("AS")
+                elements.append(("bind", expression, self.var()))
+                self.expect(")")
+            elif self.accept_keyword("VALUES"):
+                elements.append(self.values())
+            elif self.accept_keyword("SERVICE"):
+                self.accept_keyword("SILENT")
+                elements.append(("service", self.iri(), self.group()))
+            elif self.is_keyword("GRAPH"):
+                self.error("Named graphs are not supported")
+            elif self.is_op("{"):
+                groups = [self.group()]
+                while self.accept_keyword("UNION"):
+                    groups.append(self.group())
+                elements.append(("union", groups) if len(groups) > 1 else ("group", groups[0]))
+            else:
+                triples = self.triples()
+                if elements and elements[-1][0] == "triples":
+                    elements[-1][1].extend(triples)
+                else:
+                    elements.append(("triples", triples))
+            self.accept(".")
+        return elements
+
+    def values(self) -> tuple:
+        if self.peek()[0] == "var":
+            variables = [self.var()]
+            self.expect("{")
+            rows = []
+            while not self.accept("}"):
+                rows.append([self.data_value()])
+            return ("values", variables, rows)
+        self.expect("(")
+        variables = []
+        while not self.accept(")"):
+            variables.append(self.var())
+        self.expect("{")
+        rows = []
+        while not self.accept("}"):
+            self.expect("(")
+            row = []
+            while not self.accept(")"):
+                row.append(self.data_value())
+            if len(row) != len(variables):
+                self.error("VALUES row of the wrong length")
+            rows.append(row)
+        return ("values", variables, rows)
+
+    def data_value(self):
+        if self.accept_keyword("UNDEF"):
+            return None
+        return self.term()
+
+    def triples(self) -> list:
+        subject = self.var_or_term()
+        triples = []
+        while True:
+            if self.peek()[0] == "var":
+                verb = self.var()
+            else:
+                verb = self.path()
+            while True:
+                triples.append((subject, verb, self.var_or_term()))
+                if not self.accept(","):
+                    break
+            if not self.accept(";"):
+                break
+            if self.is_op(".", "}") or self.is_keyword("FILTER", "OPTIONAL", "BIND", "VALUES", "SERVICE", "MINUS"):
+                break
+        return triples
+
+    def path(self) -> tuple:
+        alternatives = [self.path_sequence()]
+        while self.accept("|"):
+            alternatives.append(self.path_sequence())
+        return alternatives[0] if len(alternatives) == 1 else ("alt", alternatives)
+
+    def path_sequence(self) -> tuple:
+        steps = [self.path_element()]
+        while self.accept("/"):
+            steps.append(self.path_element())
+        return steps[0] if len(steps) == 1 else ("seq", steps)
+
+    def path_element(self) -> tuple:
+        inverse = self.accept("^")
+        if self.accept("("):
+            element = self.path()
+            self.expect(")")
+        elif self.accept_keyword("A"):
+            element = ("link", RDF_TYPE)
+        else:
+            element = ("link", self.iri())
+        for op, kind in (("*", "star"), ("+", "plus"), ("?", "opt")):
+            if self.accept(op):
+                element = (kind, element)
+                break
+        return ("inv", element) if inverse else element
+
+    # Terms
+
+    def var(self) -> Var:
+        kind, text = self.next()
+        if kind != "var":
+            self.position -= 1
+            self.error("Expected a variable")
+        self.variables[text[1:]] = None
+        return Var(text[1:])
+
+    def iri_ref(self) -> IRI:
+        kind, text = self.next()
+        if kind != "iri":
+            self.position -= 1
+            self.error("Expected an IRI")
+        return IRI(text[1:-1])
+
+    def iri(self) -> IRI:
+        kind, text = self.peek()
+        if kind == "iri":
+            return self.iri_ref()
+        if kind == "pname":
+            self.next()
+            prefix, _, local = text.partition(":")
+            if prefix not in self.prefixes:
+                raise SparqlError(f"Unknown prefix {prefix}:")
+            return IRI(self.prefixes[prefix] + local)
+        self.error("Expected an IRI")
+
+    def literal(self) -> Literal:
+        _, text = self.next()
+        value = _unescape(text)
+        if self.peek()[0] == "lang":
+            return Literal(value, lang=self.next()[1][1:].lower())
+        if self.accept("^^"):
+            return Literal(value, datatype=self.iri())
+        return Literal(value)
+
+    def term(self):
+        kind, text = self.peek()
+        if kind == "string":
+            return self.literal()
+        if kind == "number":
+            self.next()
+            return Literal(text, datatype=DECIMAL if "." in text else INTEGER)
+        if self.is_op("-", "+") and self.peek(1)[0] == "number":
+            sign = self.next()[1]
+            number = self.next()[1]
+            return Literal(sign.lstrip("+") + number, datatype=DECIMAL if "." in number else INTEGER)
+        if self.is_keyword("TRUE", "FALSE"):
+            return TRUE if self.next()[1].lower() == "true" else FALSE
+        if self.is_op("[", "("):
+            self.error("Blank nodes and collections are not supported")
+        return self.iri()
+
+    def var_or_term(self):
+        if self.peek()[0] == "var":
+            return self.var()
+        return self.term()
+
+    # Expressions
+
+    def constraint(self) -> tuple:
+        if self.is_op("("):
+            return self.primary()
+        if self.is_keyword("NOT", "EXISTS"):
+            return self.primary()
+        kind, _ = self.peek()
+        if kind in ("name", "pname", "iri"):
+            return self.primary()
+        self.error("Expected a constraint")
+
+    def expression(self) -> tuple:
+        left = self.conjunction()
+        while self.accept("||"):
+            left = ("or", left, self.conjunction())
+        return left
+
+    def conjunction(self) -> tuple:
+        left = self.relation()
+        while self.accept("&&"):
+            left = ("and", left, self.relation())
+        return left
+
+    def relation(self) -> tuple:
+        left = self.additive()
+        if self.is_op("=", "!=", "<", ">", "<=", ">="):
+            op = self.next()[1]
+            return ("compare", op, left, self.additive())
+        negate = False
+        if self.is_keyword("NOT") and self.peek(1)[0] == "name" and self.peek(1)[1].upper() == "IN":
+            self.next()
+            negate = True
+        if self.accept_keyword("IN"):
+            return ("in", left, self.arguments(), negate)
+        if negate:
+            self.error("Expected IN")
+        return left
+
+    def additive(self) -> tuple:
+        left = self.multiplicative()
+        while self.is_op("+", "-"):
+            left = ("arith", self.next()[1], left, self.multiplicative())
+        return left
+
+    def multiplicative(self) -> tuple:
+        left = self.unary()
+        while self.is_op("*", "/"):
+            left = ("arith", self.next()[1], left, self.unary())
+        return left
+
+    def unary(self) -> tuple:
+        if self.accept("!"):
+            return ("not", self.unary())
+        if self.accept("-"):
+            return ("arith", "-", ("const", Literal("0", datatype=INTEGER)), self.unary())
+        self.accept("+")
+        return self.primary()
+
+    def arguments(self) -> list:
+        self.expect("(")
+        arguments = []
+        if self.accept(")"):
+            return arguments
+        self.accept_keyword("DISTINCT")
+        while True:
+            arguments.append(self.expression())
+            if self.accept(")"):
+                return arguments
+            self.expect(",")
+
+    def primary(self) -> tuple:
+        kind, text = self.peek()
+        if self.accept("("):
+            expression = self.expression()
+            self.expect(")")
+            return expression
+        if kind == "var":
+            return ("var", self.var())
+        if self.is_keyword("NOT") and self.peek(1)[1].upper() == "EXISTS":
+            self.next()
+            self.next()
+            return ("exists", self.group(), True)
+        if self.accept_keyword("EXISTS"):
+            return ("exists", self.group(), False)
+        if kind == "name" and text.upper() not in ("TRUE", "FALSE"):
+            name = self.next()[1].upper()
+            if name in _AGGREGATES:
+                raise SparqlError(f"Aggregates ({name}) are not supported")
+            if name not in _FUNCTIONS and name not in ("BOUND", "IF", "COALESCE"):
+                raise SparqlError(f"Unsupported function {name}")
+            return ("call", name, self.arguments())
+        if kind in ("iri", "pname"):
+            iri = self.iri()
+            if self.is_op("("):
+                if iri not in _CASTS:
+                    raise SparqlError(f"Unsupported function <{iri}>")
+                return ("cast", iri, self.arguments())
+            return ("const", iri)
+        return ("const", self.term())
+
+
+def parse(text: str) -> Query:
+    """Parse a SELECT query, raising SparqlError if it is malformed or unsupported"""
+    return _Parser(text).query()
+
+
+# Values
+
+
+def _bool(value: bool) -> Literal:
+    return TRUE if value else FALSE
+
+
+def _is_numeric(term) -> bool:
+    return isinstance(term, Literal) and term.datatype in NUMERIC
+
+
+def _number(term):
+    if not _is_numeric(term):
+        raise _ExprError(f"Not a number: {term}")
+    try:
+        if term.datatype == INTEGER or term.datatype in (XSD + "int", XSD + "long"):
+            return int(term.value)
+        return Decimal(term.value)
+    except (ValueError, InvalidOperation):
+        raise _ExprError(f"Not a number: {term}")
+
+
+def _numeric(value) -> Literal:
+    if isinstance(value, int):
+        return Literal(str(value), datatype=INTEGER)
+    return Literal(str(value), datatype=DECIMAL)
+
+
+def _string(term) -> str:
+    if isinstance(term, IRI):
+        return str(term)
+    if isinstance(term, Literal):
+        return term.value
+    raise _ExprError(f"Not a string: {term}")
+
+
+def _literal_string(term) -> Literal:
+    if not isinstance(term, Literal) or (term.datatype not in (None, STRING)):
+        raise _ExprError(f"Not a string literal: {term}")
+    return term
+
+
+def _ebv(term) -> bool:
+    """The effective boolean value of a term"""
+    if isinstance(term, Literal):
+        if term.datatype == BOOLEAN:
+            return term.value == "true"
+        if _is_numeric(term):
+            return _number(term) != 0
+        if term.datatype in (None, STRING):
+            return bool(term.value)
+    raise _ExprError(f"No boolean value for {term}")
+
+
+def _equal(left, right) -> bool:
+    if _is_numeric(left) and _is_numeric(right):
+        return _number(left) == _number(right)
+    return left == right
+
+
+_ORDERINGS = {"<": operator.lt, ">": operator.gt, "<=": operator.le, ">=": operator.ge}
+
+
+def _compare(op: str, left, right) -> bool:
+    if op == "=":
+        return _equal(left, right)
+    if op == "!=":
+        return not _equal(left, right)
+    if _is_numeric(left) and _is_numeric(right):
+        return _ORDERINGS[op](_number(left), _number(right))
+    if isinstance(left, Literal) and isinstance(right, Literal) and left.datatype == right.datatype:
+        return _ORDERINGS[op](left.value, right.value)
+    raise _ExprError(f"Cannot compare {left} and {right}")
+
+
+def _arith(op: str, left, right) -> Literal:
+    a, b = _number(left), _number(right)
+    if op == "/":
+        if b == 0:
+            raise _ExprError("Division by zero")
+        return _numeric(Decimal(a) / Decimal(b))
+    if isinstance(a, int) != isinstance(b, int):
+        a, b = Decimal(a), Decimal(b)
+    return _numeric({"+": operator.add, "-": operator.sub, "*": operator.mul}[op](a, b))
+
+
+def _substr(term, start, length=None) -> Literal:
+    text = _literal_string(term)
+    begin = _number(start) - 1
+    value = text.value[max(begin, 0):] if length is None else text.value[max(begin, 0):max(begin + _number(length), 0)]
+    return text._replace(value=value)
+
+
+def _regex_flags(flags=None) -> int:
+    return re.IGNORECASE if flags is not None and "i" in _string(flags) else 0
+
+
+def _regex(text, pattern, flags=None) -> Literal:
+    return _bool(re.search(_string(pattern), _literal_string(text).value, _regex_flags(flags)) is not None)
+
+
+def _replace(text, pattern, replacement, flags=None) -> Literal:
+    literal = _literal_string(text)
+    replacement = re.sub(r"\$(\d)", r"\\\1", _string(replacement))
+    return literal._replace(value=re.sub(_string(pattern), replacement, literal.value, flags=_regex_flags(flags)))
+
+
+def _before(text, other) -> Literal:
+    literal = _literal_string(text)
+    value, found, _ = literal.value.partition(_string(other))
+    return literal._replace(value=value) if found else Literal("")
+
+
+def _after(text, other) -> Literal:
+    literal = _literal_string(text)
+    _, found, value = literal.value.partition(_string(other))
+    return literal._replace(value=value) if found else Literal("")
+
+
+def _langmatches(tag, pattern) -> Literal:
+    tag, pattern = _string(tag).lower(), _string(pattern).lower()
+    if pattern == "*":
+        return _bool(bool(tag))
+    return _bool(tag == pattern or tag.startswith(pattern + "-"))
+
+
+def _date_part(term, index: int) -> Literal:
+    match = re.match(r"(-?\d+)-(\d\d)-(\d\d)", _string(term))
+    if match is None:
+        raise _ExprError(f"Not a date: {term}")
+    return _numeric(int(match.group(index)))
+
+
+def _round(term, function) -> Literal:
+    number = _number(term)
+    return _numeric(number if isinstance(number, int) else Decimal(function(number)))
+
+
+_FUNCTIONS = {
+    "STR": lambda term: Literal(_string(term)),
+    "LANG": lambda term: Literal(term.lang or "") if isinstance(term, Literal) else _raise(term),
+    "DATATYPE": lambda term: IRI(term.datatype or (PREFIXES["rdf"] + "langString" if term.lang else STRING)),
+    "IRI": lambda term: IRI(_string(term)),
+    "URI": lambda term: IRI(_string(term)),
+    "STRLEN": lambda term: _numeric(len(_literal_string(term).value)),
+    "UCASE": lambda term: _literal_string(term)._replace(value=term.value.upper()),
+    "LCASE": lambda term: _literal_string(term)._replace(value=term.value.lower()),
+    "SUBSTR": _substr,
+    "CONTAINS": lambda text, other: _bool(_string(other) in _literal_string(text).value),
+    "STRSTARTS": lambda text, other: _bool(_literal_string(text).value.startswith(_string(other))),
+    "STRENDS": lambda text, other: _bool(_literal_string(text).value.endswith(_string(other))),
+    "STRBEFORE": _before,
+    "STRAFTER": _after,
+    "CONCAT": lambda *terms: Literal("".join(_literal_string(term).value for term in terms)),
+    "REGEX": _regex,
+    "REPLACE": _replace,
+    "LANGMATCHES": _langmatches,
+    "STRLANG": lambda text, lang: Literal(_literal_string(text).value, lang=_string(lang).lower()),
+    "STRDT": lambda text, datatype: Literal(_literal_string(text).value, datatype=str(datatype)),
+    "SAMETERM": lambda left, right: _bool(left == right),
+    "ISIRI": lambda term: _bool(isinstance(term, IRI)),
+    "ISURI": lambda term: _bool(isinstance(term, IRI)),
+    "ISLITERAL": lambda term: _bool(isinstance(term, Literal)),
+    "ISBLANK": lambda term: FALSE,
+    "ISNUMERIC": lambda term: _bool(_is_numeric(term)),
+    "ABS": lambda term: _numeric(abs(_number(term))),
+    "ROUND": lambda term: _round(term, lambda n: n.to_integral_value(rounding="ROUND_HALF_UP")),
+    "CEIL": lambda term: _round(term, lambda n: n.to_integral_value(rounding="ROUND_CEILING")),
+    "FLOOR": lambda term: _round(term, lambda n: n.to_integral_value(rounding="ROUND_FLOOR")),
+    "YEAR": lambda term: _date_part(term, 1),
+    "MONTH": lambda term: _date_part(term, 2),
+    "DAY": lambda term: _date_part(term, 3),
+}
+
+_AGGREGATES = {"COUNT", "SUM", "MIN", "MAX", "AVG", "SAMPLE", "GROUP_CONCAT"}
+
+
+def _raise(term):
+    raise _ExprError(f"Invalid argument {term}")
+
+
+def _to_integer(term) -> Literal:
+    try:
+        return _numeric(int(Decimal(_string(term).strip())))
+    except (InvalidOperation, ValueError):
+        raise _ExprError(f"Not an integer: {term}")
+
+
+def _to_decimal(term) -> Literal:
+    try:
+        return Literal(str(Decimal(_string(term).strip())), datatype=DECIMAL)
+    except InvalidOperation:
+        raise _ExprError(f"Not a decimal: {term}")
+
+
+_CASTS = {
+    INTEGER: _to_integer,
+    DECIMAL: _to_decimal,
+    DOUBLE: lambda term: _to_decimal(term)._replace(datatype=DOUBLE),
+    XSD + "float": lambda term: _to_decimal(term)._replace(datatype=XSD + "float"),
+    STRING: lambda term: Literal(_string(term), datatype=STRING),
+    BOOLEAN: lambda term: _bool(_ebv(term) if not isinstance(term, Literal) or term.datatype else term.value in ("true", "1")),
+    XSD + "dateTime": lambda term: Literal(_string(term), datatype=XSD + "dateTime"),
+}
+
+
+def _order_key(term) -> tuple:
+    if term is None:
+        return (0,)
+    if isinstance(term, IRI):
+        return (1, str(term))
+    if _is_numeric(term):
+        try:
+            return (2, 0, _number(term))
+        except _ExprError:
+            pass
+    return (2, 1, term.value, term.lang or "", term.datatype or "")
+
+
+def _compare_keys(left: tuple, right: tuple) -> int:
+    return (left > right) - (left < right)
+
+
+# Evaluation
+
+Solution = Dict[str, object]
+
+
+class _Evaluator:
+    def __init__(self, graph: Graph, query: Query):
+        self.graph = graph
+        self.query = query
+
+    def solutions(self) -> List[Solution]:
+        solutions = self.group(self.query.where, [{}])
+        if self.query.order:
+            solutions = sorted(solutions, key=cmp_to_key(self._compare_solutions))
+        rows = []
+        projection = self.query.projection or [(Var(name), None) for name in self.query.variables]
+        seen = set()
+        for solution in solutions:
+            row = {}
+            for variable, expression in projection:
+                if expression is None:
+                    value = solution.get(variable)
+                else:
+                    value = self._try(expression, solution)
+                if value is not None:
+                    row[variable] = value
+            if self.query.distinct:
+                key = tuple(row.get(variable) for variable, _ in projection)
+                if key in seen:
+                    continue
+                seen.add(key)
+            rows.append(row)
+        rows = rows[self.query.offset:]
+        if self.query.limit is not None:
+            rows = rows[: self.query.limit]
+        return rows
+
+    def _compare_solutions(self, left: Solution, right: Solution) -> int:
+        for expression, descending in self.query.order:
+            result = _compare_keys(_order_key(self._try(expression, left)), _order_key(self._try(expression, right)))
+            if result:
+                return -result if descending else result
+        return 0
+
+    # Patterns
+
+    def group(self, elements: list, solutions: List[Solution]) -> List[Solution]:
+        filters = []
+        for element in elements:
+            kind = element[0]
+            if kind == "triples":
+                solutions = self.triples(element[1], solutions)
+            elif kind == "optional":
+                extended = []
+                for solution in solutions:
+                    extended.extend(self.group(element[1], [solution]) or [solution])
+                solutions = extended
+            elif kind == "union":
+                solutions = [
+                    result for solution in solutions for group in element[1] for result in self.group(group, [solution])
+                ]
+            elif kind == "group":
+                solutions = self.group(element[1], solutions)
+            elif kind == "minus":
+                solutions = self.minus(element[1], solutions)
+            elif kind == "filter":
+                filters.append(element[1])
+            elif kind == "bind":
+                solutions = self.bind(element[1], element[2], solutions)
+            elif kind == "values":
+                solutions = self.values(element[1], element[2], solutions)
+            elif kind == "service":
+                solutions = self.service(element[1], element[2], solutions)
+        for expression in filters:
+            solutions = [solution for solution in solutions if self._holds(expression, solution)]
+        return solutions
+
+    def triples(self, triples: list, solutions: List[Solution]) -> List[Solution]:
+        bound = set(solutions[0]) if solutions else set()
+        remaining = list(triples)
+        while remaining:
+            triple = max(remaining, key=lambda t: self._boundness(t, bound))
+            remaining.remove(triple)
+            solutions = [result for solution in solutions for result in self.match(triple, solution)]
+            bound.update(term for term in triple if isinstance(term, Var))
+        return solutions
+
+    @staticmethod
+    def _boundness(triple: tuple, bound: set) -> int:
+        subject, verb, obj = triple
+
+        def is_bound(term):
+            return not isinstance(term, Var) or term in bound
+
+        # A bound subject is the cheapest lookup, then a bound object
+        return 2 * is_bound(subject) + is_bound(obj) + (isinstance(verb, Var) and not is_bound(verb)) * -4
+
+    def match(self, triple: tuple, solution: Solution):
+        subject, verb, obj = triple
+        s = solution.get(subject) if isinstance(subject, Var) else subject
+        o = solution.get(obj) if isinstance(obj, Var) else obj
+        if isinstance(verb, Var):
+            pairs = self._variable_predicate(verb, solution, s, o)
+        else:
+            pairs = ((None, s_value, o_value) for s_value, o_value in self.path_pairs(verb, s, o))
+        for p_value, s_value, o_value in pairs:
+            result = dict(solution)
+            if p_value is not None:
+                result[verb] = p_value
+            if not self._bind(result, subject, s_value) or not self._bind(result, obj, o_value):
+                continue
+            yield result
+
+    @staticmethod
+    def _bind(solution: Solution, term, value) -> bool:
+        if not isinstance(term, Var):
+            return True
+        current = solution.get(term)
+        if current is None:
+            solution[term] = value
+            return True
+        return current == value
+
+    def _variable_predicate(self, verb: Var, solution: Solution, s, o):
+        predicate = solution.get(verb)
+        if predicate is not None:
+            return ((None, s_value, o_value) for s_value, o_value in self.path_pairs(("link", predicate), s, o))
+        if s is None:
+            raise SparqlError("A variable predicate needs a bound subject")
+        return (
+            (predicate, s, o_value)
+            for predicate, objects in self.graph._spo.get(s, {}).items()
+            for o_value in objects
+            if o is None or o_value == o
+        )
+
+    def minus(self, elements: list, solutions: List[Solution]) -> List[Solution]:
+        removed = self.group(elements, [{}])
+        kept = []
+        for solution in solutions:
+            for other in removed:
+                shared = set(solution) & set(other)
+                if shared and all(solution[variable] == other[variable] for variable in shared):
+                    break
+            else:
+                kept.append(solution)
+        return kept
+
+    def bind(self, expression: tuple, variable: Var, solutions: List[Solution]) -> List[Solution]:
+        results = []
+        for solution in solutions:
+            value = None if variable in solution else self._try(expression, solution)
+            results.append({**solution, variable: value} if value is not None else solution)
+        return results
+
+    def values(self, variables: List[Var], rows: list, solutions: List[Solution]) -> List[Solution]:
+        results = []
+        for solution in solutions:
+            for row in rows:
+                result = dict(solution)
+                if all(value is None or self._bind(result, variable, value) for variable, value in zip(variables, row)):
+                    results.append(result)
+        return results
+
+    # The label service
+
+    def service(self, iri: IRI, elements: list, solutions: List[Solution]) -> List[Solution]:
+        if iri != LABEL_SERVICE:
+            raise SparqlError(f"SERVICE <{iri}> is not supported")
+        languages, labels = ["en"], []
+        for element in elements:
+            if element[0] != "triples":
+                raise SparqlError("The label service only takes triples")
+            for subject, verb, obj in element[1]:
+                if verb == ("link", SERVICE_PARAM):
+                    continue
+                if verb == ("link", LANGUAGE_PARAM) and isinstance(obj, Literal):
+                    languages = [
+                        "en" if language.strip() == "[AUTO_LANGUAGE]" else language.strip()
+                        for language in obj.value.split(",")
+                    ]
+                elif isinstance(subject, Var) and isinstance(obj, Var) and verb[0] == "link":
+                    labels.append((subject, verb[1], obj))
+                else:
+                    raise SparqlError("Unsupported triple in the label service")
+        if not labels:
+            # Without explicit triples, every selected ?xLabel (or ?xDescription, ?xAltLabel) is filled in
+            selected = [variable for variable, _ in self.query.projection or []] or self.query.variables
+            for variable in selected:
+                for suffix, predicate in LABEL_SUFFIXES.items():
+                    if variable.endswith(suffix) and len(variable) > len(suffix):
+                        labels.append((Var(variable[: -len(suffix)]), predicate, Var(variable)))
+                        break
+
+        results = []
+        for solution in solutions:
+            result = dict(solution)
+            for subject, predicate, target in labels:
+                entity = solution.get(subject)
+                if entity is None or target in result:
+                    continue
+                value = self._label(entity, predicate, languages)
+                if value is not None:
+                    result[target] = value
+            results.append(result)
+        return results
+
+    def _label(self, entity, predicate: str, languages: List[str]) -> Optional[Literal]:
+        if isinstance(entity, IRI):
+            values = list(self.graph.objects(entity, IRI(predicate)))
+            for language in languages:
+                matching = [value.value for value in values if value.lang == language]
+                if matching:
+                    return Literal(", ".join(matching), lang=language)
+            if predicate != RDFS_LABEL:
+                return None
+            return Literal(entity[len(ENTITY):] if entity.startswith(ENTITY) else str(entity))
+        if predicate == RDFS_LABEL:
+            return Literal(entity.value)
+        return None
+
+    # Property paths
+
+    def path_pairs(self, path: tuple, s, o):
+        if s is not None:
+            return ((s, value) for value in self.forward(path, s) if o is None or value == o)
+        if o is not None:
+            return ((value, o) for value in self.backward(path, o))
+        if path[0] == "link":
+            return self.graph.pairs(path[1])
+        return ((subject, value) for subject in list(self.graph.all_subjects()) for value in self.forward(path, subject))
+
+    def forward(self, path: tuple, node) -> List:
+        return self._walk(path, node, reverse=False)
+
+    def backward(self, path: tuple, node) -> List:
+        return self._walk(path, node, reverse=True)
+
+    def _walk(self, path: tuple, node, reverse: bool) -> List:
+        kind = path[0]
+        if kind == "link":
+            if reverse:
+                return list(self.graph.subjects(path[1], node))
+            return list(self.graph.objects(node, path[1]))
+        if kind == "inv":
+            return self._walk(path[1], node, not reverse)
+        if kind == "seq":
+            nodes = [node]
+            for step in reversed(path[1]) if reverse else path[1]:
+                nodes = list(dict.fromkeys(value for current in nodes for value in self._walk(step, current, reverse)))
+            return nodes
+        if kind == "alt":
+            return list(dict.fromkeys(value for step in path[1] for value in self._walk(step, node, reverse)))
+        if kind == "opt":
+            return list(dict.fromkeys([node] + self._walk(path[1], node, reverse)))
+        # star and plus: every node reachable in zero (star only) or more steps
+        reached = {node: None} if kind == "star" else {}
+        frontier = [node]
+        while frontier:
+            following = []
+            for current in frontier:
+                for value in self._walk(path[1], current, reverse):
+                    if value not in reached:
+                        reached[value] = None
+                        following.append(value)
+            frontier = following
+        return list(reached)
+
+    # Expressions
+
+    def _holds(self, expression: tuple, solution: Solution) -> bool:
+        try:
+            return _ebv(self.value(expression, solution))
+        except _ExprError:
+            return False
+
+    def _try(self, expression: tuple, solution: Solution):
+        try:
+            return self.value(expression, solution)
+        except _ExprError:
+            return None
+
+    def _try_ebv(self, expression: tuple, solution: Solution) -> Optional[bool]:
+        try:
+            return _ebv(self.value(expression, solution))
+        except _ExprError:
+            return None
+
+    def value(self, expression: tuple, solution: Solution):
+        kind = expression[0]
+        if kind == "const":
+            return expression[1]
+        if kind == "var":
+            value = solution.get(expression[1])
+            if value is None:
+                raise _ExprError(f"?{expression[1]} is unbound")
+            return value
+        if kind in ("or", "and"):
+            # An error on one side is ignored if the other side decides the result
+            stop = kind == "or"
+            left = self._try_ebv(expression[1], solution)
+            if left is stop:
+                return _bool(stop)
+            right = self._try_ebv(expression[2], solution)
+            if right is stop:
+                return _bool(stop)
+            if left is None or right is None:
+                raise _ExprError(f"Error in {kind}")
+            return _bool(not stop)
+        if kind == "not":
+            return _bool(not _ebv(self.value(expression[1], solution)))
+        if kind == "compare":
+            _, op, left, right = expression
+            return _bool(_compare(op, self.value(left, solution), self.value(right, solution)))
+        if kind == "arith":
+            _, op, left, right = expression
+            return _arith(op, self.value(left, solution), self.value(right, solution))
+        if kind == "in":
+            _, left, options, negate = expression
+            value = self.value(left, solution)
+            found = any(_equal(value, self.value(option, solution)) for option in options)
+            return _bool(found != negate)
+        if kind == "exists":
+            _, elements, negate = expression
+            return _bool(bool(self.group(elements, [solution])) != negate)
+        if kind == "cast":
+            _, iri, arguments = expression
+            if len(arguments) != 1:
+                raise SparqlError(f"<{iri}> takes a single argument")
+            return _CASTS[iri](self.value(arguments[0], solution))
+        return self.call(expression[1], expression[2], solution)
+
+    def call(self, name: str, arguments: list, solution: Solution):
+        if name == "BOUND":
+            if len(arguments) != 1 or arguments[0][0] != "var":
+                raise SparqlError("BOUND takes a variable")
+            return _bool(solution.get(arguments[0][1]) is not None)
+        if name == "IF":
+            condition, then, otherwise = arguments
+            return self.value(then if _ebv(self.value(condition, solution)) else otherwise, solution)
+        if name == "COALESCE":
+            for argument in arguments:
+                value = self._try(argument, solution)
+                if value is not None:
+                    return value
+            raise _ExprError("No value in COALESCE")
+        values = [self.value(argument, solution) for argument in arguments]
+        try:
+            return _FUNCTIONS[name](*values)
+        except TypeError:
+            raise SparqlError(f"Wrong number of arguments for {name}")
+        except (AttributeError, re.error) as e:
+            raise _ExprError(str(e))
+
+
+def evaluate(graph: Graph, query: Query) -> List[Dict[str, object]]:
+    """The rows of a parsed query, as {variable: term} dicts without the unbound variables"""
+    return _Evaluator(graph, query).solutions()
+
+
+def term_json(term) -> dict:
+    """A term in the SPARQL JSON results format"""
+    if isinstance(term, IRI):
+        return {"type": "uri", "value": str(term)}
+    result = {"type": "literal", "value": term.value}
+    if term.lang:
+        result["xml:lang"] = term.lang
+    elif term.datatype:
+        result["datatype"] = term.datatype
+    return result
+
+
+def results_json(query: Query, rows: List[Dict[str, object]]) -> dict:
+    """Rows in the SPARQL JSON results format, as WDQS returns them"""
+    if query.projection is not None:
+        variables = [variable for variable, _ in query.projection]
+    else:
+        variables = query.variables
+    return {
+        "head": {"vars": [str(variable) for variable in variables]},
+        "results": {
+            "bindings": [{variable: term_json(value) for variable, value in row.items()} for row in rows]
+        },
+    }
@@ -0,0 +1,445 @@
+"""The stand-in's entities, kept in memory
+
+    Entities are kept in the JSON format of wbgetentities, and every edit
+    is applied the way Wikibase applies it (see EntityStore.edit), gets a
+    new revision ID and is recorded as a recent change. The RDF graph the
+    SPARQL endpoint queries is updated along with every edit, so queries
+    see edits right away (unlike the real WDQS, which lags behind).
+
+    Fixtures can be loaded from JSON files in any of the formats Wikidata
+    hands out entities in: a wbgetentities or Special:EntityData
+    response, a single entity, a list of entities, or a JSON dump (one
+    entity per line).
+"""
+import copy
+import glob
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Dict, Iterable, List, Optional
+
+from . import sparql
+from .graph import Graph, entity_triples
+
+KINDS = {"Q": "item", "P": "property"}
+PREFIXES = {kind: prefix for prefix, kind in KINDS.items()}
+NAMESPACES = {"item": 0, "property": 120}
+TERMS = ("labels", "descriptions")
+
+# The datatype of a snak, when only its datavalue is known
+DATAVALUE_TYPES = {
+    "wikibase-entityid": "wikibase-item",
+    "string": "string",
+    "monolingualtext": "monolingualtext",
+    "quantity": "quantity",
+    "time": "time",
+    "globecoordinate": "globe-coordinate",
+}
+
+
+class EntityError(Exception):
+    """An edit or lookup that Wikibase would refuse, with its API error code"""
+
+    def __init__(self, code: str, info: str):
+        super().__init__(info)
+        self.code = code
+        self.info = info
+
+
+def _timestamp(seconds: float = None) -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(seconds))
+
+
+def _kind(entity_id: str) -> str:
+    kind = KINDS.get(entity_id[:1].upper())
+    if kind is None or not entity_id[1:].isdigit():
+        raise EntityError("invalid-entity-id", f"Invalid entity ID: {entity_id}")
+    return kind
+
+
+def snak_hash(snak: dict) -> str:
+    content = {key: snak.get(key) for key in ("snaktype", "property", "datavalue")}
+    return hashlib.sha1(json.dumps(content, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _language_values(values, name: str) -> Dict[str, dict]:
+    """Labels or descriptions, as a dict, whether they came as a dict or a list"""
+    if isinstance(values, dict):
+        values = values.values()
+    try:
+        return {value["language"]: value for value in values}
+    except (KeyError, TypeError):
+        raise EntityError("invalid-json", f"Invalid {name}")
+
+
+class EntityStore:
+    """All entities of the stand-in, and their revisions
+
+        The store is thread-safe: every method holds the store's lock,
+        including SPARQL evaluation, so queries see a consistent snapshot.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.entities: Dict[str, dict] = {}
+        self.graph = Graph()
+        # Property ID -> datatype, from the properties and the snaks seen so far
+        self.datatypes: Dict[str, str] = {}
+        # Recent changes, oldest first
+        self.changes: List[dict] = []
+        self._revision = 0
+        self._page_id = 0
+        self._next_ids = {"item": 1, "property": 1}
+
+    # Loading
+
+    def load(self, path: str) -> int:
+        """Load the entities of a fixture file, or of every .json/.jsonl file of a directory
+
+            Returns the number of entities loaded.
+        """
+        if os.path.isdir(path):
+            paths = sorted(glob.glob(os.path.join(path, "*.json")) + glob.glob(os.path.join(path, "*.jsonl")))
+            return sum(self.load(child) for child in paths)
+        with open(path) as f:
+            if path.endswith((".jsonl", ".ndjson")):
+                entities = [json.loads(line.rstrip().rstrip(",")) for line in f if line.strip() not in ("", "[", "]")]
+            else:
+                data = json.load(f)
+                if isinstance(data, dict) and "entities" in data:
+                    entities = list(data["entities"].values())
+                elif isinstance(data, dict):
+                    entities = [data]
+                else:
+                    entities = data
+        return self.add(entities)
+
+    def add(self, entities: Iterable[dict]) -> int:
+        """Add entities as they are, keeping their IDs
+
+            They are added in QID order, so that the entity with the
+            highest ID is also the most recently created one, as on Wikidata.
+        """
+        entities = [entity for entity in entities if "missing" not in entity]
+        entities.sort(key=lambda entity: (_kind(entity["id"]), int(entity["id"][1:])))
+        with self._lock:
+            for entity in entities:
+                entity = copy.deepcopy(entity)
+                kind = _kind(entity["id"])
+                entity.setdefault("type", kind)
+                for key in ("labels", "descriptions", "aliases", "claims"):
+                    entity.setdefault(key, {})
+                if kind == "item":
+                    entity.setdefault("sitelinks", {})
+                for statements in entity["claims"].values():
+                    for statement in statements:
+                        self._normalize_statement(entity["id"], statement)
+                number = int(entity["id"][1:])
+                self._next_ids[kind] = max(self._next_ids[kind], number + 1)
+                self._commit(entity, "new", user="standin", summary="Loaded from a fixture")
+        return len(entities)
+
+    def dump(self, path: str) -> None:
+        """Write all entities to a file, in the wbgetentities format load() reads"""
+        with self._lock:
+            data = {"entities": copy.deepcopy(self.entities)}
+        with open(path, "w") as f:
+            json.dump(data, f)
+
+    # Reading
+
+    def get(self, entity_id: str) -> Optional[dict]:
+        """A copy of an entity, or None if there is no such entity"""
+        with self._lock:
+            entity = self.entities.get(entity_id)
+            if entity is None and _kind(entity_id) == "property" and entity_id in self.datatypes:
+                # Properties used by the fixtures, but not in them: their datatype is all that is known
+                return {
+                    "type": "property",
+                    "id": entity_id,
+                    "datatype": self.datatypes[entity_id],
+                    "labels": {},
+                    "descriptions": {},
+                    "aliases": {},
+                    "claims": {},
+                }
+            return copy.deepcopy(entity) if entity is not None else None
+
+    def revision_of(self, entity_id: str) -> Optional[int]:
+        with self._lock:
+            entity = self.entities.get(entity_id)
+            return entity["lastrevid"] if entity is not None else None
+
+    def recent_changes(self, new_only: bool = False, namespaces: Iterable[int] = None, limit: int = 10) -> List[dict]:
+        """The most recent changes first"""
+        namespaces = set(namespaces) if namespaces is not None else None
+        changes = []
+        with self._lock:
+            for change in reversed(self.changes):
+                if new_only and change["type"] != "new":
+                    continue
+                if namespaces is not None and change["ns"] not in namespaces:
+                    continue
+                changes.append(dict(change))
+                if len(changes) >= limit:
+                    break
+        return changes
+
+    def select(self, query: str) -> dict:
+        """The results of a SPARQL SELECT query, in the SPARQL JSON results format"""
+        parsed = sparql.parse(query)
+        with self._lock:
+            rows = sparql.evaluate(self.graph, parsed)
+        return sparql.results_json(parsed, rows)
+
+    # Editing
+
+    def create(self, kind: str, data: dict, user: str, summary: str = "") -> dict:
+        """Create an entity out of wbeditentity data, and return it"""
+        if kind not in NAMESPACES:
+            raise EntityError("invalid-entity-type", f"Cannot create an entity of type {kind}")
+        with self._lock:
+            entity_id = f"{PREFIXES[kind]}{self._next_ids[kind]}"
+            self._next_ids[kind] += 1
+            entity = {"type": kind, "id": entity_id, "labels": {}, "descriptions": {}, "aliases": {}, "claims": {}}
+            if kind == "item":
+                entity["sitelinks"] = {}
+            else:
+                if "datatype" not in data:
+                    raise EntityError("invalid-json", "A property needs a datatype")
+                entity["datatype"] = data["datatype"]
+            self._apply(entity, data)
+            return self._commit(entity, "new", user, summary)
+
+    def edit(self, entity_id: str, data: dict, user: str, summary: str = "", clear: bool = False) -> dict:
+        """Apply wbeditentity data to an entity, and return it
+
+            Labels, descriptions, aliases and sitelinks are merged
+            language by language (site by site), and removed when they come
+            with a "remove" key or an empty value. Statements with the ID of
+            an existing statement replace it (or remove it, with a "remove"
+            key), and the others are added. With clear, the entity is
+            emptied first.
+        """
+        with self._lock:
+            entity = self._existing(entity_id)
+            if clear:
+                for key in ("labels", "descriptions", "aliases", "claims"):
+                    entity[key] = {}
+                if "sitelinks" in entity:
+                    entity["sitelinks"] = {}
+            self._apply(entity, data)
+            return self._commit(entity, "edit", user, summary)
+
+    def set_term(self, entity_id: str, key: str, language: str, value: str, user: str, summary: str = "") -> dict:
+        """Set (or with an empty value, remove) a label or a description"""
+        return self.edit(entity_id, {key: {language: {"language": language, "value": value}}}, user, summary)
+
+    def add_statement(self, entity_id: str, statement: dict, user: str, summary: str = "") -> dict:
+        """Add a statement, and return the entity"""
+        return self.edit(entity_id, {"claims": [statement]}, user, summary)
+
+    def statement(self, guid: str) -> dict:
+        """A copy of the statement with this ID"""
+        with self._lock:
+            entity_id = guid.split("$", 1)[0].upper()
+            return copy.deepcopy(self._statement(self._existing(entity_id), guid))
+
+    def set_qualifier(self, guid: str, snak: dict, user: str, replaced_hash: str = None, summary: str = "") -> dict:
+        """Add a qualifier to a statement (or replace the one with this hash), and return the statement"""
+        with self._lock:
+            entity = self._existing(guid.split("$", 1)[0].upper())
+            statement = self._statement(entity, guid)
+            qualifiers = statement.setdefault("qualifiers", {})
+            if replaced_hash:
+                for snaks in qualifiers.values():
+                    snaks[:] = [existing for existing in snaks if existing.get("hash") != replaced_hash]
+            qualifiers.setdefault(snak["property"], []).append(snak)
+            self._normalize_statement(entity["id"], statement)
+            self._commit(entity, "edit", user, summary)
+            return copy.deepcopy(statement)
+
+    def set_reference(self, guid: str, snaks: dict, user: str, replaced_hash: str = None, summary: str = "") -> dict:
+        """Add a reference to a statement (or replace the one with this hash), and return the reference"""
+        with self._lock:
+            entity = self._existing(guid.split("$", 1)[0].upper())
+            statement = self._statement(entity, guid)
+            references = statement.setdefault("references", [])
+            if replaced_hash:
+                references[:] = [existing for existing in references if existing.get("hash") != replaced_hash]
+            reference = {"snaks": snaks, "snaks-order": list(snaks)}
+            references.append(reference)
+            self._normalize_statement(entity["id"], statement)
+            self._commit(entity, "edit", user, summary)
+            return copy.deepcopy(reference)
+
+    def remove_statements(self, guids: Iterable[str], user: str, summary: str = "") -> dict:
+        """Remove statements (all of the same entity), and return the entity"""
+        guids = list(guids)
+        entity_ids = {guid.split("$", 1)[0].upper() for guid in guids}
+        if len(entity_ids) != 1:
+            raise EntityError("invalid-guid", "All statements must belong to the same entity")
+        return self.edit(entity_ids.pop(), {"claims": [{"id": guid, "remove": ""} for guid in guids]}, user, summary)
+
+    # Internals, called with the lock held
+
+    def _existing(self, entity_id: str) -> dict:
+        entity = self.entities.get(entity_id)
+        if entity is None:
+            _kind(entity_id)
+            raise EntityError("no-such-entity", f"Could not find an entity with the ID \"{entity_id}\"")
+        return copy.deepcopy(entity)
+
+    def _statement(self, entity: dict, guid: str) -> dict:
+        for statements in entity["claims"].values():
+            for statement in statements:
+                if statement.get("id") == guid:
+                    return statement
+        raise EntityError("no-such-claim", f"Could not find a statement with the ID \"{guid}\"")
+
+    def _apply(self, entity: dict, data: dict) -> None:
+        for key in TERMS:
+            for language, value in _language_values(data.get(key, {}), key).items():
+                if "remove" in value or not value.get("value"):
+                    entity[key].pop(language, None)
+                else:
+                    entity[key][language] = {"language": language, "value": value["value"]}
+
+        aliases = data.get("aliases", {})
+        if isinstance(aliases, dict):
+            aliases = [alias for values in aliases.values() for alias in (values if isinstance(values, list) else [values])]
+        replaced = set()
+        for alias in aliases:
+            language = alias["language"]
+            current = entity["aliases"].setdefault(language, [])
+            if "remove" in alias:
+                current[:] = [value for value in current if value["value"] != alias["value"]]
+            elif "add" in alias:
+                if all(value["value"] != alias["value"] for value in current):
+                    current.append({"language": language, "value": alias["value"]})
+            else:
+                # Aliases without add/remove replace those of their language
+                if language not in replaced:
+                    current.clear()
+                    replaced.add(language)
+                current.append({"language": language, "value": alias["value"]})
+        entity["aliases"] = {language: values for language, values in entity["aliases"].items() if values}
+
+        for site, sitelink in data.get("sitelinks", {}).items():
+            if "remove" in sitelink or not sitelink.get("title"):
+                entity.get("sitelinks", {}).pop(site, None)
+            else:
+                entity.setdefault("sitelinks", {})[site] = {
+                    "site": site, "title": sitelink["title"], "badges": sitelink.get("badges", [])
+                }
+
+        claims = data.get("claims", [])
+        if isinstance(claims, dict):
+            claims = [statement for statements in claims.values() for statement in statements]
+        for statement in claims:
+            self._apply_statement(entity, copy.deepcopy(statement))
+
+    def _apply_statement(self, entity: dict, statement: dict) -> None:
+        guid = statement.get("id")
+        if "remove" in statement:
+            for pid, statements in list(entity["claims"].items()):
+                statements[:] = [existing for existing in statements if existing.get("id") != guid]
+                if not statements:
+                    del entity["claims"][pid]
+            return
+        if "mainsnak" not in statement or "property" not in statement["mainsnak"]:
+            raise EntityError("invalid-claim", "A statement needs a main snak with a property")
+        self._normalize_statement(entity["id"], statement)
+        pid = statement["mainsnak"]["property"]
+        if guid:
+            for statements in entity["claims"].values():
+                for index, existing in enumerate(statements):
+                    if existing.get("id") == guid:
+                        if existing["mainsnak"]["property"] != pid:
+                            raise EntityError("modification-failed", "A statement cannot change its property")
+                        statements[index] = statement
+                        return
+        entity["claims"].setdefault(pid, []).append(statement)
+
+    def _normalize_statement(self, entity_id: str, statement: dict) -> None:
+        """Fill in the IDs, hashes, datatypes and defaults Wikibase adds to a statement"""
+        if not statement.get("id"):
+            statement["id"] = f"{entity_id}${str(uuid.uuid4()).upper()}"
+        statement.setdefault("type", "statement")
+        statement.setdefault("rank", "normal")
+        self._normalize_snak(statement["mainsnak"])
+        qualifiers = statement.get("qualifiers") or {}
+        if isinstance(qualifiers, list):
+            grouped = {}
+            for snak in qualifiers:
+                grouped.setdefault(snak["property"], []).append(snak)
+            qualifiers = grouped
+        for pid, snaks in qualifiers.items():
+            for snak in snaks:
+                snak.setdefault("property", pid)
+                self._normalize_snak(snak)
+                snak["hash"] = snak_hash(snak)
+        if qualifiers:
+            statement["qualifiers"] = qualifiers
+            order = [pid for pid in statement.get("qualifiers-order", []) if pid in qualifiers]
+            statement["qualifiers-order"] = order + [pid for pid in qualifiers if pid not in order]
+        for reference in statement.get("references", []):
+            for pid, snaks in reference.get("snaks", {}).items():
+                for snak in snaks:
+                    snak.setdefault("property", pid)
+                    self._normalize_snak(snak)
+            reference.setdefault("snaks-order", list(reference.get("snaks", {})))
+            reference["hash"] = hashlib.sha1(json.dumps(reference["snaks"], sort_keys=True).encode("utf-8")).hexdigest()
+
+    def _normalize_snak(self, snak: dict) -> None:
+        snak.setdefault("snaktype", "value")
+        pid = snak["property"]
+        datatype = snak.get("datatype") or self.datatypes.get(pid)
+        if datatype is None and "datavalue" in snak:
+            datatype = DATAVALUE_TYPES.get(snak["datavalue"].get("type"))
+        if datatype is not None:
+            snak["datatype"] = datatype
+            self.datatypes.setdefault(pid, datatype)
+        datavalue = snak.get("datavalue")
+        if datavalue and datavalue.get("type") == "wikibase-entityid":
+            # Wikibase returns entity IDs in all three forms, and clients read any of them
+            value = datavalue["value"]
+            if "id" in value:
+                value.setdefault("entity-type", KINDS.get(value["id"][:1].upper(), "item"))
+                value.setdefault("numeric-id", int(value["id"][1:]))
+            elif "numeric-id" in value:
+                value.setdefault("entity-type", "item")
+                value["id"] = f"{PREFIXES.get(value['entity-type'], 'Q')}{value['numeric-id']}"
+
+    def _commit(self, entity: dict, change: str, user: str, summary: str) -> dict:
+        self._revision += 1
+        now = time.time()
+        kind = entity["type"]
+        if entity["id"] not in self.entities:
+            self._page_id += 1
+            entity["pageid"] = self._page_id
+        entity["ns"] = NAMESPACES[kind]
+        entity["title"] = entity["id"] if kind == "item" else f"Property:{entity['id']}"
+        entity["lastrevid"] = self._revision
+        entity["modified"] = _timestamp(now)
+        if kind == "property":
+            self.datatypes[entity["id"]] = entity["datatype"]
+
+        self.entities[entity["id"]] = entity
+        self.graph.set_entity(entity["id"], entity_triples(entity))
+        self.changes.append(
+            {
+                "type": change,
+                "ns": entity["ns"],
+                "title": entity["title"],
+                "pageid": entity["pageid"],
+                "revid": self._revision,
+                "timestamp": _timestamp(now),
+                "user": user,
+                "comment": summary,
+            }
+        )
+        return copy.deepcopy(entity)
@@ -0,0 +1,119 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import requests
+
+from .configuration import write_config
+from .server import StandinServer
+from .store import EntityStore
+
+ENTITIES = {
+    "Q5": {"id": "Q5", "type": "item", "labels": {"en": {"language": "en", "value": "human"}}},
+    "Q100": {
+        "id": "Q100",
+        "type": "item",
+        "labels": {"en": {"language": "en", "value": "Some Show"}, "fr": {"language": "fr", "value": "Une série"}},
+        "claims": {"P31": [{"mainsnak": {
+            "snaktype": "value", "property": "P31", "datavalue": {"type": "wikibase-entityid", "value": {"id": "Q5"}}
+        }}]},
+    },
+}
+
+# What the bots do through pywikibot, run in a process of its own since pywikibot reads its configuration on import
+PYWIKIBOT_SCRIPT = """
+import pywikibot
+repo = pywikibot.Site().data_repository()
+item = pywikibot.ItemPage(repo, "Q100")
+item.get()
+item.editLabels({"de": "Eine Serie"})
+claim = pywikibot.Claim(repo, "P31")
+claim.setTarget(pywikibot.ItemPage(repo, "Q5"))
+item.addClaim(claim)
+new = pywikibot.ItemPage(repo)
+new.editEntity({"labels": {"en": {"language": "en", "value": "New"}}})
+print(new.getID())
+"""
+
+
+class ApiTests(unittest.TestCase):
+    def setUp(self):
+        store = EntityStore()
+        store.add(ENTITIES.values())
+        self.server = StandinServer(store, accounts={"Bot": "secret"})
+        self.server.__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+        self.session = requests.Session()
+
+    def api(self, method="GET", **params):
+        response = self.session.request(method, self.server.api_url, **{"params" if method == "GET" else "data": {"format": "json", **params}})
+        return response.json(), response.headers
+
+    def login(self):
+        token = self.api(action="query", meta="tokens", type="login")[0]["query"]["tokens"]["logintoken"]
+        result = self.api("POST", action="login", lgname="Bot", lgpassword="secret", lgtoken=token)[0]
+        self.assertEqual(result["login"]["result"], "Success")
+        return self.api(action="query", meta="tokens")[0]["query"]["tokens"]["csrftoken"]
+
+    def test_projected_reads(self):
+        body, _ = self.api(action="wbgetentities", ids="Q100|Q404", props="labels", languages="fr")
+        self.assertEqual(body["entities"]["Q100"]["labels"], {"fr": {"language": "fr", "value": "Une série"}})
+        self.assertNotIn("claims", body["entities"]["Q100"])
+        self.assertIn("missing", body["entities"]["Q404"])
+
+    def test_edits_need_a_login_and_a_token(self):
+        data = json.dumps({"labels": {"en": {"language": "en", "value": "Renamed"}}})
+        body, headers = self.api("POST", action="wbeditentity", id="Q100", data=data, token="+\\", **{"assert": "user"})
+        self.assertEqual(body["error"]["code"], "assertuserfailed")
+        self.assertEqual(headers["MediaWiki-API-Error"], "assertuserfailed")
+
+        token = self.login()
+        self.assertEqual(self.api(action="wbeditentity", id="Q100", data=data, token=token)[0]["error"]["code"], "mustbeposted")
+        body, _ = self.api("POST", action="wbeditentity", id="Q100", data=data, token=token)
+        self.assertEqual(body["entity"]["labels"]["en"]["value"], "Renamed")
+        changes = self.api(action="query", list="recentchanges", rcprop="title|ids")[0]["query"]["recentchanges"]
+        self.assertEqual(changes[0]["title"], "Q100")
+
+    def test_stale_base_revisions_conflict(self):
+        token = self.login()
+        revision = self.server.store.revision_of("Q100")
+        data = json.dumps({"labels": {"de": {"language": "de", "value": "Serie"}}})
+        body, _ = self.api("POST", action="wbeditentity", id="Q100", data=data, token=token, baserevid=str(revision))
+        self.assertEqual(body["success"], 1)
+        body, _ = self.api("POST", action="wbsetlabel", id="Q100", language="de", value="Show", token=token, baserevid=str(revision))
+        self.assertEqual(body["error"]["code"], "editconflict")
+        self.assertEqual(self.server.store.get("Q100")["labels"]["de"]["value"], "Serie")
+
+    def test_maxlag(self):
+        self.server.api.lag = 6
+        body, headers = self.api(action="wbgetentities", ids="Q5", maxlag="5")
+        self.assertEqual(body["error"]["code"], "maxlag")
+        self.assertEqual(headers["Retry-After"], "6")
+        self.assertIn("entities", self.api(action="wbgetentities", ids="Q5")[0])
+
+    def test_sparql_endpoint(self):
+        query = "SELECT ?item ?itemLabel WHERE { ?item wdt:P31 wd:Q5. SERVICE wikibase:label { bd:serviceParam wikibase:language \"en\". } }"
+        response = requests.get(f"{self.server.url}/sparql", params={"query": query, "format": "json"})
+        rows = response.json()["results"]["bindings"]
+        self.assertEqual([row["itemLabel"]["value"] for row in rows], ["Some Show"])
+        self.assertEqual(requests.get(f"{self.server.url}/sparql", params={"query": "SELECT"}).status_code, 400)
+        self.assertEqual(requests.get(f"{self.server.url}/standin/stats").json()["sparql"], 2)
+
+    def test_pywikibot(self):
+        with tempfile.TemporaryDirectory() as directory:
+            write_config(directory, self.server.url, "Bot", "secret")
+            env = {**os.environ, "PYWIKIBOT_DIR": directory}
+            env.pop("PYWIKIBOT_NO_USER_CONFIG", None)
+            result = subprocess.run([sys.executable, "-c", PYWIKIBOT_SCRIPT], env=env, capture_output=True, text=True, timeout=60, cwd=directory)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.split()[-1], "Q101")
+        item = self.server.store.get("Q100")
+        self.assertEqual(item["labels"]["de"]["value"], "Eine Serie")
+        self.assertEqual(len(item["claims"]["P31"]), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import unittest
+
+from model.series_graph import series_graph_query
+from sparql.query_builder import generate_sparql_query
+
+from .sparql import SparqlError
+from .store import EntityStore
+
+
+def _item(qid, label=None, **claims):
+    """An item with a label, and statements whose values are items or strings"""
+    entity = {"id": qid, "type": "item", "labels": {}, "claims": {}}
+    if label:
+        entity["labels"]["en"] = {"language": "en", "value": label}
+    for pid, values in claims.items():
+        entity["claims"][pid] = [_statement(pid, value) for value in values]
+    return entity
+
+
+def _statement(pid, value, **qualifiers):
+    statement = {"mainsnak": _snak(pid, value), "type": "statement", "rank": "normal"}
+    if qualifiers:
+        statement["qualifiers"] = {qpid: [_snak(qpid, qvalue)] for qpid, qvalue in qualifiers.items()}
+    return statement
+
+
+def _snak(pid, value):
+    if value.startswith("Q"):
+        return {"snaktype": "value", "property": pid, "datavalue": {"type": "wikibase-entityid", "value": {"id": value}}}
+    return {"snaktype": "value", "property": pid, "datavalue": {"type": "string", "value": value}}
+
+
+def _values(results, name):
+    return [row[name]["value"].rsplit("/", 1)[-1] for row in results["results"]["bindings"] if name in row]
+
+
+class SparqlTests(unittest.TestCase):
+    def setUp(self):
+        self.store = EntityStore()
+        season = _item("Q11", "Season 1", P31=["Q3464665"])
+        season["claims"]["P179"] = [_statement("P179", "Q10", P1545="1")]
+        first = _item("Q12", "Pilot", P31=["Q21191270"], P179=["Q10"])
+        first["claims"]["P4908"] = [_statement("P4908", "Q11", P1545="1")]
+        second = _item("Q13", "Second", P31=["Q21191270"], P179=["Q10"], P155=["Q12"])
+        second["claims"]["P4908"] = [_statement("P4908", "Q11", P1545="2")]
+        self.store.add([_item("Q10", "The Show", P31=["Q5398426"]), season, first, second])
+
+    def test_generated_queries(self):
+        results = self.store.select(generate_sparql_query({"P31": ["Q3464665", "Q21191270"], "P179": "Q10"}))
+        self.assertEqual(results["head"]["vars"], ["item", "key"])
+        self.assertEqual(sorted(_values(results, "item")), ["Q11", "Q12", "Q13"])
+
+    def test_series_graph_query(self):
+        rows = self.store.select(series_graph_query("Q10"))["results"]["bindings"]
+        ordinals = {
+            (row["item"]["value"].rsplit("/", 1)[-1], row["seasonOrdinal"]["value"])
+            for row in rows if "seasonOrdinal" in row
+        }
+        self.assertEqual(ordinals, {("Q12", "1"), ("Q13", "2")})
+        self.assertEqual(_values(self.store.select(series_graph_query("Q10")), "follows"), ["Q12"])
+
+    def test_labels_filters_and_order(self):
+        query = """SELECT ?episode ?episodeLabel ?ordinal WHERE {
+          ?episode p:P4908 ?statement.
+          ?statement pq:P1545 ?ordinal.
+          FILTER(xsd:integer(?ordinal) > 0)
+          SERVICE wikibase:label { bd:serviceParam wikibase:language "en". }
+        } ORDER BY DESC(?ordinal) LIMIT 1"""
+        rows = self.store.select(query)["results"]["bindings"]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["episodeLabel"]["value"], "Second")
+
+    def test_edits_are_visible_right_away(self):
+        self.store.add_statement("Q13", _statement("P155", "Q11"), "Tester")
+        self.assertEqual(sorted(_values(self.store.select("SELECT ?x WHERE { wd:Q13 wdt:P155 ?x }"), "x")), ["Q11", "Q12"])
+
+    def test_unsupported_queries_raise(self):
+        with self.assertRaises(SparqlError):
+            self.store.select("SELECT (COUNT(?item) AS ?n) WHERE { ?item wdt:P31 wd:Q5 }")
+        with self.assertRaises(SparqlError):
+            self.store.select("SELECT ?item WHERE { ?item wdt:P31 ")
+
+
+if __name__ == "__main__":
+    unittest.main()
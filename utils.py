@@ -1,11 +1,13 @@
-from typing import Iterable, Optional
+from typing import Dict, Iterable, Optional
 import click
 import re
-import requests
-from bs4 import BeautifulSoup
 from pywikibot import Claim, Site, ItemPage
 
+from cache import fill_item, load_item
+from cache.scrapes import scrape, scrape_many
 import constraints.api as api
+from network.attribution import API_WRITE, request
+from sparql.results import forget_entities, referenced_qids
 import properties.wikidata_properties as wp
 
 
@@ -31,8 +33,8 @@ def copy_delayed(
 ) -> Iterable[api.Fix]:
     repo = Site().data_repository()
 
-    src_item.get()
-    dest_item.get()
+    load_item(src_item)
+    load_item(dest_item)
 
     claims = []
 
@@ -52,7 +54,7 @@ def copy_delayed(
         targets = [claim.getTarget() for claim in src_claims]
 
         for target in targets:
-            target.get()
+            load_item(target)
 
             target_str = printable_target_value(target)
 
@@ -70,8 +72,31 @@ def copy_delayed(
 def imdb_title(imdb_id):
     if imdb_id is None:
         return None
-    response = requests.get(f"https://www.imdb.com/title/{imdb_id}")
-    soup = BeautifulSoup(response.content, features="lxml")
+    return scrape("imdb_title", imdb_id, _imdb_url, _imdb_title)
+
+
+def imdb_titles(imdb_ids: Iterable[str]) -> Dict[str, Optional[str]]:
+    """The titles of several IMDb IDs, fetched concurrently"""
+    return scrape_many("imdb_title", imdb_ids, _imdb_url, _imdb_title)
+
+
+def _soup(response):
+    """The parsed HTML of a scraped page
+
+        bs4 (and lxml, which it parses with) are only imported once a page
+        is actually parsed, so commands that never scrape don't load them.
+    """
+    from bs4 import BeautifulSoup
+
+    return BeautifulSoup(response.content, features="lxml")
+
+
+def _imdb_url(imdb_id):
+    return f"https://www.imdb.com/title/{imdb_id}"
+
+
+def _imdb_title(response) -> Optional[str]:
+    soup = _soup(response)
     heading = soup.select_one("div.title_wrapper > h1")
     if heading is not None:
         return heading.get_text().strip()
@@ -81,8 +106,20 @@ def imdb_title(imdb_id):
 def tv_com_title(tv_com_id):
     if tv_com_id is None:
         return None
-    response = requests.get(f"https://www.tv.com/{tv_com_id}")
-    soup = BeautifulSoup(response.content, features="lxml")
+    return scrape("tv_com_title", tv_com_id, _tv_com_url, _tv_com_title)
+
+
+def tv_com_titles(tv_com_ids: Iterable[str]) -> Dict[str, Optional[str]]:
+    """The titles of several TV.com IDs, fetched concurrently"""
+    return scrape_many("tv_com_title", tv_com_ids, _tv_com_url, _tv_com_title)
+
+
+def _tv_com_url(tv_com_id):
+    return f"https://www.tv.com/{tv_com_id}"
+
+
+def _tv_com_title(response) -> Optional[str]:
+    soup = _soup(response)
     heading = soup.select_one(".ep_title")
     if heading is not None:
         return heading.get_text().strip()
@@ -92,9 +129,20 @@ def tv_com_title(tv_com_id):
 def bgg_title(bgg_id) -> Optional[str]:
     if bgg_id is None:
         return None
+    return scrape("bgg_title", bgg_id, _bgg_url, _bgg_title)
+
+
+def bgg_titles(bgg_ids: Iterable[str]) -> Dict[str, Optional[str]]:
+    """The titles of several BoardGameGeek IDs, fetched concurrently"""
+    return scrape_many("bgg_title", bgg_ids, _bgg_url, _bgg_title)
+
+
+def _bgg_url(bgg_id):
+    return f"https://www.boardgamegeek.com/boardgame/{bgg_id}"
 
-    response = requests.get(f"https://www.boardgamegeek.com/boardgame/{bgg_id}")
-    soup = BeautifulSoup(response.content, features="lxml")
+
+def _bgg_title(response) -> Optional[str]:
+    soup = _soup(response)
     heading = soup.find("title")
     if heading is not None:
         # the title for BGG is in the format "<title | Board Game | BoardGameGeek"
@@ -106,9 +154,11 @@ def bgg_title(bgg_id) -> Optional[str]:
 def no_of_episodes(imdb_id):
     if imdb_id is None:
         return None
+    return scrape("imdb_episodes", imdb_id, _imdb_url, _no_of_episodes)
+
 
-    response = requests.get(f"https://www.imdb.com/title/{imdb_id}")
-    soup = BeautifulSoup(response.content, features="lxml")
+def _no_of_episodes(response) -> Optional[int]:
+    soup = _soup(response)
     maybe_episode_counts = (
         x.get_text().strip() for x in soup.select("span.bp_sub_heading")
     )
@@ -140,8 +190,8 @@ class RepoUtils:
 
             Returns a tuple of (successes, failures)
         """
-        src_item.get()
-        dest_item.get()
+        load_item(src_item)
+        load_item(dest_item)
 
         failures = 0
         successes = 0
@@ -173,7 +223,9 @@ class RepoUtils:
             targets = [claim.getTarget() for claim in src_claims]
 
             for target in targets:
-                if hasattr(target, "get"):
+                if isinstance(target, ItemPage):
+                    load_item(target)
+                elif hasattr(target, "get"):
                     target.get()
 
                 target_str = printable_target_value(target)
@@ -190,13 +242,45 @@ class RepoUtils:
                 successes += 1
         return (successes, failures)
 
-    def new_item(self, labels, descriptions) -> ItemPage:
-        item = ItemPage(self.repo)
+    def new_item(self, labels, descriptions, claims: Iterable[Claim] = (), summary="Creating item") -> ItemPage:
+        """Create an item with labels, descriptions and claims in a single edit
+
+            The item is created with one wbeditentity call (new=item), and
+            the entity returned by Wikidata is used as the content of the
+            returned ItemPage, so it can be used without fetching it again.
+        """
+        data = {}
         if labels:
-            item.editLabels(labels, summary="Setting label")
+            data["labels"] = _language_values(labels)
         if descriptions:
-            item.editDescriptions(descriptions, summary="Setting description")
+            data["descriptions"] = _language_values(descriptions)
+        claims = list(claims)
+        if claims:
+            data["claims"] = [claim.toJSON() for claim in claims]
+
+        with request(API_WRITE):
+            updates = self.repo.editEntity(ItemPage(self.repo), data, summary=summary)
+        entity = updates["entity"]
+        for key in ("labels", "descriptions", "aliases", "claims", "sitelinks"):
+            entity.setdefault(key, {})
+
+        item = ItemPage(self.repo, entity["id"])
+        fill_item(item, entity)
+        # Queries about the items it links to (eg: the episodes of its season) are now stale
+        forget_entities({item.title()} | referenced_qids(data))
         return item
 
-    def new_claim(self, prop):
-        return Claim(self.repo, prop)
\ No newline at end of file
+    def new_claim(self, prop, target=None, qualifiers=None):
+        """A new claim, optionally with its target and qualifiers ({pid: target})"""
+        claim = Claim(self.repo, prop)
+        if target is not None:
+            claim.setTarget(target)
+        for qualifier_pid, qualifier_target in (qualifiers or {}).items():
+            qualifier = Claim(self.repo, qualifier_pid)
+            qualifier.setTarget(qualifier_target)
+            claim.addQualifier(qualifier)
+        return claim
+
+
+def _language_values(values: Dict[str, str]) -> Dict[str, dict]:
+    return {lang: {"language": lang, "value": value} for lang, value in values.items()}
\ No newline at end of file